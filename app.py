@@ -1,9 +1,14 @@
+import io
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from datetime import date
+from datetime import date, datetime, timedelta
 import database as db
+import data_transfer
+import charts
+import nutrition
+import trends
 import auth
+from metrics import metrics
 
 
 # --- App Configuration ---
@@ -23,35 +28,45 @@ is_master_admin = user.id == st.secrets.get("MASTER_USER_ID")
 # --- Main App UI ---
 st.sidebar.header("Navigation")
 # Add Admin Panel to navigation if user is the master admin
-nav_options = ["Daily Log", "Analytics Dashboard", "Recipes"]
+nav_options = ["Daily Log", "Analytics Dashboard", "Recipes", "Import / Export"]
 if is_master_admin:
-    nav_options.append("Admin Panel")
+    nav_options += ["Admin Panel", "Performance"]
 page = st.sidebar.radio("Go to", nav_options)
+metrics.start_rerun(page)
 
-# --- Session State Initialization ---
-if f'default_goals_{user.id}' not in st.session_state:
-    # Try to fetch saved preferences
-    saved_prefs = db.get_user_preferences(user.id)
-    if saved_prefs:
-        # If found, load the first record from the list
-        user_prefs = saved_prefs[0]
-        st.session_state[f'default_goals_{user.id}'] = {
-            'calories': user_prefs['default_calories'],
-            'protein': user_prefs['default_protein'],
-            'carbs': user_prefs['default_carbs'],
-            'fats': user_prefs['default_fats']
-        }
-    else:
-        # Otherwise, use hardcoded defaults for new users
-        st.session_state[f'default_goals_{user.id}'] = {'calories': 2000, 'protein': 150, 'carbs': 250, 'fats': 60}
-
-if f'daily_goal_overrides_{user.id}' not in st.session_state:
-    st.session_state[f'daily_goal_overrides_{user.id}'] = {}
+# --- Page Data ---
+# The page's independent reads and the sidebar's default goals are issued together, so a
+# cold render waits for about one database round trip instead of one per query.
+RANGE_PRESETS = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "Last 365 days": 365, "All time": None}
+page_calls = {'default_goals': (db.get_default_goals, user.id)}
+if page == "Daily Log":
+    # The date picker is keyed, so the date it will show is known before it is drawn.
+    selected_date = st.session_state.get("daily_log_date", date.today())
+    page_calls.update({
+        'entries': (db.get_entries_by_date, selected_date, user.id),
+        'day_summary': (db.get_daily_summary, user.id, selected_date, selected_date),
+        'day_goals': (db.get_daily_goals, user.id, selected_date, selected_date),
+        'autocomplete': (db.get_autocomplete_index, user.id),
+    })
+elif page == "Analytics Dashboard":
+    range_label = st.session_state.get("analytics_range", "Last 30 days")
+    range_days = RANGE_PRESETS[range_label]
+    range_start = date.today() - timedelta(days=range_days - 1) if range_days else None
+    # Read the version before the data, so a concurrent write can only make the cached figure miss.
+    data_version = db.data_version(user.id)
+    # Per-day totals are aggregated by the database; only one row per day is transferred.
+    page_calls['summary'] = (db.get_daily_summary, user.id, range_start)
+    # Averages, streaks and weekly summaries come from a cached engine that only rereads changed days.
+    page_calls['trends'] = (db.get_trends, user.id)
+elif page == "Recipes":
+    page_calls['recipes'] = (db.get_recipes, user.id)
+with metrics.timed("page_data"):
+    page_data = db.load_page_data(page_calls)
 
 # --- Default Goals UI ---
 st.sidebar.header("Set Your Default Goals")
 st.sidebar.caption("These are your master goals. Click save to make them permanent.")
-default_goals = st.session_state[f'default_goals_{user.id}']
+default_goals = page_data['default_goals']
 default_goals['calories'] = st.sidebar.number_input("Calories (kcal)", value=default_goals['calories'], min_value=0, step=50, key="default_cal")
 default_goals['protein'] = st.sidebar.number_input("Protein (g)", value=default_goals['protein'], min_value=0, step=5, key="default_pro")
 default_goals['carbs'] = st.sidebar.number_input("Carbs (g)", value=default_goals['carbs'], min_value=0, step=5, key="default_carb")
@@ -61,6 +76,19 @@ if st.sidebar.button("Save Default Goals"):
     db.upsert_user_preferences(user.id, default_goals)
     st.sidebar.success("Your default goals have been saved!")
 
+# --- Queued Writes ---
+failed_writes = db.failed_writes(user.id)
+if failed_writes:
+    st.warning(f"{len(failed_writes)} change(s) could not be saved to the database: {failed_writes[0]['last_error']}. "
+               "Your later changes are held until these are saved or discarded.")
+    retry_col, discard_col = st.columns(2)
+    if retry_col.button("Retry Saving"):
+        db.retry_failed_writes(user.id)
+        st.rerun()
+    if discard_col.button("Discard Changes"):
+        db.discard_failed_writes(user.id)
+        st.rerun()
+
 # --- Page Routing ---
 if page == "Daily Log":
     st.title("🥗 Daily Log")
@@ -68,21 +96,17 @@ if page == "Daily Log":
     if 'flash_message' in st.session_state:
         st.success(st.session_state.flash_message)
         del st.session_state.flash_message
-    selected_date = st.date_input("Select a date", date.today())
-    entries = db.get_entries_by_date(selected_date, user.id)
+    st.date_input("Select a date", date.today(), key="daily_log_date")
+    entries = page_data['entries']
     st.header(f"Entries for {selected_date.strftime('%B %d, %Y')}")
-    if entries:
-        day_goals = {
-            'calories': entries[0]['goal_calories'],
-            'protein': entries[0]['goal_protein'],
-            'carbs': entries[0]['goal_carbs'],
-            'fats': entries[0]['goal_fats']}
-        df_display = pd.DataFrame.from_records(entries)
-        totals = df_display[['calories', 'protein', 'carbs', 'fats']].sum()
+    # The day's totals come from the daily_totals rollup rather than summing the entries here.
+    day_summary = page_data['day_summary']
+    if entries and day_summary:
+        day_totals = day_summary[0]
         st.subheader("Daily Totals")
         cols = st.columns(4)
-        for i, (metric, total) in enumerate(totals.items()):
-            goal = day_goals.get(metric, 0)
+        for i, metric in enumerate(['calories', 'protein', 'carbs', 'fats']):
+            total, goal = day_totals[f'actual_{metric}'], day_totals[f'goal_{metric}'] or 0
             progress = min(total / goal, 1.0) if goal > 0 else 0
             with cols[i]:
                 st.metric(label=metric.capitalize(), value=f"{int(total)}/{int(goal)}", delta=f"{int(goal-total)} remaining")
@@ -90,69 +114,64 @@ if page == "Daily Log":
     else:
         st.info("No meals logged for this day.")
     
-    daily_goal_overrides = st.session_state[f'daily_goal_overrides_{user.id}']
-    user_day_goals = None
-    if entries:
-        user_day_goals = {
-            'calories': entries[0]['goal_calories'],
-            'protein': entries[0]['goal_protein'],
-            'carbs': entries[0]['goal_carbs'],
-            'fats': entries[0]['goal_fats']}
-    elif str(selected_date) in daily_goal_overrides:
-        user_day_goals = daily_goal_overrides[str(selected_date)]
-    else:
-        user_day_goals = default_goals
+    # The day's own goals if it has any, otherwise the defaults (both already loaded above).
+    user_day_goals = db.get_goals_for_date(user.id, selected_date)
 
     with st.expander("🎯 Set / Edit Goals for this Day", expanded=False):
         with st.form("day_goals_form"):
-            st.write("Adjust the goals for this specific day.")
+            st.write("Adjust the goals for this day, or for several days starting from it.")
             c1, c2 = st.columns(2)
             g_calories = c1.number_input("Calories", value=user_day_goals['calories'], min_value=0, step=50)
             g_protein = c2.number_input("Protein", value=user_day_goals['protein'], min_value=0, step=5)
             g_carbs = c1.number_input("Carbs", value=user_day_goals['carbs'], min_value=0, step=5)
             g_fats = c2.number_input("Fats", value=user_day_goals['fats'], min_value=0, step=5)
-            if st.form_submit_button("Save Goals"):
+            goal_days = st.number_input("Apply to this many days", value=1, min_value=1, max_value=db.MAX_GOAL_RANGE_DAYS, step=1)
+            goal_end = selected_date + timedelta(days=goal_days - 1)
+            save_col, reset_col = st.columns(2)
+            if save_col.form_submit_button("Save Goals"):
                 new_goals = {'calories': g_calories, 'protein': g_protein, 'carbs': g_carbs, 'fats': g_fats}
-                if entries:
-                    db.update_goals_for_date(selected_date, new_goals, user.id)
-                else:
-                    daily_goal_overrides[str(selected_date)] = new_goals
+                # One upsert covers the whole range.
+                db.set_goals_for_range(user.id, selected_date, goal_end, new_goals)
                 st.session_state.flash_message = "Goals saved successfully!"
                 st.rerun()
+            if reset_col.form_submit_button("Use Default Goals"):
+                db.clear_goals_for_range(user.id, selected_date, goal_end)
+                st.session_state.flash_message = "These days now use your default goals."
+                st.rerun()
 
     # --- Log from Recipe ---
-    with st.expander("🍳 Log a Meal from Your Recipes"):
-        user_recipes = db.get_recipes(user.id)
-        if not user_recipes:
-            st.info("You don't have any recipes to log. Go to the 'Recipes' page to add one.")
+    with st.expander("🍳 Log a Recipe or Past Meal"):
+        # Only the top matches are sent to the browser; the search runs on an in-memory index.
+        meal_query = st.text_input("Search your recipes and past meals", key="meal_search", placeholder="e.g. chicken")
+        suggestions = db.suggest_meals(user.id, meal_query)
+        if not suggestions:
+            st.info("No recipes or past meals match your search." if meal_query else "You don't have any recipes to log. Go to the 'Recipes' page to add one.")
         else:
-            recipe_options = {recipe['name']: recipe for recipe in user_recipes}
-            selected_recipe_name = st.selectbox("Choose a recipe to log", options=recipe_options.keys())
+            labels = [f"{item['text']} ({'recipe' if item['kind'] == 'recipe' else 'past meal'})" for item in suggestions]
+            selected_label = st.selectbox("Choose a recipe or meal to log", options=labels)
             
-            selected_recipe = recipe_options[selected_recipe_name]
+            selected_recipe = suggestions[labels.index(selected_label)]
+            is_recipe = selected_recipe['kind'] == 'recipe'
             
-            servings_eaten = st.number_input("How many servings did you eat?", min_value=0.1, step=0.25, value=1.0)
+            servings_eaten = st.number_input("How many servings did you eat?" if is_recipe else "How many portions did you eat?", min_value=0.1, step=0.25, value=1.0)
             
-            if st.button("Add Recipe to Log"):
+            if st.button("Add to Log"):
                 # Calculate the nutrition based on servings eaten
-                final_calories = selected_recipe['calories_per_serving'] * servings_eaten
-                final_protein = selected_recipe['protein_per_serving'] * servings_eaten
-                final_carbs = selected_recipe['carbs_per_serving'] * servings_eaten
-                final_fats = selected_recipe['fats_per_serving'] * servings_eaten
+                final = nutrition.scale_serving({f'{macro}_per_serving': selected_recipe[macro] for macro in nutrition.MACROS}, servings_eaten)
                 
-                # Use the day's goals (already calculated on this page)
-                desc = f"{selected_recipe['name']} ({servings_eaten} servings)"
+                desc = f"{selected_recipe['text']} ({servings_eaten} servings)" if is_recipe else selected_recipe['text']
                 
                 # Add to the database
-                db.add_entry(selected_date, desc, final_calories, final_protein, final_carbs, final_fats, user_day_goals, user.id)
+                db.add_entry(selected_date, desc, final['calories'], final['protein'], final['carbs'], final['fats'], user.id)
                 st.success(f"Added '{desc}' to your log for {selected_date.strftime('%B %d, %Y')}!")
                 st.rerun()
 
     st.subheader("Manage Your Meals")
-    if entries:
-        df_editor = pd.DataFrame.from_records(entries).set_index('id')
-    else:
-        df_editor = pd.DataFrame(columns=['description', 'calories', 'protein', 'carbs', 'fats'])
+    with metrics.timed("daily_log.dataframe"):
+        if entries:
+            df_editor = pd.DataFrame.from_records(entries).set_index('id')
+        else:
+            df_editor = pd.DataFrame(columns=['description', 'calories', 'protein', 'carbs', 'fats'])
     edited_df = st.data_editor(
         data=df_editor[['description', 'calories', 'protein', 'carbs', 'fats']],
         num_rows="dynamic", key="meal_editor",
@@ -165,52 +184,93 @@ if page == "Daily Log":
             "carbs": st.column_config.NumberColumn("Carbs (g)", default=0, min_value=0, required=True),
             "fats": st.column_config.NumberColumn("Fats (g)", default=0, min_value=0, required=True)})
     if st.button("Save Meal Changes"):
+        meal_columns = ['description', 'calories', 'protein', 'carbs', 'fats']
         original_ids, edited_ids = set(df_editor.index), set(edited_df.index)
-        deleted_ids = original_ids - edited_ids
-        for entry_id in deleted_ids:
-            db.delete_entry(entry_id, user.id)
+        deleted_ids = list(original_ids - edited_ids)
+        inserts, updates = [], []
         for entry_id, row in edited_df.iterrows():
             if entry_id not in original_ids:
-                db.add_entry(selected_date, row['description'], row['calories'], row['protein'], row['carbs'], row['fats'], user_day_goals, user.id)
+                inserts.append(row[meal_columns].to_dict())
             else:
                 original_row = df_editor.loc[entry_id]
-                if list(row.values) != list(original_row[['description', 'calories', 'protein', 'carbs', 'fats']].values):
-                    db.update_entry(entry_id, row['description'], row['calories'], row['protein'], row['carbs'], row['fats'], user.id)
-        st.session_state.flash_message = "Changes saved successfully!"
-        st.rerun()
+                if list(row.values) != list(original_row[meal_columns].values):
+                    updates.append({'id': entry_id, **row[meal_columns].to_dict()})
+        # Send the whole day's edits as one batch instead of one request per row.
+        # None means the rate limiter refused the save and has already shown why.
+        saved = db.apply_entry_changes(user.id, selected_date, inserts, updates, deleted_ids) if inserts or updates or deleted_ids else 0
+        if saved is not None:
+            st.session_state.flash_message = "Changes saved successfully!"
+            st.rerun()
 
 
 elif page == "Analytics Dashboard":
     st.title("📊 Your Analytics Dashboard")
     # ... (Analytics page logic from your file, with user.id passed to db call)
-    all_entries = db.get_all_entries(user.id)
-    if not all_entries:
+    # Only the selected window is fetched, so transfer size doesn't grow with account age.
+    st.radio("Date range", list(RANGE_PRESETS.keys()), index=1, horizontal=True, key="analytics_range")
+    summary_rows = page_data['summary']
+    if not summary_rows:
         st.warning("No data to display.")
     else:
-        df_all = pd.DataFrame.from_records(all_entries)
-        df_all['entry_date'] = pd.to_datetime(df_all['entry_date'])
-        daily_summary = df_all.groupby(df_all['entry_date'].dt.date).agg(
-            actual_calories=('calories', 'sum'), goal_calories=('goal_calories', 'first'),
-            actual_protein=('protein', 'sum'), goal_protein=('goal_protein', 'first'),
-            actual_carbs=('carbs', 'sum'), goal_carbs=('goal_carbs', 'first'),
-            actual_fats=('fats', 'sum'), goal_fats=('goal_fats', 'first')
-        ).reset_index()
-
-        st.subheader("Calorie Intake Over Time")
-        fig_calories = px.line(daily_summary, x='entry_date', y=['actual_calories', 'goal_calories'], title='Daily Calorie Intake vs. Goal')
-        st.plotly_chart(fig_calories, use_container_width=True)
-        
-        st.subheader("Protein Intake Over Time")
-        fig_protein = px.line(daily_summary, x='entry_date', y=['actual_protein', 'goal_protein'], title='Daily Protein Intake vs. Goal')
-        st.plotly_chart(fig_protein, use_container_width=True)
-
-        st.subheader("Carbohydrate Intake Over Time")
-        fig_carbs = px.line(daily_summary, x='entry_date', y=['actual_carbs', 'goal_carbs'], title='Daily Carbohydrate Intake vs. Goal')
-        st.plotly_chart(fig_carbs, use_container_width=True)
-
-        st.subheader("Fat Intake Over Time")
-        fig_fats = px.line(daily_summary, x='entry_date', y=['actual_fats', 'goal_fats'], title='Daily Fat Intake vs. Goal')
-        st.plotly_chart(fig_fats, use_container_width=True)
+        with metrics.timed("analytics.dataframe"):
+            daily_summary = pd.DataFrame.from_records(summary_rows)
+            daily_summary['entry_date'] = pd.to_datetime(daily_summary['entry_date'])
+
+        # --- Trends ---
+        user_trends = page_data['trends']
+        st.subheader("Trends")
+        st.caption(f"Averages and adherence count logged days only. A day meets a goal when intake is within {trends.GOAL_TOLERANCE:.0%} of it; streaks count consecutive days that do.")
+        df_trends = pd.DataFrame.from_dict(user_trends['macros'], orient='index')
+        df_trends.index = [label for _, label in charts.MACROS]
+        st.dataframe(df_trends, use_container_width=True, column_order=["avg_7", "avg_30", "adherence_7", "adherence_30", "current_streak", "best_streak"], column_config={
+            "avg_7": st.column_config.NumberColumn("7-day avg", format="%.0f"),
+            "avg_30": st.column_config.NumberColumn("30-day avg", format="%.0f"),
+            "adherence_7": st.column_config.NumberColumn("7-day adherence", format="%.0f%%"),
+            "adherence_30": st.column_config.NumberColumn("30-day adherence", format="%.0f%%"),
+            "current_streak": st.column_config.NumberColumn("Current streak (days)"),
+            "best_streak": st.column_config.NumberColumn("Best streak (days)")})
+
+        with metrics.timed("analytics.trends"):
+            df_rolling = pd.DataFrame({'entry_date': user_trends['rolling']['dates'], **{macro: user_trends['rolling'][macro] for macro in nutrition.MACROS}})
+            if range_start:
+                df_rolling = df_rolling[df_rolling['entry_date'] >= pd.Timestamp(range_start)]
+
+        st.subheader("Intake vs. Goals Over Time")
+        # One subplot figure, built once per data version and range and downsampled above the point limit.
+        with metrics.timed("analytics.figures"):
+            fig_intake = charts.get_intake_figure(user.id, data_version, str(range_start), daily_summary, st.secrets.get("CHART_MAX_POINTS", charts.DEFAULT_MAX_POINTS), df_rolling)
+        st.plotly_chart(fig_intake, use_container_width=True)
+
+        st.subheader("Weekly Summaries")
+        weeks = [week for week in reversed(user_trends['weekly']) if range_start is None or week['week_start'] + timedelta(days=6) >= range_start]
+        if weeks:
+            st.dataframe(pd.DataFrame.from_records(weeks), hide_index=True, use_container_width=True, column_config={
+                "week_start": st.column_config.DateColumn("Week of"),
+                "days_logged": st.column_config.NumberColumn("Days logged"),
+                **{f"avg_{macro}": st.column_config.NumberColumn(f"Avg {label}", format="%.0f") for macro, label in charts.MACROS},
+                **{f"adherence_{macro}": st.column_config.NumberColumn(f"{macro.capitalize()} adherence", format="%.0f%%") for macro, _ in charts.MACROS}})
+
+        # --- Meal History (loaded one page at a time) ---
+        st.subheader("Meal History")
+        if st.toggle("Show meals in this range"):
+            history_key = f'history_pages_{user.id}_{range_label}'
+            if history_key not in st.session_state:
+                st.session_state[history_key] = 1
+            history, after = [], None
+            for _ in range(st.session_state[history_key]):
+                page_rows = db.get_entries(user.id, range_start, after=after)
+                history.extend(page_rows)
+                after = db.next_cursor(page_rows)
+                if after is None:
+                    break
+            if history:
+                df_history = pd.DataFrame.from_records(history)
+                st.dataframe(df_history[['entry_date', 'description', 'calories', 'protein', 'carbs', 'fats']], hide_index=True, use_container_width=True)
+            else:
+                st.info("No meals were logged in this range.")
+            if after is not None and st.button("Load more"):
+                st.session_state[history_key] += 1
+                st.rerun()
 
 elif page == "Recipes":
     st.title("🍳 Your Recipe Book")
@@ -223,7 +283,18 @@ elif page == "Recipes":
             recipe_desc = st.text_area("Description")
             recipe_servings = st.number_input("Total Servings this Recipe Makes", min_value=0.1, step=0.5, value=1.0)
             
+            st.subheader("Ingredients")
+            st.caption("Optional. Pick foods from the built-in table with the grams used for the whole recipe, and the nutrition is calculated for you.")
+            foods = nutrition.load_foods()
+            recipe_ingredients = st.data_editor(
+                pd.DataFrame({'food': pd.Series(dtype=str), 'grams': pd.Series(dtype=float)}),
+                num_rows="dynamic", hide_index=True, key="new_recipe_ingredients",
+                column_config={
+                    "food": st.column_config.SelectboxColumn("Food", options=foods.names, required=True),
+                    "grams": st.column_config.NumberColumn("Grams", min_value=0.0, step=5.0, required=True)})
+
             st.subheader("Nutrition per Serving")
+            st.caption("Used only when no ingredients are listed.")
             c1, c2 = st.columns(2)
             recipe_cals = c1.number_input("Calories (kcal)", min_value=0)
             recipe_prot = c2.number_input("Protein (g)", min_value=0)
@@ -236,43 +307,160 @@ elif page == "Recipes":
             recipe_public = st.toggle("Make Recipe Public?", help="If enabled, other users will be able to see and use this recipe.")
 
             if st.form_submit_button("Save Recipe"):
-                nutrition = {'calories': recipe_cals, 'protein': recipe_prot, 'carbs': recipe_carbs, 'fats': recipe_fats}
-                db.add_recipe(user.id, recipe_name, recipe_desc, recipe_instr, recipe_servings, nutrition, recipe_public)
+                manual_nutrition = {'calories': recipe_cals, 'protein': recipe_prot, 'carbs': recipe_carbs, 'fats': recipe_fats}
+                ingredients = recipe_ingredients.dropna().to_dict('records')
+                db.add_recipe(user.id, recipe_name, recipe_desc, recipe_instr, recipe_servings, manual_nutrition, recipe_public, ingredients)
                 st.success(f"Recipe '{recipe_name}' saved successfully!")
                 st.rerun()
 
     # --- Display Recipes ---
+    def show_recipe_details(recipe, key_prefix):
+        """Renders a recipe's macros; the description and instructions are fetched only when asked for."""
+        st.markdown(f"**Nutrition per Serving:** {recipe['calories_per_serving']} kcal, {recipe['protein_per_serving']}g P, {recipe['carbs_per_serving']}g C, {recipe['fats_per_serving']}g F")
+        if st.toggle("Show description and instructions", key=f"{key_prefix}_details_{recipe['id']}"):
+            details = db.get_recipe_details(recipe['id'])
+            if details:
+                if details.get('ingredients'):
+                    st.markdown("**Ingredients:** " + ", ".join(f"{item['grams']:g} g {item['food']}" for item in details['ingredients']))
+                st.markdown(f"**Description:** {details['description']}")
+                st.markdown("**Instructions:**")
+                st.markdown(details['instructions'])
+
     my_recipes, public_recipes = st.tabs(["My Recipes", "Public Recipes"])
 
     with my_recipes:
         st.header("My Personal Recipes")
-        user_recipes = db.get_recipes(user.id)
+        my_query = st.text_input("Search my recipes", key="my_recipe_search")
+        user_recipes = db.search_recipes(user.id, my_query) if my_query else page_data['recipes']
         if not user_recipes:
-            st.info("You haven't added any recipes yet. Use the form above to get started!")
+            st.info("No recipes match your search." if my_query else "You haven't added any recipes yet. Use the form above to get started!")
         for recipe in user_recipes:
             with st.expander(f"{recipe['name']} ({recipe['servings_per_recipe']} servings)"):
-                st.markdown(f"**Description:** {recipe['description']}")
-                st.markdown(f"**Nutrition per Serving:** {recipe['calories_per_serving']} kcal, {recipe['protein_per_serving']}g P, {recipe['carbs_per_serving']}g C, {recipe['fats_per_serving']}g F")
-                st.markdown("**Instructions:**")
-                st.markdown(recipe['instructions'])
+                show_recipe_details(recipe, "my")
                 if st.button("Delete", key=f"del_{recipe['id']}"):
-                    db.delete_recipe(recipe['id'])
+                    db.delete_recipe(recipe['id'], user.id)
                     st.rerun()
 
     with public_recipes:
         st.header("Public Recipes from the Community")
-        all_public_recipes = db.get_public_recipes()
-        if not all_public_recipes:
-            st.info("No public recipes are available yet.")
-        for recipe in all_public_recipes:
+        c1, c2 = st.columns([3, 1])
+        public_query = c1.text_input("Search public recipes", key="public_recipe_search").strip()
+        page_size = c2.selectbox("Per page", [10, 20, 50], index=1, key="public_page_size")
+        # Cursors of the pages visited so far; reset whenever the search or page size changes.
+        cursor_key = f"public_cursors_{public_query}_{page_size}"
+        if st.session_state.get('public_cursor_key') != cursor_key:
+            st.session_state.public_cursor_key = cursor_key
+            st.session_state.public_cursors = [None]
+        cursors = st.session_state.public_cursors
+        page_recipes = db.get_public_recipes_page(public_query, cursors[-1], page_size)
+        if not page_recipes:
+            st.info("No public recipes match your search." if public_query else "No public recipes are available yet.")
+        for recipe in page_recipes:
              with st.expander(f"{recipe['name']} ({recipe['servings_per_recipe']} servings)"):
-                st.markdown(f"**Description:** {recipe['description']}")
-                st.markdown(f"**Nutrition per Serving:** {recipe['calories_per_serving']} kcal, {recipe['protein_per_serving']}g P, {recipe['carbs_per_serving']}g C, {recipe['fats_per_serving']}g F")
-                st.markdown("**Instructions:**")
-                st.markdown(recipe['instructions'])
+                show_recipe_details(recipe, "public")
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        if prev_col.button("Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        page_col.caption(f"Page {len(cursors)}")
+        next_page = db.next_cursor(page_recipes, page_size, db.RECIPE_CURSOR_KEYS)
+        if next_col.button("Next", disabled=next_page is None):
+            cursors.append(next_page)
+            st.rerun()
+
+elif page == "Import / Export":
+    st.title("📦 Import / Export")
+
+    st.header("Import Meal Entries")
+    st.caption(
+        "Upload a CSV, JSON Lines or JSON file with the columns entry_date, description, calories, protein, carbs, fats "
+        "and optionally goal_calories, goal_protein, goal_carbs, goal_fats. Goal columns set that day's goals; other days keep theirs. "
+        f"Rows are inserted {data_transfer.IMPORT_BATCH_SIZE} at a time, and each batch counts as one API call.")
+    uploaded = st.file_uploader("Entries file", type=["csv", "jsonl", "ndjson", "json"])
+    if uploaded and st.button("Import Entries"):
+        progress = st.empty()
+        text_stream = io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline="")
+        result = data_transfer.import_entries(
+            user.id, text_stream, data_transfer.detect_format(uploaded.name),
+            on_batch=lambda imported: progress.info(f"Imported {imported} entries so far..."))
+        progress.empty()
+        if result['unreadable']:
+            st.error(f"The file could not be read (is it UTF-8 {data_transfer.detect_format(uploaded.name).upper()}?): {result['unreadable']}")
+        if result['failed']:
+            st.error(f"The import stopped because a batch could not be saved: {result['failed']}. Re-upload the remaining rows to retry.")
+        st.success(f"Imported {result['imported']} entries.")
+        if result['stopped']:
+            st.warning("The import stopped because your daily API call limit was reached. Re-upload the remaining rows tomorrow.")
+        if result['errors']:
+            st.warning(f"Skipped {len(result['errors'])} invalid row(s).")
+            st.dataframe(pd.DataFrame(result['errors'][:1000], columns=["Row", "Problem"]), hide_index=True)
+
+    st.header("Export Your Data")
+    export_format = st.radio("Format", ["csv", "jsonl"], horizontal=True, format_func=lambda fmt: {"csv": "CSV", "jsonl": "JSON Lines"}[fmt])
+    # The export pages through the tables, so it is only built when asked for, and the files
+    # are kept for later reruns instead of being rebuilt on each one.
+    if st.button("Prepare Export Files"):
+        st.session_state.export_files = (export_format, datetime.now(),
+                                         "".join(data_transfer.export_entries(user.id, export_format)),
+                                         "".join(data_transfer.export_recipes(user.id, export_format)))
+    prepared = st.session_state.get('export_files')
+    if prepared and prepared[0] == export_format:
+        _, prepared_at, entries_file, recipes_file = prepared
+        st.caption(f"Prepared at {prepared_at:%H:%M}. Prepare the files again to include later changes.")
+        c1, c2 = st.columns(2)
+        c1.download_button("Download Entries", entries_file, file_name=f"entries.{export_format}")
+        c2.download_button("Download Recipes", recipes_file, file_name=f"recipes.{export_format}")
+
+elif page == "Performance" and is_master_admin:
+    st.title("⏱️ Performance")
+    st.caption(f"Timings are for this server process. The latest {len(metrics.reruns)} reruns and up to 1000 samples per function are kept.")
+
+    st.header("Connection")
+    # Checked on request only, so ordinary reruns don't pay an extra round trip.
+    if st.button("Check Database Connection"):
+        if db.check_connection():
+            st.success("The database is reachable.")
+        else:
+            st.error("The database is not reachable, even after reconnecting.")
+    if db.write_queue is not None:
+        queue_stats = db.write_queue.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Queued Writes", queue_stats['pending'])
+        c2.metric("Writes In Flight", queue_stats['in_flight'])
+        c3.metric("Failed Writes", queue_stats['failed'])
+
+    st.header("Database Calls")
+    db_summary = metrics.summary('db_calls')
+    if db_summary:
+        st.dataframe(pd.DataFrame(db_summary), hide_index=True, use_container_width=True)
+    else:
+        st.info("No database calls recorded yet.")
+
+    st.header("Render Sections")
+    section_summary = metrics.summary('sections')
+    if section_summary:
+        st.dataframe(pd.DataFrame(section_summary)[['name', 'count', 'p50_ms', 'p95_ms', 'total_s']], hide_index=True, use_container_width=True)
+
+    st.header("Caches")
+    st.dataframe(pd.DataFrame.from_dict({**db.cache_stats(), 'figures': charts.figure_cache.stats()}, orient='index'), use_container_width=True)
+
+    st.header("Recent Reruns")
+    if metrics.reruns:
+        recent = pd.DataFrame.from_records(list(metrics.reruns)[::-1])
+        recent['started'] = pd.to_datetime(recent['started'], unit='s')
+        st.dataframe(recent[['started', 'page', 'seconds', 'db_calls', 'db_seconds', 'cache_hits', 'cache_misses']], hide_index=True, use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    c1.download_button("Download Prometheus Metrics", metrics.render_prometheus({**db.cache_stats(), 'figures': charts.figure_cache.stats()}), file_name="tracker_metrics.prom")
+    if c2.button("Reset Timings"):
+        metrics.reset()
+        st.rerun()
 
 elif page == "Admin Panel" and is_master_admin:
     st.title("👑 Admin Panel")
+    if 'flash_message' in st.session_state:
+        st.success(st.session_state.flash_message)
+        del st.session_state.flash_message
     st.header("Pending User Approvals")
     
     pending_users = db.get_pending_users()
@@ -281,13 +469,59 @@ elif page == "Admin Panel" and is_master_admin:
         st.success("No users are currently awaiting approval.")
     else:
         st.info(f"You have {len(pending_users)} user(s) awaiting approval.")
-        for user in pending_users:
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.write(f"**Email:** {user['email']}")
-            with col2:
-                if st.button("Approve", key=f"approve_{user['id']}"):
-                    db.approve_user(user['id'])
-                    st.success(f"User {user['email']} approved!")
-                    st.rerun()
+        select_all = st.checkbox("Select all", key="approve_select_all")
+        pending_df = pd.DataFrame({'selected': select_all, 'email': [u['email'] for u in pending_users]}, index=[u['id'] for u in pending_users])
+        # The whole selection is approved or rejected with one update and one rerun.
+        selection = st.data_editor(
+            pending_df, hide_index=True, disabled=["email"], key=f"pending_users_{select_all}",
+            column_config={"selected": st.column_config.CheckboxColumn("Select"), "email": "Email"})
+        selected_ids = list(selection.index[selection['selected']])
+        approve_col, reject_col = st.columns(2)
+        if approve_col.button(f"Approve Selected ({len(selected_ids)})", disabled=not selected_ids):
+            db.set_users_approval(selected_ids, True)
+            st.session_state.flash_message = f"Approved {len(selected_ids)} user(s)."
+            st.rerun()
+        if reject_col.button(f"Reject Selected ({len(selected_ids)})", disabled=not selected_ids):
+            db.set_users_approval(selected_ids, False)
+            st.session_state.flash_message = f"Rejected {len(selected_ids)} user(s)."
+            st.rerun()
+
+    st.header("Users")
+    c1, c2, c3 = st.columns([3, 1, 1])
+    user_search = c1.text_input("Search by email", key="admin_user_search").strip()
+    user_status = c2.selectbox("Status", ["All", *[status.capitalize() for status in db.USER_STATUSES]], key="admin_user_status")
+    user_page_size = c3.selectbox("Per page", [25, 50, 100], index=1, key="admin_user_page_size")
+    status_filter = None if user_status == "All" else user_status.lower()
+    # Cursors of the pages visited so far; reset whenever a filter changes.
+    cursor_key = f"user_cursors_{user_search}_{user_status}_{user_page_size}"
+    if st.session_state.get('user_cursor_key') != cursor_key:
+        st.session_state.user_cursor_key = cursor_key
+        st.session_state.user_cursors = [None]
+    user_cursors = st.session_state.user_cursors
+    users_page = db.get_users_page(user_search, status_filter, user_cursors[-1], user_page_size)
+    if not users_page:
+        st.info("No users match these filters.")
+    else:
+        users_df = pd.DataFrame.from_records(users_page)
+        users_df['status'] = ['Approved' if row['is_approved'] else 'Rejected' if row['is_rejected'] else 'Pending' for row in users_page]
+        st.dataframe(
+            users_df[['email', 'status', 'entry_count', 'last_entry_date', 'last_active', 'calls_today']],
+            hide_index=True, use_container_width=True,
+            column_config={"email": "Email", "status": "Status", "entry_count": "Entries", "last_entry_date": "Last Logged Day",
+                           "last_active": "Last Active", "calls_today": "API Calls Today"})
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    if prev_col.button("Previous", key="users_previous", disabled=len(user_cursors) == 1):
+        user_cursors.pop()
+        st.rerun()
+    page_col.caption(f"Page {len(user_cursors)}")
+    next_users = db.next_cursor(users_page, user_page_size, db.USER_CURSOR_KEYS)
+    if next_col.button("Next", key="users_next", disabled=next_users is None):
+        user_cursors.append(next_users)
+        st.rerun()
 
+# --- Performance Instrumentation ---
+metrics.finish_rerun()
+metrics_file = st.secrets.get("METRICS_FILE")
+if metrics_file:
+    # Prometheus text file, e.g. for a node_exporter textfile collector.
+    metrics.write_prometheus(metrics_file, {**db.cache_stats(), 'figures': charts.figure_cache.stats()})
@@ -12,10 +12,9 @@ def show_auth_ui():
         user_email = st.session_state.user.email
         st.sidebar.write(f"Logged in as: {user_email}")
         if st.sidebar.button("Logout"):
+            # Clear this user's cached reads on logout
+            db.invalidate_user_cache(st.session_state.user.id)
             del st.session_state.user
-            # Clear user-specific caches on logout
-            db.get_entries_by_date.clear()
-            db.get_all_entries.clear()
             st.rerun()
         return st.session_state.user
 
@@ -0,0 +1,113 @@
+import heapq
+import re
+import threading
+from collections import OrderedDict
+from search_index import TokenIndex, tokenize
+
+MACROS = ['calories', 'protein', 'carbs', 'fats']
+# Matches the description of a meal logged from a recipe, e.g. "Oats (1.5 servings)".
+RECIPE_LOG_RE = re.compile(r"^(.*) \([\d.]+ servings\)$")
+# Recent (query, limit) results kept per index; any change to the index clears them.
+RESULT_CACHE_SIZE = 256
+
+
+class SuggestionIndex:
+    """
+    Autocomplete over recipe names and previously logged meal descriptions.
+    Each suggestion is a dict with text, kind ('recipe' or 'meal'), count (how often the
+    user logged it) and the macros of one serving (recipes) or of the last time it was
+    logged (meals). Matches rank by count, then alphabetically. Suggestions are added and
+    counted incrementally, so the index never needs a full rebuild after a write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}                # (kind, lowercase text) -> suggestion
+        self._index = TokenIndex()      # word-prefix index over the same keys
+        self._results = OrderedDict()   # (query, limit) -> results
+        self._ranked = None             # keys by rank, rebuilt lazily after changes
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, kind: str, text: str, macros: dict, count: int = 0):
+        """Adds a suggestion, or refreshes its macros and adds `count` to its uses if it exists."""
+        key = (kind, text.strip().lower())
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = {'text': text.strip(), 'kind': kind, 'count': 0}
+                self._index.add(key, text)
+            item.update({macro: macros[macro] for macro in MACROS})
+            item['count'] += count
+            self._changed()
+
+    def remove(self, kind: str, text: str):
+        key = (kind, text.strip().lower())
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self._index.remove(key)
+                self._changed()
+
+    def record_meal(self, description: str, macros: dict, count: int = 1):
+        """
+        Counts `count` uses of a logged meal. Meals logged from a recipe ("Name (n servings)")
+        count towards that recipe; anything else becomes a meal suggestion with these macros.
+        """
+        match = RECIPE_LOG_RE.match(description.strip())
+        if match:
+            key = ('recipe', match.group(1).strip().lower())
+            with self._lock:
+                item = self._items.get(key)
+                if item is not None:
+                    item['count'] += count
+                    self._changed()
+                    return
+        self.add('meal', description, macros, count)
+
+    def search(self, query: str, limit: int = 10, exclude: set = frozenset()):
+        """
+        Returns up to `limit` suggestions whose words match every word of `query` by prefix
+        (the most used ones for an empty query), skipping (kind, lowercase text) keys in `exclude`.
+        """
+        with self._lock:
+            cache_key = (query, limit, frozenset(exclude))
+            results = self._results.get(cache_key)
+            if results is None:
+                results = [dict(self._items[key]) for key in self._top(query, limit, exclude)]
+                self._results[cache_key] = results
+                while len(self._results) > RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+            else:
+                self._results.move_to_end(cache_key)
+            return [dict(item) for item in results]
+
+    def _top(self, query, limit, exclude):
+        # Caller must hold the lock.
+        if self._ranked is None:
+            self._ranked = sorted(self._items, key=self._rank)
+        matches = self._index.search(query) if tokenize(query) else None
+        if matches is not None and len(matches) * 8 < len(self._ranked):
+            # Few matches: rank just those.
+            return heapq.nsmallest(limit, (key for key in matches if key not in exclude), key=self._rank)
+        # Many matches: walk the ranking, which usually finds `limit` of them within a few steps.
+        top = []
+        for key in self._ranked:
+            if (matches is None or key in matches) and key not in exclude:
+                top.append(key)
+                if len(top) == limit:
+                    break
+        return top
+
+    def _rank(self, key):
+        return (-self._items[key]['count'], key[1])
+
+    def _changed(self):
+        # Caller must hold the lock.
+        self._results.clear()
+        self._ranked = None
+
+
+def suggestion_key(suggestion: dict):
+    """Returns the (kind, lowercase text) key of a suggestion, as used by `exclude`."""
+    return (suggestion['kind'], suggestion['text'].lower())
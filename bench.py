@@ -0,0 +1,294 @@
+"""
+Benchmarks the database layer and the app's pages against synthetic SQLite databases.
+Each size seeds one user with a history of entries (5 meals a day, ending today) and a
+catalog of public recipes, then measures latency, database calls and peak memory of the
+Daily Log, Analytics Dashboard and Recipes pages (run through Streamlit's AppTest) and of
+the main `database` reads and bulk writes. Results are printed as JSON.
+
+    python bench.py [--sizes 100:10,10000:1000,100000:10000] [--runs 5] [--out bench.json]
+    python bench.py --baseline bench.json [--max-slowdown 1.5]
+
+Sizes are ENTRIES:PUBLIC_RECIPES pairs. With --baseline, each p50 latency is compared to
+the same benchmark in an earlier result file; --max-slowdown makes the run exit with
+status 1 if any benchmark got slower than that ratio.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+import pandas as pd
+import streamlit
+from streamlit.testing.v1 import AppTest
+import database as db
+import charts
+from metrics import metrics
+from rate_limiter import InMemoryRateLimiter
+from sqlite_storage import SQLiteStorage
+
+DEFAULT_SIZES = "100:10,10000:1000,100000:10000"
+MEALS_PER_DAY = 5
+# Recipes owned by the benchmark user itself (the rest of the catalog belongs to another user).
+OWN_RECIPES = 20
+# Rows written by the bulk-save benchmarks.
+BULK_EDIT_ROWS = 20
+BULK_IMPORT_ROWS = 1000
+PAGES = ["Daily Log", "Analytics Dashboard", "Recipes"]
+APP_TIMEOUT = 120
+SEED_CHUNK = 5000
+
+MEALS = ["oatmeal", "chicken salad", "greek yogurt", "rice bowl", "salmon", "protein shake", "pasta", "omelette", "apple", "steak"]
+RECIPE_WORDS = ["spicy", "green", "chicken", "lentil", "curry", "baked", "salmon", "tofu", "quick", "soup", "bowl", "pasta", "vegan", "tomato", "garlic"]
+
+
+# --- Synthetic Data ---
+
+def _entry_rows(rng, user_id, count, end):
+    for i in range(count):
+        yield {'entry_date': str(end - timedelta(days=i // MEALS_PER_DAY)), 'description': rng.choice(MEALS),
+               'calories': rng.randint(100, 900), 'protein': rng.randint(0, 60), 'carbs': rng.randint(0, 120),
+               'fats': rng.randint(0, 40), 'user_id': user_id}
+
+
+def _recipe_row(rng, user_id, number, is_public):
+    return {'user_id': user_id, 'name': f"{' '.join(rng.sample(RECIPE_WORDS, 3)).title()} {number}",
+            'description': "Synthetic benchmark recipe.", 'instructions': "Mix and cook.",
+            'servings_per_recipe': rng.randint(1, 6), 'calories_per_serving': rng.randint(100, 900),
+            'protein_per_serving': rng.randint(0, 60), 'carbs_per_serving': rng.randint(0, 120),
+            'fats_per_serving': rng.randint(0, 40), 'is_public': is_public}
+
+
+def seed(path, entries, public_recipes, rng):
+    """Creates a database with a benchmark user, an admin and a recipe author; returns (backend, user, admin)."""
+    backend = SQLiteStorage(path)
+    user, admin, author = (backend.sign_up(f"{name}@bench.local", "bench") for name in ("user", "admin", "author"))
+    for account in (user, admin, author):
+        backend.approve_user(account.id)
+    rows = list(_entry_rows(rng, user.id, entries, date.today()))
+    for start in range(0, len(rows), SEED_CHUNK):
+        backend.insert_entries(rows[start:start + SEED_CHUNK])
+    # A goal override on every tenth logged day, defaults elsewhere.
+    days = sorted({row['entry_date'] for row in rows})
+    backend.upsert_user_preferences({'id': user.id, 'default_calories': 2200, 'default_protein': 140, 'default_carbs': 250, 'default_fats': 70})
+    backend.upsert_daily_goals([{'user_id': user.id, 'goal_date': day, 'calories': 2500, 'protein': 160, 'carbs': 280, 'fats': 80} for day in days[::10]])
+    for number in range(public_recipes):
+        backend.insert_recipe(_recipe_row(rng, author.id, number, True))
+    for number in range(OWN_RECIPES):
+        backend.insert_recipe(_recipe_row(rng, user.id, number, False))
+    return backend, user, admin
+
+
+# --- Measurement ---
+
+def clear_caches():
+    for cache in (db.entries_cache, db.preferences_cache, db.recipes_cache, db.suggestions_cache, db.trends_cache, charts.figure_cache):
+        cache.clear()
+
+
+def _db_call_count():
+    return sum(row['count'] for row in metrics.summary('db_calls'))
+
+
+def _stats(samples, db_calls, peak_bytes, extra=None):
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'db_calls': round(sum(db_calls) / len(db_calls), 2),
+        'peak_memory_kb': round(peak_bytes / 1024, 1),
+        **(extra or {}),
+    }
+
+
+def _peak_memory(function):
+    """Runs `function` once under tracemalloc (kept out of the timed runs) and returns its peak bytes."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, runs, setup=None):
+    """Times `function` over `runs` runs (calling `setup` untimed before each) and counts its database calls."""
+    samples, db_calls = [], []
+    for _ in range(runs):
+        if setup:
+            setup()
+        calls = _db_call_count()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+        db_calls.append(_db_call_count() - calls)
+    if setup:
+        setup()
+    return _stats(samples, db_calls, _peak_memory(function))
+
+
+def bench_database(user, runs, rng):
+    """Benchmarks the main `database` reads (cold and warm cache) and the bulk-save paths."""
+    today = date.today()
+    month_ago = today - timedelta(days=29)
+    month = pd.DataFrame.from_records(db.get_daily_summary(user.id, month_ago, today))
+    month['entry_date'] = pd.to_datetime(month['entry_date'])
+    reads = {
+        'get_entries_by_date': lambda: db.get_entries_by_date(today, user.id),
+        'get_daily_summary.30d': lambda: db.get_daily_summary(user.id, month_ago, today),
+        'get_daily_summary.all': lambda: db.get_daily_summary(user.id),
+        'get_intake_figure.30d': lambda: charts.get_intake_figure(user.id, db.data_version(user.id), str(month_ago), month, 500),
+        'iter_entries.all': lambda: sum(1 for _ in db.iter_entries(user.id)),
+        'get_recipes': lambda: db.get_recipes(user.id),
+        'search_recipes.public': lambda: db.search_recipes(user.id, "chicken cu", include_public=True),
+        'get_public_recipes_page': lambda: db.get_public_recipes_page("soup"),
+        'suggest_meals': lambda: db.suggest_meals(user.id, "chi"),
+        'get_trends': lambda: db.get_trends(user.id, today),
+    }
+    results = {}
+    for name, function in reads.items():
+        results[f"db.{name}.cold"] = measure(function, runs, setup=clear_caches)
+        function()
+        results[f"db.{name}.warm"] = measure(function, runs)
+
+    # Bulk saves write to a day far from the seeded history, so reads above aren't affected.
+    edit_day = today + timedelta(days=365)
+    meals = [{'description': rng.choice(MEALS), 'calories': 400, 'protein': 30, 'carbs': 40, 'fats': 10} for _ in range(BULK_EDIT_ROWS)]
+
+    def save_day():
+        existing = db.get_entries_by_date(edit_day, user.id)
+        updates = [{'id': row['id'], **meals[0]} for row in existing[:BULK_EDIT_ROWS // 2]]
+        deletes = [row['id'] for row in existing[BULK_EDIT_ROWS // 2:]]
+        db.apply_entry_changes.__wrapped__(user.id, edit_day, meals, updates, deletes)
+
+    import_day = today + timedelta(days=730)
+    batch = [{'entry_date': import_day, **meal, 'goals': None} for meal in meals * (BULK_IMPORT_ROWS // BULK_EDIT_ROWS)]
+    results['db.apply_entry_changes'] = measure(save_day, runs)
+    # Trends after a save refetch only the saved day, not the whole history.
+    db.get_trends(user.id, today)
+    results['db.get_trends.after_save'] = measure(lambda: db.get_trends(user.id, today), runs, setup=save_day)
+    results['db.add_entries_batch'] = measure(lambda: db.add_entries_batch.__wrapped__(user.id, batch), runs)
+    results['db.add_entries_batch']['rows_per_run'] = len(batch)
+    return results
+
+
+def _app(path, user, admin):
+    at = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), default_timeout=APP_TIMEOUT)
+    at.secrets['STORAGE_BACKEND'] = "sqlite"
+    at.secrets['SQLITE_PATH'] = path
+    at.secrets['RATE_LIMIT_BACKEND'] = "memory"
+    at.secrets['MASTER_USER_ID'] = admin.id
+    at.session_state['user'] = user
+    return at
+
+
+def bench_pages(path, user, admin, runs):
+    """Benchmarks full page reruns through AppTest, with cold caches and then warm ones."""
+    results = {}
+    for page in PAGES:
+        for temperature in ("cold", "warm"):
+            samples, db_calls, script_seconds = [], [], []
+            for run in range(runs + 1):
+                at = _app(path, user, admin).run()
+                if page != PAGES[0]:
+                    at.sidebar.radio[0].set_value(page)
+                if temperature == "cold":
+                    clear_caches()
+                else:
+                    at.run()
+                measured = run == runs   # the last pass only records peak memory
+                if measured:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                at.run()
+                elapsed = time.perf_counter() - start
+                if measured:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    continue
+                if at.exception:
+                    raise Exception(f"{page} failed: {at.exception[0].value}")
+                rerun = metrics.reruns[-1]
+                samples.append(elapsed)
+                db_calls.append(rerun['db_calls'])
+                script_seconds.append(rerun['seconds'])
+            results[f"page.{page}.{temperature}"] = _stats(samples, db_calls, peak, {'script_p50_ms': round(sorted(script_seconds)[len(script_seconds) // 2] * 1000, 3)})
+    return results
+
+
+# --- Reporting ---
+
+def compare(result, baseline):
+    """Returns {benchmark: p50 ratio to the baseline} for every benchmark present in both."""
+    previous = {(size['entries'], size['public_recipes'], name): stats for size in baseline['sizes'] for name, stats in size['benchmarks'].items()}
+    ratios = {}
+    for size in result['sizes']:
+        for name, stats in size['benchmarks'].items():
+            before = previous.get((size['entries'], size['public_recipes'], name))
+            if before and before['p50_ms'] > 0:
+                ratios[f"{size['entries']}:{size['public_recipes']} {name}"] = round(stats['p50_ms'] / before['p50_ms'], 3)
+    return ratios
+
+
+def parse_sizes(text):
+    sizes = []
+    for pair in text.split(","):
+        entries, _, recipes = pair.partition(":")
+        sizes.append((int(entries), int(recipes or 0)))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"ENTRIES:PUBLIC_RECIPES pairs (default {DEFAULT_SIZES}).")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per benchmark.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic data.")
+    parser.add_argument("--skip-pages", action="store_true", help="Only benchmark the database functions.")
+    parser.add_argument("--out", help="Also write the JSON result to this file.")
+    parser.add_argument("--baseline", help="An earlier result file to compare p50 latencies with.")
+    parser.add_argument("--max-slowdown", type=float, help="With --baseline, exit with status 1 if any p50 ratio is above this.")
+    args = parser.parse_args()
+
+    result = {'started': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'streamlit': streamlit.__version__, 'runs': args.runs, 'seed': args.seed, 'sizes': []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for entries, public_recipes in parse_sizes(args.sizes):
+            print(f"Seeding {entries} entries and {public_recipes} public recipes...", file=sys.stderr)
+            rng = random.Random(args.seed)
+            path = os.path.join(workdir, f"bench_{entries}_{public_recipes}.db")
+            start = time.perf_counter()
+            backend, user, admin = seed(path, entries, public_recipes, rng)
+            seed_seconds = time.perf_counter() - start
+            # Pages and direct calls share this module, so both run against the seeded backend.
+            db.use_storage(backend, InMemoryRateLimiter())
+            metrics.reset()
+            benchmarks = {} if args.skip_pages else bench_pages(path, user, admin, args.runs)
+            benchmarks.update(bench_database(user, args.runs, rng))
+            result['sizes'].append({'entries': entries, 'public_recipes': public_recipes, 'seed_seconds': round(seed_seconds, 3),
+                                    'db_file_kb': round(os.path.getsize(path) / 1024, 1), 'benchmarks': benchmarks})
+            backend.conn.close()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            result['p50_vs_baseline'] = compare(result, json.load(f))
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.baseline and args.max_slowdown:
+        slower = {name: ratio for name, ratio in result['p50_vs_baseline'].items() if ratio > args.max_slowdown}
+        if slower:
+            print(f"{len(slower)} benchmark(s) slower than {args.max_slowdown}x the baseline: {', '.join(sorted(slower))}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
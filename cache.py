@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class UserCache:
+    """
+    A bounded, thread-safe LRU cache whose keys are tuples starting with a user_id.
+    Entries expire after `ttl` seconds. Writes evict only the writer's keys instead of
+    clearing the cache for every logged-in user.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, on_lookup=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_lookup = on_lookup  # optional callback(hit: bool), e.g. for per-rerun metrics
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._keys_by_user = {}     # user_id -> set of keys, for targeted eviction
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (True, value) on a fresh hit, otherwise (False, None). The value is the cached object itself."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                hit, value = True, item[1]
+            else:
+                if item is not None:
+                    self._remove(key)
+                self.misses += 1
+                hit, value = False, None
+        if self.on_lookup:
+            self.on_lookup(hit)
+        return hit, value
+
+    def peek(self, key):
+        """Returns the fresh value for `key` or None, without counting a lookup or refreshing its LRU position."""
+        with self._lock:
+            item = self._data.get(key)
+            return item[1] if item is not None and item[0] > time.monotonic() else None
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, user_id, *key_prefix):
+        """Evicts every key of `user_id` that starts with `key_prefix` (all of them if empty)."""
+        with self._lock:
+            prefix = (user_id, *key_prefix)
+            for key in list(self._keys_by_user.get(user_id, ())):
+                if key[:len(prefix)] == prefix:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        """Returns hit/miss counters and the current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+    def _remove(self, key):
+        # Caller must hold the lock.
+        self._data.pop(key, None)
+        user_keys = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
+
+
+def user_cached(cache: UserCache, key_func, copy: bool = True):
+    """
+    Decorator that memoizes a read function in `cache`.
+    `key_func` receives the call's arguments and returns (user_id, *rest); the function
+    name is inserted after the user_id so `cache.invalidate(user_id, func_name)` works.
+    Lists and dicts are returned as copies, so callers can't change the cached rows; other
+    objects (indexes, figures) are shared and must be treated as read-only. With
+    `copy=False` the cached value itself is returned, for internal reads that never change it.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            user_id, *rest = key_func(*args, **kwargs)
+            key = (user_id, func.__name__, *rest)
+            hit, value = cache.get(key)
+            if not hit:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return _copy(value) if copy else value
+        return wrapper
+    return decorator
+
+
+def _copy(value):
+    """Copies nested lists and dicts (the shape of query rows); anything else is returned as is."""
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    return value
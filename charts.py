@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from cache import UserCache, user_cached
+
+# Above this many days, each "actual" series is downsampled with LTTB.
+DEFAULT_MAX_POINTS = 500
+
+MACROS = [
+    ('calories', 'Calories (kcal)'),
+    ('protein', 'Protein (g)'),
+    ('carbs', 'Carbohydrates (g)'),
+    ('fats', 'Fats (g)'),
+]
+
+# Built figures, keyed by (user_id, data version, range, max points); old versions age out.
+figure_cache = UserCache(maxsize=256, ttl=3600)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of `threshold` points
+    that preserve the visual shape of the (x, y) line; the first and last points are kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_start, next_end = end, min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def step_change_indices(y: np.ndarray) -> np.ndarray:
+    """Returns the indices where a step series changes value (plus both ends), which draws it exactly with line_shape='hv'."""
+    if len(y) <= 2:
+        return np.arange(len(y))
+    changed = np.flatnonzero(y[1:] != y[:-1]) + 1
+    return np.unique(np.concatenate(([0], changed, [len(y) - 1])))
+
+
+def build_intake_figure(daily_summary: pd.DataFrame, max_points: int = DEFAULT_MAX_POINTS, rolling: pd.DataFrame = None):
+    """
+    Builds one figure with a subplot per macro comparing daily intake to the goal.
+    Intake series longer than `max_points` are downsampled with LTTB; goal lines are
+    reduced to their change points, so they stay exact. `rolling` (entry_date plus one
+    column per macro) adds a 7-day average line, downsampled the same way.
+    """
+    dates = pd.to_datetime(daily_summary['entry_date']).to_numpy()
+    x_numeric = dates.astype('datetime64[D]').astype(np.float64)
+    fig = make_subplots(rows=len(MACROS), cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                        subplot_titles=[f"Daily {label} vs. Goal" for _, label in MACROS])
+    for row, (macro, label) in enumerate(MACROS, start=1):
+        actual = daily_summary[f'actual_{macro}'].to_numpy(dtype=np.float64)
+        goal = daily_summary[f'goal_{macro}'].to_numpy(dtype=np.float64)
+        keep = lttb_indices(x_numeric, actual, max_points)
+        fig.add_trace(go.Scatter(x=dates[keep], y=actual[keep], name="Actual", legendgroup="actual",
+                                 showlegend=row == 1, line=dict(color="#1f77b4")), row=row, col=1)
+        keep = step_change_indices(goal)
+        fig.add_trace(go.Scatter(x=dates[keep], y=goal[keep], name="Goal", legendgroup="goal", line_shape="hv",
+                                 showlegend=row == 1, line=dict(color="#ff7f0e", dash="dash")), row=row, col=1)
+        if rolling is not None and len(rolling):
+            rolling_dates = pd.to_datetime(rolling['entry_date']).to_numpy()
+            average = rolling[macro].to_numpy(dtype=np.float64)
+            # Windows without a logged day are gaps; LTTB needs finite values.
+            keep = lttb_indices(rolling_dates.astype('datetime64[D]').astype(np.float64), np.nan_to_num(average), max_points)
+            fig.add_trace(go.Scatter(x=rolling_dates[keep], y=average[keep], name="7-day average", legendgroup="rolling",
+                                     showlegend=row == 1, line=dict(color="#2ca02c", width=1)), row=row, col=1)
+        fig.update_yaxes(title_text=label, row=row, col=1)
+    fig.update_layout(height=250 * len(MACROS), margin=dict(t=40, b=20), hovermode="x unified")
+    return fig
+
+
+@user_cached(figure_cache, lambda user_id, data_version, range_key, daily_summary, max_points=DEFAULT_MAX_POINTS, rolling=None: (user_id, data_version, range_key, max_points, rolling is not None))
+def get_intake_figure(user_id: str, data_version: int, range_key: str, daily_summary: pd.DataFrame, max_points: int = DEFAULT_MAX_POINTS, rolling: pd.DataFrame = None):
+    """Returns the cached intake figure for this user's data version and range, building it on a miss."""
+    return build_intake_figure(daily_summary, max_points, rolling)
@@ -0,0 +1,199 @@
+import csv
+import io
+import json
+from datetime import date
+import database as db
+
+# Rows sent per insert request (and charged as one API call) during imports.
+IMPORT_BATCH_SIZE = 5000
+# Rows read per request while exporting.
+EXPORT_PAGE_SIZE = 1000
+
+MACRO_COLUMNS = ['calories', 'protein', 'carbs', 'fats']
+GOAL_COLUMNS = ['goal_calories', 'goal_protein', 'goal_carbs', 'goal_fats']
+ENTRY_EXPORT_COLUMNS = ['entry_date', 'description', *MACRO_COLUMNS, *GOAL_COLUMNS]
+RECIPE_EXPORT_COLUMNS = ['name', 'description', 'instructions', 'servings_per_recipe', 'calories_per_serving', 'protein_per_serving', 'carbs_per_serving', 'fats_per_serving', 'is_public']
+
+
+def detect_format(filename: str) -> str:
+    """Returns 'csv', 'jsonl' or 'json' from a file name's extension."""
+    name = filename.lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+
+# --- Import ---
+
+def read_rows(text_stream, fmt: str):
+    """
+    Yields raw row dicts from a text stream. CSV and JSON Lines are read one line at a time;
+    a plain JSON file must hold a list of objects and is parsed in one go.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(text_stream)
+    elif fmt == 'jsonl':
+        for line in text_stream:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'json':
+        rows = json.load(text_stream)
+        if not isinstance(rows, list):
+            raise ValueError("a JSON file must hold a list of objects")
+        yield from rows
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def validate_entry(row: dict, goals_by_date: dict):
+    """
+    Coerces a raw row the same way `add_entry` does (integer macros and goals) and returns
+    an entry dict for `db.add_entries_batch`. Raises ValueError with a readable message.
+    The first goals seen for a date become that day's goals; dates whose rows have no goal
+    columns keep their existing goals.
+    """
+    try:
+        entry_date = date.fromisoformat(str(row.get('entry_date', '')).strip()[:10])
+    except ValueError:
+        raise ValueError(f"invalid entry_date {row.get('entry_date')!r}")
+    description = str(row.get('description') or '').strip()
+    if not description:
+        raise ValueError("description is empty")
+    entry = {'entry_date': entry_date, 'description': description}
+    for column in MACRO_COLUMNS:
+        entry[column] = _non_negative_int(row.get(column), column)
+    if entry_date not in goals_by_date:
+        if all(row.get(column) not in (None, '') for column in GOAL_COLUMNS):
+            goals_by_date[entry_date] = {column[len('goal_'):]: _non_negative_int(row[column], column) for column in GOAL_COLUMNS}
+        else:
+            goals_by_date[entry_date] = None
+    if goals_by_date[entry_date]:
+        entry['goals'] = goals_by_date[entry_date]
+    return entry
+
+
+def import_entries(user_id: str, text_stream, fmt: str, batch_size: int = IMPORT_BATCH_SIZE, insert_batch=None, on_batch=None):
+    """
+    Streams rows from `text_stream`, validates them and inserts them in batches of `batch_size`.
+    `insert_batch(user_id, entries)` defaults to the rate-limited `db.add_entries_batch`
+    (one API call per batch); it returns None when the rate limiter refuses the batch and
+    raises on any other failure. `on_batch(imported_so_far)` is called after each batch.
+    Returns {'imported': int, 'errors': [(row_number, message)], 'stopped': bool, 'unreadable': str,
+    'failed': str}, where `stopped` means the rate limit was hit before the whole file was
+    imported, `failed` (None unless it happened) says why a batch could not be saved, and
+    `unreadable` (None if the whole file was read) says why reading stopped early, e.g. a
+    file that isn't UTF-8 or valid JSON. Rows read before that point are still imported.
+    """
+    insert_batch = insert_batch or db.add_entries_batch
+    result = {'imported': 0, 'errors': [], 'stopped': False, 'unreadable': None, 'failed': None}
+    goals_by_date, batch = {}, []
+
+    def flush():
+        try:
+            inserted = insert_batch(user_id, batch)
+        except Exception as e:  # Storage error: stop, keeping the batches already saved.
+            result['failed'] = str(e)
+            return False
+        if inserted is None:  # The rate limiter refused the call.
+            result['stopped'] = True
+            return False
+        result['imported'] += inserted
+        batch.clear()
+        if on_batch:
+            on_batch(result['imported'])
+        return True
+
+    for row_number, row in _readable_rows(read_rows(text_stream, fmt), result):
+        try:
+            batch.append(validate_entry(row, goals_by_date))
+        except (ValueError, TypeError, AttributeError) as e:
+            result['errors'].append((row_number, str(e)))
+            continue
+        if len(batch) >= batch_size and not flush():
+            return result
+    if batch:
+        flush()
+    return result
+
+
+def _readable_rows(rows, result):
+    """Yields (row_number, row) until the file can't be decoded or parsed, recording why in `result`."""
+    row_number = 0
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, row
+    except (ValueError, csv.Error) as e:
+        result['unreadable'] = str(e)
+        result['errors'].append((row_number + 1, f"could not read the file: {e}"))
+
+
+def _non_negative_int(value, column):
+    try:
+        number = int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{column} cannot be negative")
+    return number
+
+
+# --- Export ---
+
+def iter_entry_rows(user_id: str, page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Yields a user's entries, newest first, one page per request (bypasses the read caches).
+    Days with their own goals get goal_* columns, so re-importing the file restores them.
+    """
+    goals_by_date = {row['goal_date']: row for row in db.storage.get_daily_goals(user_id)}
+    after = None
+    while True:
+        page = db.storage.get_entries_page(user_id, after=after, limit=page_size)
+        for row in page:
+            goals = goals_by_date.get(row['entry_date'])
+            yield {**row, **{column: goals[column[len('goal_'):]] for column in GOAL_COLUMNS}} if goals else row
+        after = db.next_cursor(page, page_size)
+        if after is None:
+            return
+
+
+def iter_recipe_rows(user_id: str, page_size: int = EXPORT_PAGE_SIZE):
+    """Yields a user's full recipe rows ordered by id, one page per request."""
+    after_id = None
+    while True:
+        page = db.storage.get_recipes_page(user_id, after_id, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]['id']
+
+
+def export_rows(rows, columns: list, fmt: str):
+    """
+    Yields the rows serialized as text chunks (CSV with a header, or JSON Lines), one chunk
+    per row, so callers can write them to a file without holding the whole export in memory.
+    """
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps({column: row.get(column) for column in columns}) + "\n"
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def export_entries(user_id: str, fmt: str = 'csv'):
+    return export_rows(iter_entry_rows(user_id), ENTRY_EXPORT_COLUMNS, fmt)
+
+
+def export_recipes(user_id: str, fmt: str = 'csv'):
+    return export_rows(iter_recipe_rows(user_id), RECIPE_EXPORT_COLUMNS, fmt)
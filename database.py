@@ -1,26 +1,143 @@
 import streamlit as st
-from supabase import create_client, Client
-from datetime import date
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import date, timedelta
 from functools import wraps
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from cache import UserCache, user_cached
+from rate_limiter import InMemoryRateLimiter, StorageRateLimiter, DeferredRateLimiter, utc_today
+from search_index import TokenIndex
+import nutrition as nutrition_engine
+from autocomplete import SuggestionIndex, suggestion_key
+from trends import TrendEngine
+from metrics import metrics, InstrumentedStorage
+from storage import Storage, RECIPE_SUMMARY_COLUMNS
+from write_queue import WriteQueue, WriteBehindWorker, new_client_key
 
-# --- Supabase Initialization ---
-def init_connection():
-    """Initializes the connection to the Supabase database."""
+# --- Storage Initialization ---
+@st.cache_resource(show_spinner=False)
+def _shared_backend(backend: str, location: str, key: str = None, pool_size: int = None):
+    """
+    Creates one backend per process, kept across reruns and module reloads. Nothing
+    connects here: the Supabase client and its keep-alive pool are built on first use.
+    """
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage(location)
+    from supabase_storage import SupabaseStorage, POOL_CONNECTIONS
+    return SupabaseStorage(location, key, int(pool_size or POOL_CONNECTIONS))
+
+def init_storage():
+    """
+    Returns the storage backend selected by the STORAGE_BACKEND secret.
+    'supabase' (default) uses SUPABASE_URL/SUPABASE_KEY (and SUPABASE_POOL_SIZE connections);
+    'sqlite' uses SQLITE_PATH (default "tracker.db") for offline runs and benchmarks.
+    Every call is timed by `metrics`.
+    """
     try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_KEY"]
-        return create_client(url, key)
+        backend = st.secrets.get("STORAGE_BACKEND", "supabase")
+        if backend == "sqlite":
+            return InstrumentedStorage(_shared_backend("sqlite", st.secrets.get("SQLITE_PATH", "tracker.db")), metrics)
+        return InstrumentedStorage(_shared_backend("supabase", st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"], st.secrets.get("SUPABASE_POOL_SIZE")), metrics)
     except Exception as e:
-        st.error(f"Error connecting to Supabase: {e}")
+        st.error(f"Error connecting to the database: {e}")
         return None
 
-supabase: Client = init_connection()
+storage: Storage = init_storage()
+
+def check_connection() -> bool:
+    """Runs the backend's health check, reconnecting with backoff if it fails."""
+    if not storage:
+        return False
+    return storage.health_check() or storage.reconnect()
+
+# --- Per-User Read Caches ---
+# Keys are (user_id, function_name, *args), so a write only evicts the writer's entries.
+entries_cache = UserCache(maxsize=2048, ttl=60, on_lookup=lambda hit: metrics.record_cache('entries', hit))
+preferences_cache = UserCache(maxsize=1024, ttl=300, on_lookup=lambda hit: metrics.record_cache('preferences', hit))
+# Recipe listings plus their name index, keyed by owner (PUBLIC_RECIPES for the shared catalog).
+recipes_cache = UserCache(maxsize=1024, ttl=300, on_lookup=lambda hit: metrics.record_cache('recipes', hit))
+PUBLIC_RECIPES = '__public__'
+# Per-user autocomplete indexes; writes update them in place, so they can live long.
+suggestions_cache = UserCache(maxsize=512, ttl=3600, on_lookup=lambda hit: metrics.record_cache('suggestions', hit))
+# Per-user trend engines; writes mark the days to refresh instead of evicting them.
+trends_cache = UserCache(maxsize=512, ttl=3600, on_lookup=lambda hit: metrics.record_cache('trends', hit))
+
+# Per-user data versions, bumped on every entry write; next() on a count is atomic.
+_data_versions = {}
+_version_counter = itertools.count(1)
+
+def invalidate_user_cache(user_id: str):
+    """Drops every cached read for one user (used on logout)."""
+    entries_cache.invalidate(user_id)
+    preferences_cache.invalidate(user_id)
+    recipes_cache.invalidate(user_id)
+    suggestions_cache.invalidate(user_id)
+    trends_cache.invalidate(user_id)
+    with _trends_lock:
+        _trend_changes.pop(user_id, None)
+
+def cache_stats():
+    """Returns hit/miss counters for each read cache."""
+    return {'entries': entries_cache.stats(), 'preferences': preferences_cache.stats(), 'recipes': recipes_cache.stats(),
+            'suggestions': suggestions_cache.stats(), 'trends': trends_cache.stats()}
+
+# --- Rate Limiting ---
+def init_rate_limiter():
+    """Creates the rate-limiter backend selected by the RATE_LIMIT_BACKEND secret ('supabase' or 'memory')."""
+    try:
+        backend = st.secrets.get("RATE_LIMIT_BACKEND", "supabase")
+    except Exception:
+        backend = "supabase"
+    if backend == "memory":
+        return InMemoryRateLimiter()
+    return StorageRateLimiter(storage)
+
+def _deferred(limiter):
+    """Returns the limiter for queued writes: a local count in front of a storage-backed limiter."""
+    return DeferredRateLimiter(limiter) if isinstance(limiter, StorageRateLimiter) else limiter
+
+rate_limiter = init_rate_limiter()
+queued_rate_limiter = _deferred(rate_limiter)
+
+def use_storage(new_storage: Storage, limiter=None):
+    """Swaps in another storage backend (e.g. SQLiteStorage(":memory:") for tests and benchmarks)."""
+    global storage, rate_limiter, queued_rate_limiter
+    storage = InstrumentedStorage(new_storage, metrics)
+    rate_limiter = limiter or StorageRateLimiter(storage)
+    queued_rate_limiter = _deferred(rate_limiter)
+    entries_cache.clear()
+    preferences_cache.clear()
+    recipes_cache.clear()
+    suggestions_cache.clear()
+    trends_cache.clear()
+    with _trends_lock:
+        _trend_changes.clear()
 
-# --- Rate Limiting Decorator ---
 def rate_limit_check(func):
     """
-    A decorator that checks and updates API call counts for non-master users.
+    A decorator that charges one API call to non-master users before running a write.
+    """
+    return _rate_limited(func, queueable=False)
+
+def queued_rate_limit_check(func):
     """
+    Like `rate_limit_check`, for writes that go to the write-behind queue when it is on.
+    Their calls are then counted locally, without a round trip, and charged to the backend
+    when the worker flushes them, so a network outage can't refuse or lose the edit.
+    """
+    return _rate_limited(func, queueable=True)
+
+def batch_rate_limit_check(func):
+    """
+    Like `rate_limit_check`, for batch jobs that report their own errors (imports): a failed
+    limit check raises instead of being shown, so None only ever means the limit was reached.
+    """
+    return _rate_limited(func, queueable=False, raise_errors=True)
+
+def _rate_limited(func, queueable: bool, raise_errors: bool = False):
     @wraps(func)
     def wrapper(*args, **kwargs):
         # Get the user from session state to perform the rate limit check.
@@ -36,117 +153,382 @@ def rate_limit_check(func):
             return func(*args, **kwargs)
 
         # --- Regular User Rate Limiting Logic ---
-        profile = supabase.table('profiles').select('*').eq('id', user_id).single().execute().data
-        if not profile:
-            raise Exception("User profile not found.")
-
-        today = date.today().isoformat()
-        last_call_date = profile.get('last_api_call_date')
-        api_calls = profile.get('api_call_count', 0)
-
-        if last_call_date != today:
-            # First call of the day, reset counter
-            api_calls = 0
-            supabase.table('profiles').update({
-                'last_api_call_date': today,
-                'api_call_count': 1
-            }).eq('id', user_id).execute()
-        elif api_calls >= 50:
-            # Limit reached
-            st.error("API call limit (50/day) reached. Please try again tomorrow.")
+        # The backend checks and increments the counter in one atomic step; queued writes
+        # are counted locally and journal a charge that the worker settles with the backend.
+        queued = queueable and write_queue is not None
+        limiter = queued_rate_limiter if queued else rate_limiter
+        try:
+            allowed = limiter.consume(user_id)
+        except Exception as e:
+            if raise_errors:
+                raise Exception(f"Could not check your API call limit: {e}") from e
+            st.error(f"Could not check your API call limit: {e}")
+            return None
+        if not allowed:
+            st.error(f"API call limit ({limiter.limit}/day) reached. Please try again tomorrow.")
             return None # Stop execution
-        else:
-            # Increment counter
-            supabase.table('profiles').update({
-                'api_call_count': api_calls + 1
-            }).eq('id', user_id).execute()
 
-        return func(*args, **kwargs)
+        result = func(*args, **kwargs)
+        if queued and limiter is not rate_limiter:
+            write_queue.enqueue(user_id, 'charge', {'calls': 1})
+        return result
     return wrapper
 
+# --- Concurrent Page Loading ---
+# Threads shared by every session for issuing a page's independent reads at the same time.
+PAGE_LOAD_WORKERS = 16
+# Seconds to wait for each read before giving up on the page.
+PAGE_LOAD_TIMEOUT = 15
+_page_loader = ThreadPoolExecutor(max_workers=PAGE_LOAD_WORKERS, thread_name_prefix="page-loader")
+
+def load_page_data(calls: dict, timeout: float = PAGE_LOAD_TIMEOUT) -> dict:
+    """
+    Runs a page's independent read calls concurrently and returns {name: result} once all
+    have finished, so a cold page waits for about one round trip instead of one per query.
+    `calls` maps a name to a (function, *args) tuple. Every call is waited for (up to `timeout`
+    seconds in total) before any failure is raised, so the reads that succeeded still land in
+    their caches; the Exception names each read that failed or timed out.
+    """
+    ctx, rerun = get_script_run_ctx(), metrics.current_rerun()
+
+    def run(function, *args):
+        # Workers carry the session's script context and count their calls against its rerun.
+        add_script_run_ctx(threading.current_thread(), ctx)
+        with metrics.attach_rerun(rerun):
+            return function(*args)
+
+    futures = {name: _page_loader.submit(run, *call) for name, call in calls.items()}
+    # All calls start together, so one deadline bounds each of them by `timeout`.
+    deadline = time.monotonic() + timeout
+    results, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            errors[name] = Exception(f"took longer than {timeout} seconds")
+        except Exception as e:
+            errors[name] = e
+    if errors:
+        failures = "; ".join(f"{name}: {error}" for name, error in errors.items())
+        raise Exception(f"Could not load page data ({failures}).") from next(iter(errors.values()))
+    return results
+
 # --- User Authentication Functions ---
 
 def create_user(email, password):
-    res = supabase.auth.sign_up({"email": email, "password": password})
-    if res.user:
-        return res.user
-    raise Exception(res.error.message if res.error else "Could not create user.")
+    return storage.sign_up(email, password)
 
 def login_user(email, password):
-    res = supabase.auth.sign_in_with_password({"email": email, "password": password})
-    if not res.user:
-        raise Exception(res.error.message if res.error else "Invalid login credentials.")
+    user = storage.sign_in(email, password)
     
     # Check if user is approved
-    profile = supabase.table('profiles').select('is_approved').eq('id', res.user.id).single().execute().data
+    profile = storage.get_profile(user.id)
+    if profile and profile.get('is_rejected'):
+        raise Exception("Your account request was declined.")
     if not profile or not profile.get('is_approved'):
         raise Exception("Account is pending admin approval.")
     
-    return res.user
+    return user
 
 # --- Data Functions (now protected by rate limiter) ---
 
 # READ functions are protected by caching.
 
-@st.cache_data(ttl=60)
+@user_cached(entries_cache, lambda entry_date, user_id: (user_id, entry_date.isoformat()))
+def _get_stored_entries_by_date(entry_date: date, user_id: str):
+    return storage.get_entries_by_date(user_id, entry_date.isoformat())
+
 def get_entries_by_date(entry_date: date, user_id: str):
-    response = supabase.table('entries').select("*").eq('entry_date', entry_date.isoformat()).eq('user_id', user_id).order('id').execute()
-    return response.data
+    """Returns a day's entries, including queued writes that haven't reached the database yet."""
+    rows = _get_stored_entries_by_date(entry_date, user_id)
+    if write_queue is None:
+        return rows
+    return _overlay_entries(rows, write_queue.pending(user_id, entry_date.isoformat(), ENTRY_OPS))
+
+# Rows per request when paging through entry history; kept below Supabase's default max-rows cap.
+ENTRY_PAGE_SIZE = 500
+
+@user_cached(entries_cache, lambda user_id, start=None, end=None, after=None, limit=ENTRY_PAGE_SIZE: (user_id, str(start), str(end), after, limit))
+def get_entries(user_id: str, start: date = None, end: date = None, after: tuple = None, limit: int = ENTRY_PAGE_SIZE):
+    """
+    Returns one page of a user's entries between `start` and `end` (inclusive), newest first.
+    Pass `next_cursor(page)` of the previous page as `after` to fetch the following page.
+    """
+    return storage.get_entries_page(user_id, start.isoformat() if start else None, end.isoformat() if end else None, after, limit)
+
+def next_cursor(page: list, limit: int = ENTRY_PAGE_SIZE, keys: tuple = ('entry_date', 'id')):
+    """Returns the keyset cursor (entry_date, id by default) after `page`, or None if it was the last page."""
+    if len(page) < limit:
+        return None
+    return tuple(page[-1][key] for key in keys)
+
+def iter_entries(user_id: str, start: date = None, end: date = None, page_size: int = ENTRY_PAGE_SIZE):
+    """Streams every entry in the range page by page, so long histories are never truncated."""
+    after = None
+    while True:
+        page = get_entries(user_id, start, end, after, page_size)
+        yield from page
+        after = next_cursor(page, page_size)
+        if after is None:
+            return
 
-@st.cache_data(ttl=60)
 def get_all_entries(user_id: str):
-    response = supabase.table('entries').select("*").eq('user_id', user_id).order('entry_date', desc=True).execute()
-    return response.data
+    """Returns every entry of a user, newest first. Prefer `get_entries` with a date range."""
+    return list(iter_entries(user_id))
+
+@user_cached(entries_cache, lambda user_id, start=None, end=None: (user_id, str(start), str(end)))
+def _get_stored_daily_summary(user_id: str, start: date = None, end: date = None):
+    rows = storage.get_daily_summary(user_id, start.isoformat() if start else None, end.isoformat() if end else None)
+    # Users who never saved default goals get DEFAULT_GOALS.
+    for row in rows:
+        for macro, goal in DEFAULT_GOALS.items():
+            if row[f'goal_{macro}'] is None:
+                row[f'goal_{macro}'] = goal
+    return rows
+
+def get_daily_summary(user_id: str, start: date = None, end: date = None, fresh: bool = False):
+    """
+    Returns per-day totals and goals between `start` and `end` (inclusive, open-ended if None),
+    aggregated by the database so only one row per day is transferred.
+    Days with queued writes are re-totalled from their pending entries.
+    With `fresh`, the stored totals are read from the database rather than the cache.
+    """
+    rows = (_get_stored_daily_summary.__wrapped__ if fresh else _get_stored_daily_summary)(user_id, start, end)
+    if write_queue is None:
+        return rows
+    days = {day for day in write_queue.pending_dates(user_id, ENTRY_OPS)
+            if (start is None or day >= start.isoformat()) and (end is None or day <= end.isoformat())}
+    if not days:
+        return rows
+    by_date = {row['entry_date']: row for row in rows}
+    for day in days:
+        entries = get_entries_by_date(date.fromisoformat(day), user_id)
+        if not entries:
+            by_date.pop(day, None)
+            continue
+        row = dict(by_date.get(day) or {'entry_date': day, **{f'goal_{macro}': goal for macro, goal in get_goals_for_date(user_id, date.fromisoformat(day)).items()}})
+        for macro in DEFAULT_GOALS:
+            row[f'actual_{macro}'] = sum(entry[macro] for entry in entries)
+        by_date[day] = row
+    return [by_date[day] for day in sorted(by_date)]
+
+def rebuild_daily_totals(user_id: str = None):
+    """Recomputes the daily_totals rollup from entries (all users if `user_id` is None)."""
+    storage.rebuild_daily_totals(user_id)
+    if user_id is None:
+        entries_cache.clear()
+        trends_cache.clear()
+    else:
+        _invalidate_entries(user_id)
+
+def data_version(user_id: str) -> int:
+    """Returns a number that changes whenever the user's entries or goals are written (for caching derived data)."""
+    return _data_versions.get(user_id, 0)
+
+def _data_changed(user_id: str, start: date = None, end: date = None):
+    """
+    Bumps the user's data version and notes the changed days (`start` to `end`, or every day
+    if `start` is None) for the trend engine, which refreshes just those days on its next read.
+    """
+    with _trends_lock:
+        if user_id in _trend_changes:
+            changed = _trend_changes[user_id]
+            if start is None or changed is None:
+                _trend_changes[user_id] = None
+            else:
+                end = end or start
+                _trend_changes[user_id] = (min(start, changed[0]), max(end, changed[1])) if changed else (start, end)
+        _data_versions[user_id] = next(_version_counter)
+
+def _invalidate_entries(user_id: str, entry_date: date = None):
+    """Evicts a user's cached entry reads; only one day's key if `entry_date` is known."""
+    if entry_date is None:
+        entries_cache.invalidate(user_id, '_get_stored_entries_by_date')
+    else:
+        entries_cache.invalidate(user_id, '_get_stored_entries_by_date', entry_date.isoformat())
+    entries_cache.invalidate(user_id, 'get_entries')
+    entries_cache.invalidate(user_id, '_get_stored_daily_summary')
+    # Only after eviction, so a rerun that sees the new version can't reread stale summaries.
+    _data_changed(user_id, entry_date)
 
 # WRITE functions are protected by the rate limiter.
 
-@rate_limit_check
-def add_entry(entry_date: date, description: str, calories: float, protein: float, carbs: float, fats: float, goals: dict, user_id: str):
-    entry = {'entry_date': str(entry_date), 'description': description, 'calories': int(calories), 'protein': int(protein), 'carbs': int(carbs), 'fats': int(fats), 'goal_calories': int(goals['calories']), 'goal_protein': int(goals['protein']), 'goal_carbs': int(goals['carbs']), 'goal_fats': int(goals['fats']), 'user_id': user_id}
-    supabase.table('entries').insert(entry).execute()
-    get_entries_by_date.clear()
-    get_all_entries.clear()
+def _entry_row(entry_date: date, description: str, calories: float, protein: float, carbs: float, fats: float, user_id: str):
+    """Builds an `entries` row, coercing macros to the integer columns."""
+    return {'entry_date': str(entry_date), 'description': description, 'calories': int(calories), 'protein': int(protein), 'carbs': int(carbs), 'fats': int(fats), 'user_id': user_id}
 
-@rate_limit_check
-def delete_entry(entry_id: int, user_id: str): # user_id is passed for the decorator
-    supabase.table('entries').delete().eq('id', entry_id).execute()
-    get_entries_by_date.clear()
-    get_all_entries.clear()
+@queued_rate_limit_check
+def add_entry(entry_date: date, description: str, calories: float, protein: float, carbs: float, fats: float, user_id: str):
+    entry = _entry_row(entry_date, description, calories, protein, carbs, fats, user_id)
+    if write_queue is not None:
+        _queue_entry_changes(user_id, entry_date, [entry], [], [])
+        _index_meals(user_id, [entry])
+        return
+    storage.insert_entries([entry])
+    _index_meals(user_id, [entry])
+    _invalidate_entries(user_id, entry_date)
 
-@rate_limit_check
-def update_entry(entry_id: int, description: str, calories: float, protein: float, carbs: float, fats: float, user_id: str):
+@queued_rate_limit_check
+def delete_entry(entry_id: int, user_id: str, entry_date: date = None): # user_id is passed for the decorator
+    """Deletes an entry. With write-behind on, pass its `entry_date` if known so reads hide it before the flush."""
+    if write_queue is not None:
+        _queue_entry_changes(user_id, entry_date or _queued_entry_date(entry_id), [], [], [entry_id])
+        return
+    storage.delete_entries(user_id, [int(entry_id)])
+    _invalidate_entries(user_id)
+
+@queued_rate_limit_check
+def update_entry(entry_id: int, description: str, calories: float, protein: float, carbs: float, fats: float, user_id: str, entry_date: date = None):
+    """Updates an entry's description and macros. With write-behind on, pass its `entry_date` if known so reads show the edit before the flush."""
     update_data = {'description': description, 'calories': int(calories), 'protein': int(protein), 'carbs': int(carbs), 'fats': int(fats)}
-    supabase.table('entries').update(update_data).eq('id', entry_id).execute()
-    get_entries_by_date.clear()
-    get_all_entries.clear()
+    if write_queue is not None:
+        _queue_entry_changes(user_id, entry_date or _queued_entry_date(entry_id), [], [(entry_id, update_data)], [])
+        return
+    storage.update_entry(int(entry_id), update_data)
+    _invalidate_entries(user_id)
+
+@queued_rate_limit_check
+def apply_entry_changes(user_id: str, entry_date: date, inserts: list, updates: list, deletes: list):
+    """
+    Saves a batch of meal edits for one day, counted as a single API call.
+    `inserts` and `updates` are lists of dicts with description/calories/protein/carbs/fats
+    (updates also carry the entry 'id'); `deletes` is a list of entry ids.
+    Sends at most one bulk insert, one bulk upsert and one filtered delete, or queues
+    them when write-behind is on. Returns the number of rows changed (None if the rate
+    limiter refused the call).
+    """
+    if write_queue is not None:
+        _queue_entry_changes(user_id, entry_date,
+                             [_entry_row(entry_date, m['description'], m['calories'], m['protein'], m['carbs'], m['fats'], user_id) for m in inserts],
+                             [(m['id'], _entry_row(entry_date, m['description'], m['calories'], m['protein'], m['carbs'], m['fats'], user_id)) for m in updates],
+                             deletes)
+        _index_meals(user_id, inserts)
+        return len(inserts) + len(updates) + len(deletes)
+    if deletes:
+        storage.delete_entries(user_id, [int(entry_id) for entry_id in deletes])
+    if inserts:
+        rows = [_entry_row(entry_date, m['description'], m['calories'], m['protein'], m['carbs'], m['fats'], user_id) for m in inserts]
+        storage.insert_entries(rows)
+        _index_meals(user_id, inserts)
+    if updates:
+        rows = [{'id': int(m['id']), **_entry_row(entry_date, m['description'], m['calories'], m['protein'], m['carbs'], m['fats'], user_id)} for m in updates]
+        storage.upsert_entries(rows)
+    _invalidate_entries(user_id, entry_date)
+    return len(inserts) + len(updates) + len(deletes)
+
+@batch_rate_limit_check
+def add_entries_batch(user_id: str, entries: list):
+    """
+    Inserts many entries in one request, counted as a single API call (used by bulk imports).
+    Each entry is a dict with entry_date, description, calories, protein, carbs and fats, plus
+    optional 'goals' that are saved as that day's goals (one upsert for the whole batch).
+    Returns the number of rows inserted.
+    """
+    rows = [_entry_row(e['entry_date'], e['description'], e['calories'], e['protein'], e['carbs'], e['fats'], user_id) for e in entries]
+    goal_rows = {str(e['entry_date']): _goal_row(user_id, e['entry_date'], e['goals']) for e in entries if e.get('goals')}
+    storage.insert_entries(rows)
+    # A bulk import changes the frequencies wholesale, so the index is rebuilt on next use.
+    suggestions_cache.invalidate(user_id)
+    if goal_rows:
+        storage.upsert_daily_goals(list(goal_rows.values()))
+        _invalidate_goals(user_id)
+    _invalidate_entries(user_id)
+    return len(rows)
+
+# --- Goal Functions ---
+
+# Used for days without an override when the user never saved default goals.
+DEFAULT_GOALS = {'calories': 2000, 'protein': 150, 'carbs': 250, 'fats': 60}
+# Longest range one goal edit may cover.
+MAX_GOAL_RANGE_DAYS = 366
+
+def get_default_goals(user_id: str) -> dict:
+    """Returns the user's saved default goals, or DEFAULT_GOALS."""
+    prefs = get_user_preferences(user_id)
+    if not prefs:
+        return dict(DEFAULT_GOALS)
+    return {macro: prefs[0][f'default_{macro}'] for macro in DEFAULT_GOALS}
+
+@user_cached(preferences_cache, lambda user_id, start=None, end=None: (user_id, str(start), str(end)))
+def get_daily_goals(user_id: str, start: date = None, end: date = None) -> dict:
+    """Returns the per-day goal overrides between `start` and `end` as {'YYYY-MM-DD': goals}."""
+    rows = storage.get_daily_goals(user_id, start.isoformat() if start else None, end.isoformat() if end else None)
+    return {row['goal_date']: {macro: row[macro] for macro in DEFAULT_GOALS} for row in rows}
+
+def get_goals_for_date(user_id: str, day: date) -> dict:
+    """Returns the goals in effect on `day`: its override if there is one, else the defaults."""
+    return get_daily_goals(user_id, day, day).get(day.isoformat()) or get_default_goals(user_id)
+
+def _goal_row(user_id: str, day, goals: dict):
+    return {'user_id': user_id, 'goal_date': str(day), **{macro: int(goals[macro]) for macro in DEFAULT_GOALS}}
+
+def _date_range(start: date, end: date):
+    days = (end - start).days + 1
+    if days < 1 or days > MAX_GOAL_RANGE_DAYS:
+        raise Exception(f"A goal range must cover 1 to {MAX_GOAL_RANGE_DAYS} days.")
+    return [start + timedelta(days=offset) for offset in range(days)]
+
+def _invalidate_goals(user_id: str, start: date = None, end: date = None):
+    """Evicts cached goal overrides and the summaries that resolve them."""
+    preferences_cache.invalidate(user_id, 'get_daily_goals')
+    entries_cache.invalidate(user_id, '_get_stored_daily_summary')
+    _data_changed(user_id, start, end)
 
 @rate_limit_check
-def update_goals_for_date(entry_date: date, new_goals: dict, user_id: str):
-    update_data = {'goal_calories': int(new_goals['calories']), 'goal_protein': int(new_goals['protein']), 'goal_carbs': int(new_goals['carbs']), 'goal_fats': int(new_goals['fats'])}
-    supabase.table('entries').update(update_data).eq('entry_date', str(entry_date)).eq('user_id', user_id).execute()
-    get_entries_by_date.clear()
-    get_all_entries.clear()
+def set_goals_for_range(user_id: str, start: date, end: date, goals: dict):
+    """Saves `goals` for every day from `start` to `end` (inclusive) in one upsert."""
+    storage.upsert_daily_goals([_goal_row(user_id, day, goals) for day in _date_range(start, end)])
+    _invalidate_goals(user_id, start, end)
+
+@rate_limit_check
+def clear_goals_for_range(user_id: str, start: date, end: date):
+    """Removes the overrides from `start` to `end`, so those days use the default goals again."""
+    _date_range(start, end)
+    storage.delete_daily_goals(user_id, start.isoformat(), end.isoformat())
+    _invalidate_goals(user_id, start, end)
 
 # --- Admin Panel Functions (not rate-limited) ---
 def get_pending_users():
     """Fetches all users who are not yet approved."""
-    if not supabase: return []
-    # Assumes RLS is set up for admin to read all profiles
-    response = supabase.table('profiles').select('id, email').eq('is_approved', False).execute()
-    return response.data
+    if not storage: return []
+    return storage.get_pending_users()
 
 def approve_user(user_id_to_approve: str):
     """Sets a user's is_approved status to True."""
-    if not supabase: return
-    supabase.table('profiles').update({'is_approved': True}).eq('id', user_id_to_approve).execute()
+    if not storage: return
+    storage.approve_user(user_id_to_approve)
+
+def set_users_approval(user_ids: list, approved: bool):
+    """Approves (or rejects) all of `user_ids` with one filtered update."""
+    if not storage or not user_ids: return
+    storage.set_approval(list(user_ids), approved)
+
+# Users shown per page in the Admin Panel, and their keyset cursor columns.
+USER_PAGE_SIZE = 50
+USER_CURSOR_KEYS = ('email', 'id')
+USER_STATUSES = ('pending', 'approved', 'rejected')
+
+def get_users_page(search: str = None, status: str = None, after: tuple = None, limit: int = USER_PAGE_SIZE):
+    """
+    Fetches one page of accounts ordered by email with their entry count, last logged day and
+    API calls made today, all from one aggregate query. `status` is one of USER_STATUSES.
+    Pass `next_cursor(page, limit, USER_CURSOR_KEYS)` of the previous page as `after`.
+    """
+    if not storage: return []
+    rows = storage.get_users_page(search or None, status, after, limit)
+    today = utc_today()
+    for row in rows:
+        # The counter resets on the first call of a new day, so an older date means none today.
+        row['calls_today'] = row['api_call_count'] if str(row['last_api_call_date']) == today else 0
+        row['last_active'] = max(filter(None, (row['last_entry_date'], row['last_api_call_date'])), default=None)
+    return rows
 
 # --- User Preferences Functions ---
 
-@st.cache_data(ttl=300) # Cache preferences for 5 minutes
+@user_cached(preferences_cache, lambda user_id: (user_id,)) # Cached for 5 minutes
 def get_user_preferences(user_id: str):
     """Retrieves a user's default goals from the preferences table."""
-    response = supabase.table('user_preferences').select('*').eq('id', user_id).execute()
-    return response.data
+    return storage.get_user_preferences(user_id)
 
 def upsert_user_preferences(user_id: str, goals: dict):
     """Creates or updates a user's default goals."""
@@ -157,16 +539,22 @@ def upsert_user_preferences(user_id: str, goals: dict):
         'default_carbs': int(goals['carbs']),
         'default_fats': int(goals['fats']),
     }
-    # Upsert will insert a new row, or update it if a row with the user_id already exists.
-    supabase.table('user_preferences').upsert(preference_data).execute()
-    # Clear the cache to ensure the next load gets the fresh data
-    get_user_preferences.clear()
+    storage.upsert_user_preferences(preference_data)
+    # Evict this user's cached preferences so the next load gets the fresh data
+    preferences_cache.invalidate(user_id)
+    # Days without an override resolve to the defaults, so their summaries change too.
+    _invalidate_goals(user_id)
 
 # --- Recipe Functions ---
 
-@rate_limit_check
-def add_recipe(user_id: str, name: str, description: str, instructions: str, servings: float, nutrition: dict, is_public: bool):
-    """Adds a new recipe to the database."""
+@queued_rate_limit_check
+def add_recipe(user_id: str, name: str, description: str, instructions: str, servings: float, nutrition: dict, is_public: bool, ingredients: list = None):
+    """
+    Adds a new recipe to the database. With `ingredients` ({'food', 'grams'} dicts from the
+    food table), the per-serving macros are computed from them and `nutrition` is ignored.
+    """
+    if ingredients:
+        nutrition = recipe_nutrition(ingredients, servings)
     recipe_data = {
         'user_id': user_id,
         'name': name,
@@ -179,21 +567,370 @@ def add_recipe(user_id: str, name: str, description: str, instructions: str, ser
         'fats_per_serving': int(nutrition['fats']),
         'is_public': is_public
     }
-    supabase.table('recipes').insert(recipe_data).execute()
+    if ingredients:
+        foods = nutrition_engine.load_foods()
+        recipe_data['ingredients'] = [{'food': foods.names[foods.row(item['food'])], 'grams': float(item['grams'])} for item in ingredients]
+    if write_queue is not None:
+        write_queue.enqueue(user_id, 'add_recipe', {'row': {**recipe_data, 'client_key': new_client_key()}})
+        _index_recipe(user_id, name, recipe_data)
+        return
+    storage.insert_recipe(recipe_data)
+    _index_recipe(user_id, name, recipe_data)
+    recipes_cache.invalidate(user_id, '_get_recipe_catalog')
+    if is_public:
+        recipes_cache.invalidate(PUBLIC_RECIPES)
+
+@user_cached(recipes_cache, lambda owner: (owner,), copy=False)
+def _get_recipe_catalog(owner: str):
+    """
+    Loads the lightweight recipe listing for a user (or PUBLIC_RECIPES) with a name index.
+    Not copied on every call, since searches only read it; the public readers below copy the rows they return.
+    """
+    rows = storage.get_public_recipes() if owner == PUBLIC_RECIPES else storage.get_recipes(owner)
+    return rows, TokenIndex.from_items((row['id'], row['name']) for row in rows)
 
 def get_recipes(user_id: str):
-    """Fetches all recipes created by a specific user."""
-    response = supabase.table('recipes').select('*').eq('user_id', user_id).order('name').execute()
-    return response.data
+    """Fetches all recipes created by a specific user (id, name and per-serving macros)."""
+    rows = _get_recipe_catalog(user_id)[0]
+    if write_queue is not None:
+        rows = _overlay_recipes(rows, write_queue.pending(user_id, ops=RECIPE_OPS))
+    return [dict(row) for row in rows]
 
 def get_public_recipes():
-    """Fetches all recipes marked as public."""
-    response = supabase.table('recipes').select('*').eq('is_public', True).order('name').execute()
-    return response.data
+    """Fetches all recipes marked as public (id, name and per-serving macros)."""
+    return [dict(row) for row in _get_recipe_catalog(PUBLIC_RECIPES)[0]]
 
-@rate_limit_check
-def delete_recipe(recipe_id: int):
+def search_recipes(user_id: str, query: str, include_public: bool = False):
+    """
+    Finds recipes whose name matches every word of `query` by prefix, using the cached index.
+    Returns the user's own matches, then public ones from other users, each ordered by name.
+    """
+    owners = [user_id, PUBLIC_RECIPES] if include_public else [user_id]
+    results, seen = [], set()
+    for owner in owners:
+        rows, index = _get_recipe_catalog(owner)
+        if owner == user_id and write_queue is not None:
+            # Queued recipes are few, so they get a throwaway index of their own.
+            rows = _overlay_recipes(rows, write_queue.pending(user_id, ops=RECIPE_OPS))
+            index = TokenIndex.from_items((row['id'], row['name']) for row in rows)
+        matches = index.search(query)
+        for row in rows:
+            if row['id'] in matches and row['id'] not in seen:
+                seen.add(row['id'])
+                results.append(dict(row))
+    return results
+
+# Public recipes shown per page on the Recipes page.
+PUBLIC_RECIPE_PAGE_SIZE = 20
+
+@user_cached(recipes_cache, lambda search=None, after=None, limit=PUBLIC_RECIPE_PAGE_SIZE: (PUBLIC_RECIPES, search or '', after, limit))
+def get_public_recipes_page(search: str = None, after: tuple = None, limit: int = PUBLIC_RECIPE_PAGE_SIZE):
+    """
+    Fetches one page of public recipes ordered by name, filtered by `search` in the query.
+    Pass `next_cursor(page, limit, RECIPE_CURSOR_KEYS)` of the previous page as `after`.
+    """
+    return storage.get_public_recipes_page(search or None, after, limit)
+
+RECIPE_CURSOR_KEYS = ('name', 'id')
+
+@user_cached(recipes_cache, lambda recipe_id: ('__details__', recipe_id))
+def _get_stored_recipe(recipe_id: int):
+    return storage.get_recipe(recipe_id)
+
+def get_recipe_details(recipe_id: int):
+    """Fetches one full recipe, including its description and instructions."""
+    if recipe_id < 0:
+        write = write_queue.get(-recipe_id) if write_queue is not None else None
+        return {**write['payload']['row'], 'id': recipe_id} if write else None
+    return _get_stored_recipe(recipe_id)
+
+@queued_rate_limit_check
+def delete_recipe(recipe_id: int, user_id: str): # user_id is passed for targeted cache invalidation
     """Deletes a recipe by its ID."""
-    supabase.table('recipes').delete().eq('id', recipe_id).execute()
+    recipe = next((row for row in get_recipes(user_id) if row['id'] == recipe_id), None)
+    # Only evict the public catalog if the recipe was in it (unknown counts as public).
+    was_public = recipe['is_public'] if recipe else True
+    if write_queue is not None:
+        if recipe_id > 0 or not write_queue.cancel(-recipe_id):
+            write_queue.enqueue(user_id, 'delete_recipe', {**_queued_target(recipe_id), 'is_public': was_public})
+        _index_recipe(user_id, recipe and recipe['name'])
+        return
+    storage.delete_recipe(recipe_id)
+    _index_recipe(user_id, recipe and recipe['name'])
+    recipes_cache.invalidate('__details__', '_get_stored_recipe', recipe_id)
+    recipes_cache.invalidate(user_id, '_get_recipe_catalog')
+    if was_public:
+        recipes_cache.invalidate(PUBLIC_RECIPES)
+
+# Note: An update_recipe function would follow the same pattern if you add an "Edit" feature later.
+
+# --- Autocomplete ---
+# Suggestions returned per query, and the most frequent past meals loaded into an index.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MEALS = 2000
+
+def _per_serving(recipe: dict):
+    return {macro: recipe[f'{macro}_per_serving'] for macro in DEFAULT_GOALS}
+
+@user_cached(suggestions_cache, lambda user_id: (user_id,))
+def get_autocomplete_index(user_id: str) -> SuggestionIndex:
+    """Builds the user's index of own recipes and past meals, ranked by how often each was logged."""
+    index = SuggestionIndex()
+    for recipe in get_recipes(user_id):
+        index.add('recipe', recipe['name'], _per_serving(recipe))
+    for row in storage.get_meal_counts(user_id, AUTOCOMPLETE_MEALS):
+        index.record_meal(row['description'], row, row['count'])
+    return index
+
+@user_cached(recipes_cache, lambda: (PUBLIC_RECIPES,))
+def _get_public_autocomplete_index() -> SuggestionIndex:
+    index = SuggestionIndex()
+    for recipe in get_public_recipes():
+        index.add('recipe', recipe['name'], _per_serving(recipe))
+    return index
+
+def suggest_meals(user_id: str, query: str, limit: int = AUTOCOMPLETE_LIMIT):
+    """
+    Returns up to `limit` recipes and past meals matching `query` by word prefix: the user's
+    own, most logged first, then public recipes from others. Served from in-memory indexes.
+    """
+    results = get_autocomplete_index(user_id).search(query, limit)
+    if len(results) < limit:
+        seen = {suggestion_key(item) for item in results}
+        results += _get_public_autocomplete_index().search(query, limit - len(results), exclude=seen)
+    return results
+
+def _index_meals(user_id: str, rows: list):
+    """Counts newly logged meals in the user's autocomplete index, if it is loaded."""
+    index = suggestions_cache.peek((user_id, 'get_autocomplete_index'))
+    if index is not None:
+        for row in rows:
+            index.record_meal(row['description'], row)
+
+def _index_recipe(user_id: str, name: str, recipe: dict = None):
+    """Adds a saved recipe to (or, without `recipe`, removes a deleted one from) the user's loaded autocomplete index."""
+    index = suggestions_cache.peek((user_id, 'get_autocomplete_index'))
+    if index is None or not name:
+        return
+    if recipe is not None:
+        index.add('recipe', name, _per_serving(recipe))
+    else:
+        index.remove('recipe', name)
+
+# --- Trends ---
+# Users whose trend engine is being kept fresh, mapped to the (start, end) range of days
+# written since its last refresh: () if none, None if unknown (rebuild from scratch).
+_trend_changes = {}
+_trends_lock = threading.Lock()
+
+def get_trends(user_id: str, today: date = None):
+    """
+    Returns rolling averages, adherence, goal streaks and weekly summaries for the user as of
+    `today` (see `TrendEngine.snapshot`). The engine is built once from the full daily summary;
+    later reads refetch only the days written since, in one ranged query.
+    """
+    hit, engine = trends_cache.get((user_id, 'engine'))
+    with _trends_lock:
+        changed = _trend_changes.get(user_id) if hit else None
+        _trend_changes[user_id] = ()
+    # Read past the summary cache, which a concurrent rerun may have refilled with pre-write rows.
+    if changed is None:
+        engine = TrendEngine(get_daily_summary(user_id, fresh=True))
+        trends_cache.set((user_id, 'engine'), engine)
+    elif changed:
+        start, end = changed
+        engine.update(get_daily_summary(user_id, start, end, fresh=True), start, end)
+    return engine.snapshot(today or date.today())
+
+# Ingredient-based recipes recomputed per batch.
+RECOMPUTE_BATCH_SIZE = 5000
+
+def recipe_nutrition(ingredients: list, servings: float):
+    """Returns the per-serving macros of a recipe built from the bundled food table."""
+    return nutrition_engine.recipe_nutrition(ingredients, servings)
+
+def recompute_recipe_nutrition(changed_foods: list = None, foods: nutrition_engine.FoodTable = None, batch_size: int = RECOMPUTE_BATCH_SIZE):
+    """
+    Recomputes the per-serving macros of every ingredient-based recipe against `foods`
+    (the bundled table by default), a batch at a time with one vectorized pass and one bulk
+    update per batch. With `changed_foods`, only recipes using those foods are rewritten.
+    Returns the number of recipes updated.
+    """
+    updated, after = 0, None
+    while True:
+        batch = storage.get_ingredient_recipes(after, batch_size)
+        if not batch:
+            break
+        rows = nutrition_engine.stale_recipes(batch, foods, changed_foods)
+        if rows:
+            storage.update_recipe_nutrition(rows)
+            updated += len(rows)
+        if len(batch) < batch_size:
+            break
+        after = batch[-1]['id']
+    if updated:
+        recipes_cache.clear()
+    return updated
+
+# --- Write-Behind Queue ---
+# With the WRITE_BEHIND secret on, meal and recipe writes go to a local journal and return at
+# once; a background worker flushes them in batches. Reads overlay the pending writes, and a
+# queued insert is shown with the temporary id -seq until it reaches the database.
+ENTRY_OPS = ('insert_entry', 'update_entry', 'delete_entry')
+RECIPE_OPS = ('add_recipe', 'delete_recipe')
+
+@st.cache_resource(show_spinner=False)
+def _shared_write_queue(path: str):
+    """Opens the journal once per process and starts the worker that flushes it."""
+    queue = WriteQueue(path)
+    WriteBehindWorker(queue, lambda op, writes: _apply_queued_writes(op, writes)).start()
+    return queue
+
+def init_write_queue():
+    """Returns the write-behind queue if the WRITE_BEHIND secret is on (journal at WRITE_QUEUE_PATH), else None."""
+    try:
+        if not st.secrets.get("WRITE_BEHIND", False):
+            return None
+        return _shared_write_queue(st.secrets.get("WRITE_QUEUE_PATH", "write_queue.db"))
+    except Exception as e:
+        st.error(f"Error opening the write queue: {e}")
+        return None
+
+def _queued_entry_date(entry_id: int):
+    """Returns the date of a queued insert shown as temporary id `entry_id`, or None if it isn't one."""
+    write = write_queue.get(-int(entry_id)) if int(entry_id) < 0 else None
+    return date.fromisoformat(write['entry_date']) if write else None
+
+def _queued_target(row_id: int):
+    """Identifies a row for a queued update or delete: by id, or by client_key for a temporary id."""
+    row_id = int(row_id)
+    if row_id > 0:
+        return {'id': row_id, 'client_key': None}
+    return {'id': None, 'client_key': write_queue.client_key(-row_id)}
+
+def _is_target(row: dict, payload: dict):
+    if payload['id'] is not None:
+        return row['id'] == payload['id']
+    return payload['client_key'] is not None and row.get('client_key') == payload['client_key']
+
+def _queue_entry_changes(user_id: str, entry_date: date, inserts: list, updates: list, deletes: list):
+    """
+    Journals a day's entry edits. Edits to a queued insert that hasn't been flushed yet are
+    folded into it (or cancel it), so the worker only ever sends the final row.
+    `updates` is a list of (id, row) pairs. With `entry_date` None (an update or delete of an
+    entry whose date isn't known) the edits are overlaid on every day's entries, but the daily
+    totals only reflect them once they are flushed.
+    """
+    day = entry_date.isoformat() if entry_date else None
+    for entry_id in deletes:
+        if int(entry_id) > 0 or not write_queue.cancel(-int(entry_id)):
+            write_queue.enqueue(user_id, 'delete_entry', _queued_target(entry_id), day)
+    for entry_id, row in updates:
+        queued = write_queue.get(-int(entry_id)) if int(entry_id) < 0 else None
+        if queued and write_queue.amend(queued['seq'], {'row': {**queued['payload']['row'], **row}}):
+            continue
+        write_queue.enqueue(user_id, 'update_entry', {**_queued_target(entry_id), 'row': row}, day)
+    for row in inserts:
+        write_queue.enqueue(user_id, 'insert_entry', {'row': {**row, 'client_key': new_client_key()}}, day)
+    _data_changed(user_id, entry_date)
+
+def _overlay_entries(rows: list, writes: list):
+    """Applies pending entry writes, in order, on top of the stored rows."""
+    if not writes:
+        return rows
+    rows = [dict(row) for row in rows]
+    for write in writes:
+        payload = write['payload']
+        if write['op'] == 'insert_entry':
+            # Skip inserts that were flushed after the stored rows were read.
+            if not any(row.get('client_key') == payload['row']['client_key'] for row in rows):
+                rows.append({**payload['row'], 'id': -write['seq']})
+        elif write['op'] == 'update_entry':
+            for row in rows:
+                if _is_target(row, payload):
+                    row.update(payload['row'])
+        else:
+            rows = [row for row in rows if not _is_target(row, payload)]
+    return rows
+
+def _overlay_recipes(rows: list, writes: list):
+    """Applies pending recipe writes on top of a user's stored recipe listing, ordered by name."""
+    if not writes:
+        return rows
+    rows = list(rows)
+    for write in writes:
+        payload = write['payload']
+        if write['op'] == 'add_recipe':
+            if not any(row.get('client_key') == payload['row']['client_key'] for row in rows):
+                rows.append({**{column: payload['row'].get(column) for column in RECIPE_SUMMARY_COLUMNS}, 'id': -write['seq']})
+        else:
+            rows = [row for row in rows if not _is_target(row, payload)]
+    return sorted(rows, key=lambda row: row['name'])
+
+def _resolve_ids(table: str, user_id: str, payloads: list):
+    """Returns the database id each payload targets (None if its row no longer exists), in one lookup."""
+    keys = [payload['client_key'] for payload in payloads if payload['id'] is None and payload['client_key']]
+    ids = storage.get_ids_by_client_key(table, user_id, keys) if keys else {}
+    return [payload['id'] if payload['id'] is not None else ids.get(payload['client_key']) for payload in payloads]
+
+def _apply_queued_writes(op: str, writes: list):
+    """Flushes a run of queued writes of one op, in one request per table where possible."""
+    users = {}
+    for write in writes:
+        users.setdefault(write['user_id'], []).append(write)
+    if op == 'insert_entry':
+        storage.insert_entries([write['payload']['row'] for write in writes])
+    elif op in ('update_entry', 'delete_entry'):
+        for user_id, user_writes in users.items():
+            ids = _resolve_ids('entries', user_id, [write['payload'] for write in user_writes])
+            if op == 'update_entry':
+                # Later edits of the same entry win; one upsert can't touch a row twice.
+                rows = {entry_id: {'id': entry_id, **write['payload']['row']} for entry_id, write in zip(ids, user_writes) if entry_id is not None}
+                # Edits made without the entry's date lack the full row, so they can't be upserted.
+                full = [row for row in rows.values() if 'entry_date' in row]
+                if full:
+                    storage.upsert_entries(full)
+                for row in rows.values():
+                    if 'entry_date' not in row:
+                        storage.update_entry(row['id'], {column: value for column, value in row.items() if column != 'id'})
+            elif any(entry_id is not None for entry_id in ids):
+                storage.delete_entries(user_id, [entry_id for entry_id in ids if entry_id is not None])
+    elif op == 'add_recipe':
+        for write in writes:
+            storage.insert_recipe(write['payload']['row'])
+    elif op == 'charge':
+        # Calls were counted locally when the writes were queued; refused charges are dropped,
+        # since those writes were already accepted.
+        for user_id, user_writes in users.items():
+            rate_limiter.consume(user_id, sum(write['payload']['calls'] for write in user_writes))
+        return
+    elif op == 'delete_recipe':
+        for user_id, user_writes in users.items():
+            for recipe_id in _resolve_ids('recipes', user_id, [write['payload'] for write in user_writes]):
+                if recipe_id is not None:
+                    storage.delete_recipe(recipe_id)
+                    recipes_cache.invalidate('__details__', '_get_stored_recipe', recipe_id)
+    else:
+        raise Exception(f"Unknown queued write: {op}")
+    # Evict before the worker drops the writes from the journal, so no read sees neither.
+    for user_id, user_writes in users.items():
+        if op in RECIPE_OPS:
+            recipes_cache.invalidate(user_id, '_get_recipe_catalog')
+            if any(write['payload'].get('row', write['payload']).get('is_public', True) for write in user_writes):
+                recipes_cache.invalidate(PUBLIC_RECIPES)
+        else:
+            for day in {write['entry_date'] for write in user_writes}:
+                _invalidate_entries(user_id, date.fromisoformat(day) if day else None)
+
+def failed_writes(user_id: str):
+    """Returns the user's queued writes that kept failing and were set aside."""
+    return write_queue.failed(user_id) if write_queue is not None else []
+
+def retry_failed_writes(user_id: str):
+    write_queue.retry_failed(user_id)
+
+def discard_failed_writes(user_id: str):
+    write_queue.discard_failed(user_id)
+    _data_changed(user_id)
 
-# Note: An update_recipe function would follow the same pattern if you add an "Edit" feature later.
\ No newline at end of file
+write_queue = init_write_queue()
@@ -0,0 +1,96 @@
+"""
+Maintenance commands for the tracker's database.
+Uses the same `.streamlit/secrets.toml` configuration as the app; on Supabase,
+rebuild-daily-totals and recompute-recipes need the service-role key as SUPABASE_KEY.
+
+    python manage.py rebuild-daily-totals [--user-id UUID]
+    python manage.py import-entries --user-id UUID --file history.csv
+    python manage.py export-entries --user-id UUID --out entries.csv
+    python manage.py export-recipes --user-id UUID --out recipes.csv
+    python manage.py recompute-recipes [--foods foods.csv] [--food NAME ...]
+"""
+import argparse
+import sys
+import database as db
+import data_transfer
+import nutrition
+
+
+def rebuild_daily_totals(args):
+    before = db.get_daily_summary(args.user_id) if args.user_id else None
+    db.rebuild_daily_totals(args.user_id)
+    if before is None:
+        print("Rebuilt daily_totals for all users.")
+        return
+    after = db.get_daily_summary(args.user_id)
+    mismatched = [row['entry_date'] for row in after if row not in before]
+    mismatched += [row['entry_date'] for row in before if row not in after and row['entry_date'] not in mismatched]
+    print(f"Rebuilt daily_totals for {args.user_id}: {len(after)} day(s), {len(mismatched)} were out of date.")
+    for entry_date in sorted(mismatched):
+        print(f"  {entry_date}")
+
+
+def import_entries(args):
+    with open(args.file, encoding="utf-8-sig", newline="") as text_stream:
+        # Maintenance imports skip the per-user rate limiter.
+        result = data_transfer.import_entries(
+            args.user_id, text_stream, args.format or data_transfer.detect_format(args.file),
+            batch_size=args.batch_size, insert_batch=db.add_entries_batch.__wrapped__,
+            on_batch=lambda imported: print(f"  {imported} rows imported", file=sys.stderr))
+    print(f"Imported {result['imported']} entries, skipped {len(result['errors'])} invalid row(s).")
+    if result['unreadable']:
+        print(f"Stopped early, the file could not be read: {result['unreadable']}")
+    for row_number, message in result['errors'][:20]:
+        print(f"  row {row_number}: {message}")
+
+
+def export_table(args):
+    chunks = data_transfer.export_entries if args.command == "export-entries" else data_transfer.export_recipes
+    fmt = args.format or ("jsonl" if args.out.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(args.out, "w", encoding="utf-8", newline="") as out:
+        for chunk in chunks(args.user_id, fmt):
+            out.write(chunk)
+    print(f"Wrote {args.out}")
+
+
+def recompute_recipes(args):
+    foods = nutrition.FoodTable.from_csv(args.foods) if args.foods else None
+    updated = db.recompute_recipe_nutrition(args.food, foods)
+    print(f"Updated the nutrition of {updated} recipe(s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-daily-totals", help="Recompute the daily_totals rollup from entries.")
+    rebuild.add_argument("--user-id", help="Only rebuild this user's days (also reports which days were out of date).")
+    rebuild.set_defaults(handler=rebuild_daily_totals)
+
+    importer = commands.add_parser("import-entries", help="Bulk-import entries from a CSV, JSON Lines or JSON file.")
+    importer.add_argument("--user-id", required=True)
+    importer.add_argument("--file", required=True)
+    importer.add_argument("--format", choices=["csv", "jsonl", "json"], help="Defaults to the file extension.")
+    importer.add_argument("--batch-size", type=int, default=data_transfer.IMPORT_BATCH_SIZE)
+    importer.set_defaults(handler=import_entries)
+
+    for table in ("entries", "recipes"):
+        exporter = commands.add_parser(f"export-{table}", help=f"Stream a user's {table} to a CSV or JSON Lines file.")
+        exporter.add_argument("--user-id", required=True)
+        exporter.add_argument("--out", required=True)
+        exporter.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        exporter.set_defaults(handler=export_table)
+
+    recompute = commands.add_parser("recompute-recipes", help="Recompute ingredient-based recipes after food values change.")
+    recompute.add_argument("--foods", help="Food table CSV to use (defaults to the bundled foods.csv).")
+    recompute.add_argument("--food", action="append", help="Only rewrite recipes using this food (repeatable).")
+    recompute.set_defaults(handler=recompute_recipes)
+
+    args = parser.parse_args()
+    if db.storage is None:
+        raise SystemExit("No database connection; check .streamlit/secrets.toml.")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("tracker.metrics")
+
+# Latency samples kept per function/section for the percentile estimates.
+SAMPLE_WINDOW = 1000
+# Completed reruns kept for the Performance panel.
+RERUN_HISTORY = 50
+# The JSON payload size of a result is measured on one call in this many per function (0 turns it off),
+# so results aren't serialized a second time on every call.
+PAYLOAD_SAMPLE_EVERY = 20
+
+
+class _Series:
+    """Running totals plus a window of recent latency samples for one function or section."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.rows = 0
+        self.payload_bytes = 0      # over the sampled calls only
+        self.payload_samples = 0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def add(self, seconds, rows=0, payload_bytes=None):
+        self.count += 1
+        self.total_seconds += seconds
+        self.rows += rows
+        if payload_bytes is not None:
+            self.payload_bytes += payload_bytes
+            self.payload_samples += 1
+        self.samples.append(seconds)
+
+    def estimated_payload_bytes(self):
+        """Total payload of all calls, extrapolated from the sampled ones."""
+        return self.payload_bytes / self.payload_samples * self.count if self.payload_samples else 0
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Metrics:
+    """
+    Process-wide registry of database call and render-section timings.
+    Each Streamlit rerun also gets its own record (see `start_rerun`), kept per thread
+    because every session runs its script on its own thread.
+    """
+
+    def __init__(self):
+        self.db_calls = {}
+        self.sections = {}
+        self.reruns = deque(maxlen=RERUN_HISTORY)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- Recording ---
+
+    def should_sample_payload(self, function):
+        """True if the next call of `function` should have its payload size measured."""
+        if not PAYLOAD_SAMPLE_EVERY:
+            return False
+        with self._lock:
+            series = self.db_calls.get(function)
+            return series is None or series.count % PAYLOAD_SAMPLE_EVERY == 0
+
+    def record_db_call(self, function, seconds, rows=0, payload_bytes=None):
+        rerun = getattr(self._local, 'rerun', None)
+        with self._lock:
+            self.db_calls.setdefault(function, _Series()).add(seconds, rows, payload_bytes)
+            if rerun is not None:
+                rerun['db_calls'] += 1
+                rerun['db_seconds'] += seconds
+        logger.debug(json.dumps({'event': 'db_call', 'function': function, 'seconds': round(seconds, 6), 'rows': rows, 'bytes': payload_bytes}))
+
+    def record_section(self, section, seconds):
+        rerun = getattr(self._local, 'rerun', None)
+        with self._lock:
+            self.sections.setdefault(section, _Series()).add(seconds)
+            if rerun is not None:
+                rerun['sections'][section] = rerun['sections'].get(section, 0.0) + seconds
+
+    def record_cache(self, cache, hit):
+        """Counts a cache lookup against the current rerun (the caches keep process-wide totals)."""
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            with self._lock:
+                rerun['cache_hits' if hit else 'cache_misses'] += 1
+
+    @contextmanager
+    def timed(self, section):
+        """Times a block of rendering work (pandas, figure building, ...) under `section`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_section(section, time.perf_counter() - start)
+
+    def current_rerun(self):
+        """Returns this thread's open rerun record (or None), for handing to worker threads."""
+        return getattr(self._local, 'rerun', None)
+
+    @contextmanager
+    def attach_rerun(self, rerun):
+        """Counts the block's work on this (worker) thread against another thread's `rerun`."""
+        previous = getattr(self._local, 'rerun', None)
+        self._local.rerun = rerun
+        try:
+            yield
+        finally:
+            self._local.rerun = previous
+
+    def start_rerun(self, page):
+        """Begins this thread's rerun record; a rerun cut short by st.stop/st.rerun is closed here."""
+        if getattr(self._local, 'rerun', None) is not None:
+            self.finish_rerun()
+        self._local.rerun = {'page': page, 'started': time.time(), 'start': time.perf_counter(), 'db_calls': 0, 'db_seconds': 0.0, 'cache_hits': 0, 'cache_misses': 0, 'sections': {}}
+
+    def finish_rerun(self):
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is None:
+            return None
+        self._local.rerun = None
+        rerun['seconds'] = time.perf_counter() - rerun.pop('start')
+        self.record_section(f"rerun.{rerun['page']}", rerun['seconds'])
+        with self._lock:
+            self.reruns.append(rerun)
+        logger.info(json.dumps({'event': 'rerun', **rerun}, default=str))
+        return rerun
+
+    # --- Reporting ---
+
+    def summary(self, kind='db_calls'):
+        """Returns one dict per function (or section) with count, p50, p95 and totals, slowest first."""
+        with self._lock:
+            series = dict(self.db_calls if kind == 'db_calls' else self.sections)
+            rows = [{
+                'name': name, 'count': s.count,
+                'p50_ms': s.quantile(0.5) * 1000, 'p95_ms': s.quantile(0.95) * 1000,
+                'total_s': s.total_seconds, 'rows': s.rows, 'payload_kb': s.estimated_payload_bytes() / 1024,
+            } for name, s in series.items()]
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def render_prometheus(self, cache_stats=None):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metric, label, series in (('tracker_db_call_seconds', 'function', self.db_calls), ('tracker_section_seconds', 'section', self.sections)):
+                lines.append(f"# TYPE {metric} summary")
+                for name, s in sorted(series.items()):
+                    for q in (0.5, 0.95):
+                        lines.append(f'{metric}{{{label}="{name}",quantile="{q}"}} {s.quantile(q):.6f}')
+                    lines.append(f'{metric}_sum{{{label}="{name}"}} {s.total_seconds:.6f}')
+                    lines.append(f'{metric}_count{{{label}="{name}"}} {s.count}')
+            lines.append("# TYPE tracker_db_rows_total counter")
+            lines += [f'tracker_db_rows_total{{function="{name}"}} {s.rows}' for name, s in sorted(self.db_calls.items())]
+            lines.append("# HELP tracker_db_payload_bytes_total Estimated from a sample of calls (see PAYLOAD_SAMPLE_EVERY).")
+            lines.append("# TYPE tracker_db_payload_bytes_total counter")
+            lines += [f'tracker_db_payload_bytes_total{{function="{name}"}} {s.estimated_payload_bytes():.0f}' for name, s in sorted(self.db_calls.items())]
+        for cache, stats in (cache_stats or {}).items():
+            lines.append(f'tracker_cache_hits_total{{cache="{cache}"}} {stats["hits"]}')
+            lines.append(f'tracker_cache_misses_total{{cache="{cache}"}} {stats["misses"]}')
+            lines.append(f'tracker_cache_entries{{cache="{cache}"}} {stats["size"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, cache_stats=None):
+        """Writes the Prometheus text to `path` (e.g. for a node_exporter textfile collector)."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus(cache_stats))
+
+    def reset(self):
+        with self._lock:
+            self.db_calls.clear()
+            self.sections.clear()
+            self.reruns.clear()
+
+
+class InstrumentedStorage:
+    """
+    Wraps a Storage backend and records the latency and row count of every call, and the
+    JSON payload size of a sample of them. All other attribute access passes through to the backend.
+    """
+
+    def __init__(self, backend, registry):
+        self.backend = backend
+        self.registry = registry
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                self.registry.record_db_call(name, time.perf_counter() - start)
+                raise
+            seconds = time.perf_counter() - start
+            rows = len(result) if isinstance(result, list) else int(result is not None)
+            payload = _payload_size(result) if self.registry.should_sample_payload(name) else None
+            self.registry.record_db_call(name, seconds, rows, payload)
+            return result
+
+        timed_call.__name__ = name
+        return timed_call
+
+
+def _payload_size(result):
+    """Returns the size of `result` as JSON, 0 for non-collections, or None if it can't be serialized."""
+    if not isinstance(result, (list, dict)):
+        return 0
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+# Shared by the whole process.
+metrics = Metrics()
@@ -0,0 +1,133 @@
+import csv
+import os
+from functools import lru_cache
+import numpy as np
+from search_index import TokenIndex
+
+MACROS = ['calories', 'protein', 'carbs', 'fats']
+# Bundled food-composition table: per-100 g macros of common foods.
+FOODS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "foods.csv")
+
+
+class FoodTable:
+    """
+    Food-composition table held as one float32 matrix with a row of per-100 g
+    MACROS per food, plus a name lookup and a prefix index for search.
+    """
+
+    def __init__(self, names: list, values):
+        self.names = list(names)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(self.names), len(MACROS))
+        self._rows = {name.lower(): row for row, name in enumerate(self.names)}
+        self._index = TokenIndex.from_items(enumerate(self.names))
+
+    @classmethod
+    def from_csv(cls, path: str = FOODS_PATH):
+        """Loads a CSV with a `name` column and one column per macro."""
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+        return cls([row['name'] for row in rows], [[float(row[macro]) for macro in MACROS] for row in rows])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name: str):
+        return name.lower() in self._rows
+
+    def row(self, name: str) -> int:
+        try:
+            return self._rows[name.lower()]
+        except KeyError:
+            raise Exception(f"Unknown food: {name}")
+
+    def search(self, query: str):
+        """Returns the names of foods matching every word of `query` by prefix, in table order."""
+        return [self.names[row] for row in sorted(self._index.search(query))]
+
+    def with_values(self, changes: dict):
+        """Returns a copy with some foods' per-100 g macros replaced (new names are appended)."""
+        names, values = list(self.names), self.values.copy()
+        added = []
+        for name, macros in changes.items():
+            row = [macros[macro] for macro in MACROS]
+            if name in self:
+                values[self.row(name)] = row
+            else:
+                names.append(name)
+                added.append(row)
+        if added:
+            values = np.vstack([values, np.asarray(added, dtype=np.float32)])
+        return FoodTable(names, values)
+
+
+@lru_cache(maxsize=None)
+def load_foods(path: str = FOODS_PATH) -> FoodTable:
+    """Loads a food table once per process."""
+    return FoodTable.from_csv(path)
+
+
+# --- Recipe Computation ---
+
+def ingredient_arrays(recipes: list, foods: FoodTable):
+    """
+    Flattens the `ingredients` lists ({'food', 'grams'} dicts) of many recipes into three
+    parallel arrays: the recipe's position, the food's table row and the grams used.
+    """
+    counts = np.fromiter((len(recipe['ingredients']) for recipe in recipes), dtype=np.int64, count=len(recipes))
+    total = int(counts.sum())
+    positions = np.repeat(np.arange(len(recipes)), counts)
+    food_rows = np.fromiter((foods.row(item['food']) for recipe in recipes for item in recipe['ingredients']), dtype=np.int64, count=total)
+    grams = np.fromiter((item['grams'] for recipe in recipes for item in recipe['ingredients']), dtype=np.float64, count=total)
+    return positions, food_rows, grams
+
+
+def per_serving(positions: np.ndarray, food_rows: np.ndarray, grams: np.ndarray, servings: np.ndarray, foods: FoodTable) -> np.ndarray:
+    """
+    Computes per-serving MACROS for every recipe at once: the sparse recipe-by-food gram
+    matrix times the food matrix, summed per recipe with bincount. Returns a (recipes, 4) array.
+    """
+    contributions = foods.values[food_rows].astype(np.float64) * (grams / 100.0)[:, None]
+    totals = np.column_stack([np.bincount(positions, weights=contributions[:, i], minlength=len(servings)) for i in range(len(MACROS))])
+    return totals / np.maximum(np.asarray(servings, dtype=np.float64), 1e-9)[:, None]
+
+
+def compute_nutrition(recipes: list, foods: FoodTable = None) -> np.ndarray:
+    """Per-serving MACROS of recipes with `ingredients` and `servings_per_recipe`, as a (recipes, 4) array."""
+    foods = foods or load_foods()
+    positions, food_rows, grams = ingredient_arrays(recipes, foods)
+    servings = np.fromiter((recipe['servings_per_recipe'] for recipe in recipes), dtype=np.float64, count=len(recipes))
+    return per_serving(positions, food_rows, grams, servings, foods)
+
+
+def recipe_nutrition(ingredients: list, servings: float, foods: FoodTable = None) -> dict:
+    """Returns the per-serving macros of one recipe as whole numbers."""
+    values = compute_nutrition([{'ingredients': ingredients, 'servings_per_recipe': servings}], foods)[0]
+    return {macro: int(round(value)) for macro, value in zip(MACROS, values)}
+
+
+def scale_serving(recipe: dict, servings: float) -> dict:
+    """Returns the macros of `servings` servings of a recipe listing row."""
+    per = np.array([recipe[f'{macro}_per_serving'] for macro in MACROS], dtype=np.float64)
+    return dict(zip(MACROS, (per * servings).tolist()))
+
+
+def stale_recipes(recipes: list, foods: FoodTable = None, changed_foods: list = None) -> list:
+    """
+    Recomputes many ingredient-based recipes in one pass and returns {'id', '<macro>_per_serving'}
+    rows for those whose stored values differ. With `changed_foods`, only recipes that use
+    one of those foods are considered.
+    """
+    foods = foods or load_foods()
+    if not recipes:
+        return []
+    positions, food_rows, grams = ingredient_arrays(recipes, foods)
+    servings = np.fromiter((recipe['servings_per_recipe'] for recipe in recipes), dtype=np.float64, count=len(recipes))
+    computed = np.rint(per_serving(positions, food_rows, grams, servings, foods)).astype(np.int64)
+    stored = np.array([[recipe[f'{macro}_per_serving'] for macro in MACROS] for recipe in recipes], dtype=np.int64).reshape(len(recipes), len(MACROS))
+    changed = (computed != stored).any(axis=1)
+    if changed_foods is not None:
+        affected = np.zeros(len(recipes), dtype=bool)
+        affected[positions[np.isin(food_rows, [foods.row(name) for name in changed_foods])]] = True
+        changed &= affected
+    return [{'id': recipes[i]['id'], **{f'{macro}_per_serving': int(value) for macro, value in zip(MACROS, computed[i])}}
+            for i in np.flatnonzero(changed)]
@@ -0,0 +1,121 @@
+import threading
+from datetime import datetime, timezone
+
+# Non-master users may make this many protected writes per day.
+DAILY_CALL_LIMIT = 50
+
+
+class RateLimiter:
+    """
+    Interface for rate-limiter backends.
+    `consume` atomically charges `cost` calls to a user's daily budget and returns
+    True if the calls are allowed, False if they would exceed the limit.
+    """
+
+    def __init__(self, limit: int = DAILY_CALL_LIMIT):
+        self.limit = limit
+
+    def consume(self, user_id: str, cost: int = 1) -> bool:
+        raise NotImplementedError
+
+    def usage(self, user_id: str) -> int:
+        """Returns how many calls the user has made today."""
+        raise NotImplementedError
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Keeps per-user daily (UTC) counters in process memory. Used for local runs and tests."""
+
+    def __init__(self, limit: int = DAILY_CALL_LIMIT):
+        super().__init__(limit)
+        self._counters = {}  # user_id -> (date, count)
+        self._lock = threading.Lock()
+
+    def consume(self, user_id: str, cost: int = 1) -> bool:
+        today = utc_today()
+        with self._lock:
+            day, count = self._counters.get(user_id, (today, 0))
+            if day != today:
+                count = 0
+            if count + cost > self.limit:
+                return False
+            self._counters[user_id] = (today, count + cost)
+            return True
+
+    def usage(self, user_id: str) -> int:
+        with self._lock:
+            day, count = self._counters.get(user_id, (None, 0))
+            return count if day == utc_today() else 0
+
+    def reset(self, user_id: str = None):
+        with self._lock:
+            if user_id is None:
+                self._counters.clear()
+            else:
+                self._counters.pop(user_id, None)
+
+
+class StorageRateLimiter(RateLimiter):
+    """
+    Charges calls through `Storage.consume_api_calls`, which checks and increments
+    `profiles.api_call_count` in a single UPDATE (the `consume_api_calls` RPC on Supabase).
+    One round trip per charge, and the row lock keeps concurrent writes from racing
+    past the limit.
+    """
+
+    def __init__(self, storage, limit: int = DAILY_CALL_LIMIT):
+        super().__init__(limit)
+        self.storage = storage
+
+    def consume(self, user_id: str, cost: int = 1) -> bool:
+        return self.storage.consume_api_calls(user_id, cost, self.limit, utc_today())
+
+    def usage(self, user_id: str) -> int:
+        profile = self.storage.get_profile(user_id)
+        if not profile or profile.get('last_api_call_date') != utc_today():
+            return 0
+        return profile.get('api_call_count', 0)
+
+
+class DeferredRateLimiter(RateLimiter):
+    """
+    Counts calls in process memory against `backend`'s limit, for writes that are applied later
+    (the write-behind queue), so accepting them never waits on a round trip. The caller charges
+    them to `backend` once they are applied. A user's count starts from the backend's usage the
+    first time they are seen each day, or from 0 if it can't be read.
+    """
+
+    def __init__(self, backend: RateLimiter):
+        super().__init__(backend.limit)
+        self.backend = backend
+        self._counters = {}  # user_id -> (date, count)
+        self._lock = threading.Lock()
+
+    def consume(self, user_id: str, cost: int = 1) -> bool:
+        today, used = utc_today(), 0
+        with self._lock:
+            day, _ = self._counters.get(user_id, (None, 0))
+        if day != today:
+            try:
+                used = self.backend.usage(user_id)
+            except Exception:
+                used = 0
+        with self._lock:
+            day, count = self._counters.get(user_id, (None, 0))
+            if day != today:
+                count = used
+            if count + cost > self.limit:
+                self._counters[user_id] = (today, count)
+                return False
+            self._counters[user_id] = (today, count + cost)
+            return True
+
+    def usage(self, user_id: str) -> int:
+        with self._lock:
+            day, count = self._counters.get(user_id, (None, 0))
+        return count if day == utc_today() else self.backend.usage(user_id)
+
+
+def utc_today() -> str:
+    """Returns the UTC date that daily API call counters are kept for (as the Supabase function does)."""
+    return datetime.now(timezone.utc).date().isoformat()
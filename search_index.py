@@ -0,0 +1,78 @@
+import bisect
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    """Splits text into lowercase alphanumeric tokens."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def word_prefix_pattern(token: str) -> str:
+    """
+    Returns a case-insensitive regex that matches texts with a word starting with `token` (one
+    of `tokenize`'s tokens), the way TokenIndex matches, for backends that search in SQL.
+    """
+    return f"(^|[^a-z0-9]){token}"
+
+
+class TokenIndex:
+    """
+    In-memory prefix index over the tokens of short texts (e.g. recipe names).
+    Every query token must prefix-match some token of a document, so "chi cur"
+    finds "Chicken Curry". Documents can be added and removed incrementally.
+    """
+
+    def __init__(self):
+        self._postings = {}    # token -> set of doc ids
+        self._tokens = []      # sorted distinct tokens, for prefix range scans
+        self._doc_tokens = {}  # doc id -> set of tokens
+
+    @classmethod
+    def from_items(cls, items):
+        """Builds an index from (doc_id, text) pairs."""
+        index = cls()
+        for doc_id, text in items:
+            index.add(doc_id, text)
+        return index
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def add(self, doc_id, text: str):
+        if doc_id in self._doc_tokens:
+            self.remove(doc_id)
+        tokens = set(tokenize(text))
+        self._doc_tokens[doc_id] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+            self._postings[token].add(doc_id)
+
+    def remove(self, doc_id):
+        for token in self._doc_tokens.pop(doc_id, ()):
+            postings = self._postings[token]
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def search(self, query: str):
+        """Returns the set of doc ids matching every token of `query` by prefix."""
+        result = None
+        for prefix in tokenize(query):
+            matches = self._prefix_matches(prefix)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result or set()
+
+    def _prefix_matches(self, prefix: str):
+        matches = set()
+        i = bisect.bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            matches |= self._postings[self._tokens[i]]
+            i += 1
+        return matches
@@ -0,0 +1,476 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from types import SimpleNamespace
+from storage import Storage, RECIPE_SUMMARY_COLUMNS
+from search_index import tokenize, word_prefix_pattern
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    salt TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    is_approved INTEGER NOT NULL DEFAULT 0,
+    is_rejected INTEGER NOT NULL DEFAULT 0,
+    api_call_count INTEGER NOT NULL DEFAULT 0,
+    last_api_call_date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_preferences (
+    id TEXT PRIMARY KEY,
+    default_calories INTEGER NOT NULL,
+    default_protein INTEGER NOT NULL,
+    default_carbs INTEGER NOT NULL,
+    default_fats INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    calories INTEGER NOT NULL,
+    protein INTEGER NOT NULL,
+    carbs INTEGER NOT NULL,
+    fats INTEGER NOT NULL,
+    client_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entries_user_date ON entries (user_id, entry_date);
+
+-- Goal overrides for single days; days without a row use user_preferences.
+CREATE TABLE IF NOT EXISTS daily_goals (
+    user_id TEXT NOT NULL,
+    goal_date TEXT NOT NULL,
+    calories INTEGER NOT NULL,
+    protein INTEGER NOT NULL,
+    carbs INTEGER NOT NULL,
+    fats INTEGER NOT NULL,
+    PRIMARY KEY (user_id, goal_date)
+);
+
+-- Per-day rollup of entries, kept current by the triggers below.
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    calories INTEGER NOT NULL DEFAULT 0,
+    protein INTEGER NOT NULL DEFAULT 0,
+    carbs INTEGER NOT NULL DEFAULT 0,
+    fats INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, entry_date)
+);
+
+CREATE TRIGGER IF NOT EXISTS entries_daily_totals_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO daily_totals (user_id, entry_date, entry_count, calories, protein, carbs, fats)
+    VALUES (NEW.user_id, NEW.entry_date, 1, NEW.calories, NEW.protein, NEW.carbs, NEW.fats)
+    ON CONFLICT (user_id, entry_date) DO UPDATE SET
+        entry_count = entry_count + 1,
+        calories = calories + excluded.calories, protein = protein + excluded.protein,
+        carbs = carbs + excluded.carbs, fats = fats + excluded.fats;
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_daily_totals_delete AFTER DELETE ON entries BEGIN
+    UPDATE daily_totals SET
+        entry_count = entry_count - 1,
+        calories = calories - OLD.calories, protein = protein - OLD.protein,
+        carbs = carbs - OLD.carbs, fats = fats - OLD.fats
+    WHERE user_id = OLD.user_id AND entry_date = OLD.entry_date;
+    DELETE FROM daily_totals WHERE user_id = OLD.user_id AND entry_date = OLD.entry_date AND entry_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_daily_totals_update AFTER UPDATE ON entries BEGIN
+    UPDATE daily_totals SET
+        entry_count = entry_count - 1,
+        calories = calories - OLD.calories, protein = protein - OLD.protein,
+        carbs = carbs - OLD.carbs, fats = fats - OLD.fats
+    WHERE user_id = OLD.user_id AND entry_date = OLD.entry_date;
+    DELETE FROM daily_totals WHERE user_id = OLD.user_id AND entry_date = OLD.entry_date AND entry_count <= 0;
+    INSERT INTO daily_totals (user_id, entry_date, entry_count, calories, protein, carbs, fats)
+    VALUES (NEW.user_id, NEW.entry_date, 1, NEW.calories, NEW.protein, NEW.carbs, NEW.fats)
+    ON CONFLICT (user_id, entry_date) DO UPDATE SET
+        entry_count = entry_count + 1,
+        calories = calories + excluded.calories, protein = protein + excluded.protein,
+        carbs = carbs + excluded.carbs, fats = fats + excluded.fats;
+END;
+
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    instructions TEXT,
+    servings_per_recipe REAL NOT NULL,
+    calories_per_serving INTEGER NOT NULL,
+    protein_per_serving INTEGER NOT NULL,
+    carbs_per_serving INTEGER NOT NULL,
+    fats_per_serving INTEGER NOT NULL,
+    is_public INTEGER NOT NULL DEFAULT 0,
+    client_key TEXT,
+    ingredients TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_user_name ON recipes (user_id, name);
+CREATE INDEX IF NOT EXISTS idx_recipes_public_name ON recipes (is_public, name);
+"""
+
+# Idempotency keys of queued inserts; created after older databases gain the columns.
+CLIENT_KEY_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_entries_client_key ON entries (client_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_client_key ON recipes (client_key);
+"""
+# Columns added after the first release, as (table, column, type); older databases gain them on open.
+ADDED_COLUMNS = [('entries', 'client_key', 'TEXT'), ('recipes', 'client_key', 'TEXT'), ('recipes', 'ingredients', 'TEXT'),
+                 ('profiles', 'is_rejected', 'INTEGER NOT NULL DEFAULT 0')]
+
+_RECIPE_SUMMARY_SELECT = ', '.join(RECIPE_SUMMARY_COLUMNS)
+
+# Per-entry goal copies kept by databases created before the daily_goals table.
+LEGACY_GOAL_COLUMNS = ['goal_calories', 'goal_protein', 'goal_carbs', 'goal_fats']
+DAILY_TOTALS_TRIGGERS = ['entries_daily_totals_insert', 'entries_daily_totals_delete', 'entries_daily_totals_update']
+
+# SQLite stores booleans as integers; convert them back so rows match Supabase's.
+BOOLEAN_COLUMNS = {'is_approved', 'is_rejected', 'is_public'}
+# Profile filters of get_users_page.
+USER_STATUS_CONDITIONS = {
+    'pending': "p.is_approved = 0 AND p.is_rejected = 0",
+    'approved': "p.is_approved = 1",
+    'rejected': "p.is_rejected = 1",
+}
+# Stored as JSON text (jsonb in Supabase).
+JSON_COLUMNS = {'ingredients'}
+
+
+def _hash_password(password: str, salt: str) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), 100_000).hex()
+
+
+def _regexp(pattern: str, text: str) -> bool:
+    """Case-insensitive regex search, like PostgreSQL's ~*."""
+    return text is not None and re.search(pattern, text, re.IGNORECASE) is not None
+
+
+class SQLiteStorage(Storage):
+    """
+    Local storage in a SQLite file (or ":memory:") for offline runs, tests and benchmarks.
+    One connection is shared by all Streamlit sessions and guarded by a lock.
+    """
+
+    def __init__(self, path: str = "tracker.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # SQLite has no built-in REGEXP; "X REGEXP Y" calls regexp(Y, X).
+        self.conn.create_function("regexp", 2, _regexp, deterministic=True)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate_goals()
+        self._add_columns()
+
+    def _migrate_goals(self):
+        """Moves per-entry goals of an older database into daily_goals and drops the copies."""
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(entries)")}
+        if 'goal_calories' not in columns:
+            return
+        with self._lock, self.conn:
+            self.conn.execute(
+                """INSERT OR IGNORE INTO daily_goals (user_id, goal_date, calories, protein, carbs, fats)
+                   SELECT user_id, entry_date, MAX(goal_calories), MAX(goal_protein), MAX(goal_carbs), MAX(goal_fats)
+                     FROM entries GROUP BY user_id, entry_date""")
+            # The old triggers read the goal columns, so they are recreated from SCHEMA afterwards.
+            for trigger in DAILY_TOTALS_TRIGGERS:
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            # Databases made before the rollup get a new daily_totals from SCHEMA, without goal columns.
+            rollup_columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(daily_totals)")}
+            for column in LEGACY_GOAL_COLUMNS:
+                self.conn.execute(f"ALTER TABLE entries DROP COLUMN {column}")
+                if column in rollup_columns:
+                    self.conn.execute(f"ALTER TABLE daily_totals DROP COLUMN {column}")
+        self.conn.executescript(SCHEMA)
+
+    def _add_columns(self):
+        """Adds ADDED_COLUMNS missing from an older database, then the client_key indexes."""
+        with self._lock, self.conn:
+            for table, column, column_type in ADDED_COLUMNS:
+                columns = {row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self.conn.executescript(CLIENT_KEY_INDEXES)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [_to_dict(row) for row in rows]
+
+    def _execute(self, sql, params=()):
+        with self._lock, self.conn:
+            return self.conn.execute(sql, params)
+
+    def _executemany(self, sql, seq):
+        with self._lock, self.conn:
+            return self.conn.executemany(sql, seq)
+
+    # --- Connection ---
+
+    def health_check(self):
+        try:
+            self._query("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    # --- Authentication ---
+
+    def sign_up(self, email, password):
+        user_id, salt = str(uuid.uuid4()), os.urandom(16).hex()
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("INSERT INTO users (id, email, password_hash, salt) VALUES (?, ?, ?, ?)", (user_id, email, _hash_password(password, salt), salt))
+                # Mirrors the Supabase trigger that creates a profile for each new user.
+                self.conn.execute("INSERT INTO profiles (id, email) VALUES (?, ?)", (user_id, email))
+        except sqlite3.IntegrityError:
+            raise Exception("User already registered.")
+        return SimpleNamespace(id=user_id, email=email)
+
+    def sign_in(self, email, password):
+        rows = self._query("SELECT id, email, password_hash, salt FROM users WHERE email = ?", (email,))
+        if not rows or _hash_password(password, rows[0]['salt']) != rows[0]['password_hash']:
+            raise Exception("Invalid login credentials.")
+        return SimpleNamespace(id=rows[0]['id'], email=rows[0]['email'])
+
+    # --- Profiles ---
+
+    def get_profile(self, user_id):
+        rows = self._query("SELECT * FROM profiles WHERE id = ?", (user_id,))
+        return rows[0] if rows else None
+
+    def get_pending_users(self):
+        return self._query("SELECT id, email FROM profiles WHERE is_approved = 0 AND is_rejected = 0")
+
+    def approve_user(self, user_id):
+        self._execute("UPDATE profiles SET is_approved = 1 WHERE id = ?", (user_id,))
+
+    def set_approval(self, user_ids, approved):
+        if not user_ids:
+            return
+        placeholders = ", ".join("?" * len(user_ids))
+        self._execute(f"UPDATE profiles SET is_approved = ?, is_rejected = ? WHERE id IN ({placeholders})", (int(approved), int(not approved), *user_ids))
+
+    def get_users_page(self, search=None, status=None, after=None, limit=50):
+        conditions, params = [], []
+        if search:
+            conditions.append("p.email LIKE ? ESCAPE '\\'")
+            params.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if status:
+            conditions.append(USER_STATUS_CONDITIONS[status])
+        if after:
+            conditions.append("(COALESCE(p.email, ''), p.id) > (COALESCE(?, ''), ?)")
+            params.extend(after)
+        # Correlated subqueries on the daily_totals primary key, evaluated only for this page's rows.
+        return self._query(
+            f"""SELECT p.id, p.email, p.is_approved, p.is_rejected, p.api_call_count, p.last_api_call_date,
+                       COALESCE((SELECT SUM(entry_count) FROM daily_totals t WHERE t.user_id = p.id), 0) AS entry_count,
+                       (SELECT MAX(entry_date) FROM daily_totals t WHERE t.user_id = p.id) AS last_entry_date
+                  FROM profiles p
+                 {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                 ORDER BY COALESCE(p.email, ''), p.id LIMIT ?""",
+            (*params, limit))
+
+    def consume_api_calls(self, user_id, cost, limit, today):
+        # Same single-statement check-and-increment as the Supabase RPC.
+        if cost < 1:
+            raise Exception("The cost of a call must be positive.")
+        cursor = self._execute(
+            """UPDATE profiles
+                  SET api_call_count = CASE WHEN last_api_call_date = :today THEN api_call_count + :cost ELSE :cost END,
+                      last_api_call_date = :today
+                WHERE id = :user_id
+                  AND CASE WHEN last_api_call_date = :today THEN api_call_count ELSE 0 END + :cost <= :limit""",
+            {'user_id': user_id, 'cost': cost, 'limit': limit, 'today': today})
+        if cursor.rowcount == 1:
+            return True
+        if not self.get_profile(user_id):
+            raise Exception("No profile found for this account.")
+        return False
+
+    # --- Entries ---
+
+    def get_entries_by_date(self, user_id, entry_date):
+        return self._query("SELECT * FROM entries WHERE user_id = ? AND entry_date = ? ORDER BY id", (user_id, entry_date))
+
+    def get_entries_page(self, user_id, start=None, end=None, after=None, limit=500):
+        after_date, after_id = after or (None, None)
+        return self._query(
+            """SELECT * FROM entries
+                WHERE user_id = :user_id
+                  AND (:start IS NULL OR entry_date >= :start)
+                  AND (:end IS NULL OR entry_date <= :end)
+                  AND (:after_date IS NULL OR (entry_date, id) < (:after_date, :after_id))
+                ORDER BY entry_date DESC, id DESC
+                LIMIT :limit""",
+            {'user_id': user_id, 'start': start, 'end': end, 'after_date': after_date, 'after_id': after_id, 'limit': limit})
+
+    def insert_entries(self, rows):
+        if rows:
+            self._executemany(_insert_sql('entries', rows[0]) + " ON CONFLICT (client_key) DO NOTHING", [tuple(row.values()) for row in rows])
+
+    def upsert_entries(self, rows):
+        if rows:
+            self._executemany(_upsert_sql('entries', rows[0], 'id'), [tuple(row.values()) for row in rows])
+
+    def update_entry(self, entry_id, data):
+        self._execute(f"UPDATE entries SET {_assignments(data)} WHERE id = ?", (*data.values(), entry_id))
+
+    def delete_entries(self, user_id, entry_ids):
+        if entry_ids:
+            placeholders = ", ".join("?" * len(entry_ids))
+            self._execute(f"DELETE FROM entries WHERE user_id = ? AND id IN ({placeholders})", (user_id, *entry_ids))
+
+    def get_daily_summary(self, user_id, start=None, end=None):
+        return self._query(
+            """SELECT t.entry_date,
+                      t.calories AS actual_calories, COALESCE(g.calories, p.default_calories) AS goal_calories,
+                      t.protein AS actual_protein, COALESCE(g.protein, p.default_protein) AS goal_protein,
+                      t.carbs AS actual_carbs, COALESCE(g.carbs, p.default_carbs) AS goal_carbs,
+                      t.fats AS actual_fats, COALESCE(g.fats, p.default_fats) AS goal_fats
+                 FROM daily_totals t
+                 LEFT JOIN daily_goals g ON g.user_id = t.user_id AND g.goal_date = t.entry_date
+                 LEFT JOIN user_preferences p ON p.id = t.user_id
+                WHERE t.user_id = :user_id
+                  AND (:start IS NULL OR t.entry_date >= :start)
+                  AND (:end IS NULL OR t.entry_date <= :end)
+                ORDER BY t.entry_date""",
+            {'user_id': user_id, 'start': start, 'end': end})
+
+    def rebuild_daily_totals(self, user_id=None):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM daily_totals WHERE :user_id IS NULL OR user_id = :user_id", {'user_id': user_id})
+            self.conn.execute(
+                """INSERT INTO daily_totals (user_id, entry_date, entry_count, calories, protein, carbs, fats)
+                   SELECT user_id, entry_date, COUNT(*), SUM(calories), SUM(protein), SUM(carbs), SUM(fats)
+                     FROM entries
+                    WHERE :user_id IS NULL OR user_id = :user_id
+                    GROUP BY user_id, entry_date""",
+                {'user_id': user_id})
+
+    def get_meal_counts(self, user_id, limit=2000):
+        # With MAX(id), SQLite takes the bare macro columns from each group's latest entry.
+        rows = self._query(
+            """SELECT description, COUNT(*) AS count, calories, protein, carbs, fats, MAX(id) AS last_id
+                 FROM entries WHERE user_id = ? GROUP BY description ORDER BY count DESC, last_id DESC LIMIT ?""",
+            (user_id, limit))
+        for row in rows:
+            del row['last_id']
+        return rows
+
+    def get_ids_by_client_key(self, table, user_id, client_keys):
+        if not client_keys:
+            return {}
+        placeholders = ", ".join("?" * len(client_keys))
+        rows = self._query(f"SELECT id, client_key FROM {table} WHERE user_id = ? AND client_key IN ({placeholders})", (user_id, *client_keys))
+        return {row['client_key']: row['id'] for row in rows}
+
+    # --- Daily Goals ---
+
+    def get_daily_goals(self, user_id, start=None, end=None):
+        return self._query(
+            """SELECT * FROM daily_goals
+                WHERE user_id = :user_id
+                  AND (:start IS NULL OR goal_date >= :start)
+                  AND (:end IS NULL OR goal_date <= :end)
+                ORDER BY goal_date""",
+            {'user_id': user_id, 'start': start, 'end': end})
+
+    def upsert_daily_goals(self, rows):
+        if rows:
+            self._executemany(_upsert_sql('daily_goals', rows[0], 'user_id', 'goal_date'), [tuple(row.values()) for row in rows])
+
+    def delete_daily_goals(self, user_id, start, end):
+        self._execute("DELETE FROM daily_goals WHERE user_id = ? AND goal_date BETWEEN ? AND ?", (user_id, start, end))
+
+    # --- User Preferences ---
+
+    def get_user_preferences(self, user_id):
+        return self._query("SELECT * FROM user_preferences WHERE id = ?", (user_id,))
+
+    def upsert_user_preferences(self, row):
+        self._execute(_upsert_sql('user_preferences', row, 'id'), tuple(row.values()))
+
+    # --- Recipes ---
+
+    def insert_recipe(self, row):
+        row = _encode_json(row)
+        self._execute(_insert_sql('recipes', row) + " ON CONFLICT (client_key) DO NOTHING", tuple(row.values()))
+
+    def get_recipes(self, user_id):
+        return self._query(f"SELECT {_RECIPE_SUMMARY_SELECT} FROM recipes WHERE user_id = ? ORDER BY name", (user_id,))
+
+    def get_public_recipes(self):
+        return self._query(f"SELECT {_RECIPE_SUMMARY_SELECT} FROM recipes WHERE is_public = 1 ORDER BY name")
+
+    def get_public_recipes_page(self, search=None, after=None, limit=20):
+        conditions, params = ["is_public = 1"], []
+        for token in tokenize(search):
+            conditions.append("name REGEXP ?")
+            params.append(word_prefix_pattern(token))
+        if after:
+            conditions.append("(name, id) > (?, ?)")
+            params.extend(after)
+        return self._query(f"SELECT {_RECIPE_SUMMARY_SELECT} FROM recipes WHERE {' AND '.join(conditions)} ORDER BY name, id LIMIT ?", (*params, limit))
+
+    def get_recipes_page(self, user_id, after_id=None, limit=500):
+        return self._query(
+            "SELECT * FROM recipes WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (user_id, -1 if after_id is None else after_id, limit))
+
+    def get_recipe(self, recipe_id):
+        rows = self._query("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
+        return rows[0] if rows else None
+
+    def delete_recipe(self, recipe_id):
+        self._execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+
+    def get_ingredient_recipes(self, after_id=None, limit=500):
+        return self._query(
+            """SELECT id, servings_per_recipe, ingredients, calories_per_serving, protein_per_serving, carbs_per_serving, fats_per_serving
+                 FROM recipes WHERE ingredients IS NOT NULL AND id > ? ORDER BY id LIMIT ?""",
+            (-1 if after_id is None else after_id, limit))
+
+    def update_recipe_nutrition(self, rows):
+        if not rows:
+            return
+        columns = [column for column in rows[0] if column != 'id']
+        self._executemany(f"UPDATE recipes SET {_assignments(columns)} WHERE id = ?", [(*(row[column] for column in columns), row['id']) for row in rows])
+
+
+def _to_dict(row):
+    data = dict(row)
+    for column in BOOLEAN_COLUMNS.intersection(data):
+        data[column] = bool(data[column])
+    for column in JSON_COLUMNS.intersection(data):
+        if data[column] is not None:
+            data[column] = json.loads(data[column])
+    return data
+
+def _encode_json(row):
+    return {column: json.dumps(value) if column in JSON_COLUMNS and value is not None else value for column, value in row.items()}
+
+def _insert_sql(table, row):
+    return f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})"
+
+def _upsert_sql(table, row, *keys):
+    updates = ", ".join(f"{column} = excluded.{column}" for column in row if column not in keys)
+    return f"{_insert_sql(table, row)} ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+
+def _assignments(data):
+    return ", ".join(f"{column} = ?" for column in data)
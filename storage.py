@@ -0,0 +1,186 @@
+# Lightweight recipe projection used for listings; descriptions and instructions load on demand.
+RECIPE_SUMMARY_COLUMNS = ['id', 'user_id', 'name', 'servings_per_recipe', 'calories_per_serving', 'protein_per_serving', 'carbs_per_serving', 'fats_per_serving', 'is_public', 'client_key']
+
+
+class Storage:
+    """
+    Repository interface over the app's tables (entries, daily_goals, recipes, profiles
+    and user_preferences) plus account authentication.
+    Rows are plain dicts shaped like the Supabase tables, with dates as ISO strings.
+    """
+
+    # --- Connection ---
+
+    def health_check(self) -> bool:
+        """Returns True if the database answers a trivial query."""
+        raise NotImplementedError
+
+    def reconnect(self) -> bool:
+        """Re-opens the connection; returns True once it is healthy again."""
+        return self.health_check()
+
+    # --- Authentication ---
+
+    def sign_up(self, email: str, password: str):
+        """Creates an account and returns a user object with `id` and `email`."""
+        raise NotImplementedError
+
+    def sign_in(self, email: str, password: str):
+        """Returns the user object for valid credentials, otherwise raises."""
+        raise NotImplementedError
+
+    # --- Profiles ---
+
+    def get_profile(self, user_id: str):
+        raise NotImplementedError
+
+    def get_pending_users(self):
+        """Returns `id` and `email` of every profile neither approved nor rejected."""
+        raise NotImplementedError
+
+    def approve_user(self, user_id: str):
+        raise NotImplementedError
+
+    def set_approval(self, user_ids: list, approved: bool):
+        """Approves (or, with `approved` False, rejects) many accounts in one update."""
+        raise NotImplementedError
+
+    def get_users_page(self, search: str = None, status: str = None, after: tuple = None, limit: int = 50):
+        """
+        Returns up to `limit` profiles ordered by (email, id) with per-user stats computed by the
+        database in the same query: id, email, is_approved, is_rejected, api_call_count,
+        last_api_call_date, entry_count and last_entry_date (both from the daily_totals rollup).
+        `search` is a case-insensitive substring of the email; `status` is 'pending', 'approved'
+        or 'rejected'. `after` is the (email, id) of the last row of the previous page.
+        """
+        raise NotImplementedError
+
+    def consume_api_calls(self, user_id: str, cost: int, limit: int, today: str) -> bool:
+        """
+        Atomically charges `cost` calls against today's counter; False if that would exceed
+        `limit`. Raises if the user has no profile. Backends that run on the client's behalf
+        (Supabase) ignore `user_id`, `limit` and `today` and use the signed-in user, the limit
+        and the date set on the server.
+        """
+        raise NotImplementedError
+
+    # --- Entries ---
+
+    def get_entries_by_date(self, user_id: str, entry_date: str):
+        raise NotImplementedError
+
+    def get_entries_page(self, user_id: str, start: str = None, end: str = None, after: tuple = None, limit: int = 500):
+        """
+        Returns up to `limit` entries in [start, end], newest first, ordered by (entry_date, id).
+        `after` is the (entry_date, id) of the last row of the previous page (keyset pagination).
+        """
+        raise NotImplementedError
+
+    def insert_entries(self, rows: list):
+        """Inserts entry rows; rows whose `client_key` already exists are skipped, so retries are safe."""
+        raise NotImplementedError
+
+    def upsert_entries(self, rows: list):
+        """Inserts or replaces full entry rows keyed by `id`."""
+        raise NotImplementedError
+
+    def update_entry(self, entry_id: int, data: dict):
+        raise NotImplementedError
+
+    def delete_entries(self, user_id: str, entry_ids: list):
+        raise NotImplementedError
+
+    def get_daily_summary(self, user_id: str, start: str = None, end: str = None):
+        """
+        Returns one row per logged day in [start, end] (open-ended when None), oldest first:
+        entry_date, actual_calories/protein/carbs/fats and goal_calories/protein/carbs/fats.
+        Read from the `daily_totals` rollup, which the database keeps current on every entry write.
+        Goals come from the day's `daily_goals` row, else the user's default goals (None if neither).
+        """
+        raise NotImplementedError
+
+    def rebuild_daily_totals(self, user_id: str = None):
+        """Recomputes the `daily_totals` rollup from `entries` for one user, or everyone if None."""
+        raise NotImplementedError
+
+    def get_meal_counts(self, user_id: str, limit: int = 2000):
+        """
+        Returns up to `limit` distinct descriptions the user logged, most frequent first:
+        description, count and the calories/protein/carbs/fats of its latest entry.
+        """
+        raise NotImplementedError
+
+    def get_ids_by_client_key(self, table: str, user_id: str, client_keys: list) -> dict:
+        """Returns {client_key: id} for the user's rows of `table` ('entries' or 'recipes') with those keys."""
+        raise NotImplementedError
+
+    # --- Daily Goals ---
+
+    def get_daily_goals(self, user_id: str, start: str = None, end: str = None):
+        """Returns the user's per-day goal overrides in [start, end] (open-ended when None), oldest first."""
+        raise NotImplementedError
+
+    def upsert_daily_goals(self, rows: list):
+        """Inserts or replaces goal rows keyed by (user_id, goal_date)."""
+        raise NotImplementedError
+
+    def delete_daily_goals(self, user_id: str, start: str, end: str):
+        raise NotImplementedError
+
+    # --- User Preferences ---
+
+    def get_user_preferences(self, user_id: str):
+        """Returns a list holding the user's preferences row, or an empty list."""
+        raise NotImplementedError
+
+    def upsert_user_preferences(self, row: dict):
+        raise NotImplementedError
+
+    # --- Recipes ---
+
+    def insert_recipe(self, row: dict):
+        """
+        Inserts a recipe; skipped if its `client_key` already exists. `ingredients`, if
+        present, is a list of {'food', 'grams'} dicts for the whole recipe.
+        """
+        raise NotImplementedError
+
+    def get_recipes(self, user_id: str):
+        """Returns a user's recipes ordered by name, as RECIPE_SUMMARY_COLUMNS only."""
+        raise NotImplementedError
+
+    def get_public_recipes(self):
+        """Returns every public recipe ordered by name, as RECIPE_SUMMARY_COLUMNS only."""
+        raise NotImplementedError
+
+    def get_public_recipes_page(self, search: str = None, after: tuple = None, limit: int = 20):
+        """
+        Returns up to `limit` public recipes ordered by (name, id), as RECIPE_SUMMARY_COLUMNS.
+        Every word of `search` (see `search_index.tokenize`) must start a word of the name,
+        case-insensitively, as in `TokenIndex.search`; `word_prefix_pattern` gives the regex
+        for a word. `after` is the
+        (name, id) of the last row of the previous page (keyset pagination).
+        """
+        raise NotImplementedError
+
+    def get_recipes_page(self, user_id: str, after_id: int = None, limit: int = 500):
+        """Returns up to `limit` full recipe rows of a user with id > `after_id`, ordered by id (for exports)."""
+        raise NotImplementedError
+
+    def get_recipe(self, recipe_id: int):
+        """Returns the full recipe row (including description and instructions), or None."""
+        raise NotImplementedError
+
+    def delete_recipe(self, recipe_id: int):
+        raise NotImplementedError
+
+    def get_ingredient_recipes(self, after_id: int = None, limit: int = 500):
+        """
+        Returns up to `limit` recipes that list `ingredients`, with id > `after_id` and ordered by
+        id: id, servings_per_recipe, ingredients and the per-serving macros (for bulk recomputes).
+        """
+        raise NotImplementedError
+
+    def update_recipe_nutrition(self, rows: list):
+        """Sets the per-serving macros of many recipes ({'id', '<macro>_per_serving'} rows) in one statement."""
+        raise NotImplementedError
@@ -0,0 +1,233 @@
+import threading
+import time
+import httpx
+from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+from storage import Storage, RECIPE_SUMMARY_COLUMNS
+from search_index import tokenize, word_prefix_pattern
+
+_RECIPE_SUMMARY_SELECT = ', '.join(RECIPE_SUMMARY_COLUMNS)
+
+# Keep-alive HTTP connections shared by every session of the process.
+POOL_CONNECTIONS = 32
+# Seconds before a request to Supabase gives up.
+REQUEST_TIMEOUT = 15
+# Reconnect attempts after a failed health check; the delay doubles after each one.
+RECONNECT_ATTEMPTS = 4
+RECONNECT_BACKOFF = 0.5
+
+
+def _quote(value: str) -> str:
+    """Quotes a value for a PostgREST or=() filter, so commas and parentheses in names are safe."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class SupabaseStorage(Storage):
+    """
+    Storage backed by the hosted Supabase project (PostgREST + Supabase Auth).
+    The client is created on first use, and all its requests share one keep-alive pool.
+    """
+
+    def __init__(self, url: str, key: str, pool_size: int = POOL_CONNECTIONS, transport: httpx.BaseTransport = None):
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size
+        self.transport = transport  # replaces the pool's network transport (tests)
+        self._client = None
+        self._http = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._http, self._client = self._connect()
+        return self._client
+
+    def _connect(self):
+        """Returns a new (pool, client) pair."""
+        limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        http = httpx.Client(limits=limits, timeout=REQUEST_TIMEOUT, transport=self.transport)
+        return http, create_client(self.url, self.key, options=SyncClientOptions(httpx_client=http, postgrest_client_timeout=REQUEST_TIMEOUT))
+
+    # --- Connection ---
+
+    def health_check(self):
+        try:
+            self.client.table('profiles').select('id').limit(1).execute()
+            return True
+        except Exception:
+            return False
+
+    def reconnect(self):
+        """Replaces the client and its pool, retrying with exponential backoff until a health check passes."""
+        for attempt in range(RECONNECT_ATTEMPTS):
+            http, client = self._connect()
+            with self._lock:
+                old_http, self._http, self._client = self._http, http, client
+            if old_http is not None:
+                # Other threads may still have requests in flight on the old pool; they finish
+                # (or time out) within REQUEST_TIMEOUT, so close it only after that.
+                closer = threading.Timer(REQUEST_TIMEOUT, old_http.close)
+                closer.daemon = True
+                closer.start()
+            if self.health_check():
+                return True
+            time.sleep(RECONNECT_BACKOFF * 2 ** attempt)
+        return False
+
+    # --- Authentication ---
+
+    def sign_up(self, email, password):
+        res = self.client.auth.sign_up({"email": email, "password": password})
+        if res.user:
+            return res.user
+        raise Exception(res.error.message if res.error else "Could not create user.")
+
+    def sign_in(self, email, password):
+        res = self.client.auth.sign_in_with_password({"email": email, "password": password})
+        if not res.user:
+            raise Exception(res.error.message if res.error else "Invalid login credentials.")
+        return res.user
+
+    # --- Profiles ---
+
+    def get_profile(self, user_id):
+        return self.client.table('profiles').select('*').eq('id', user_id).single().execute().data
+
+    def get_pending_users(self):
+        # Assumes RLS is set up for admin to read all profiles
+        return self.client.table('profiles').select('id, email').eq('is_approved', False).eq('is_rejected', False).execute().data
+
+    def approve_user(self, user_id):
+        self.client.table('profiles').update({'is_approved': True}).eq('id', user_id).execute()
+
+    def set_approval(self, user_ids, approved):
+        if not user_ids:
+            return
+        self.client.table('profiles').update({'is_approved': approved, 'is_rejected': not approved}).in_('id', user_ids).execute()
+
+    def get_users_page(self, search=None, status=None, after=None, limit=50):
+        # Served by the get_users_page function, which aggregates the stats in the same query.
+        after_email, after_id = after or (None, None)
+        params = {'p_search': search, 'p_status': status, 'p_after_email': after_email, 'p_after_id': after_id, 'p_limit': limit}
+        return self.client.rpc('get_users_page', params).execute().data
+
+    def consume_api_calls(self, user_id, cost, limit, today):
+        # The function charges auth.uid() against its own limit and date; clients only choose the cost.
+        return bool(self.client.rpc('consume_api_calls', {'p_cost': cost}).execute().data)
+
+    # --- Entries ---
+
+    def get_entries_by_date(self, user_id, entry_date):
+        return self.client.table('entries').select("*").eq('entry_date', entry_date).eq('user_id', user_id).order('id').execute().data
+
+    def get_entries_page(self, user_id, start=None, end=None, after=None, limit=500):
+        query = self.client.table('entries').select("*").eq('user_id', user_id)
+        if start:
+            query = query.gte('entry_date', start)
+        if end:
+            query = query.lte('entry_date', end)
+        if after:
+            after_date, after_id = after
+            query = query.or_(f"entry_date.lt.{after_date},and(entry_date.eq.{after_date},id.lt.{after_id})")
+        return query.order('entry_date', desc=True).order('id', desc=True).limit(limit).execute().data
+
+    def insert_entries(self, rows):
+        # Rows are keyed by client_key, so a retried batch doesn't insert duplicates.
+        self.client.table('entries').upsert(rows, on_conflict='client_key', ignore_duplicates=True).execute()
+
+    def upsert_entries(self, rows):
+        self.client.table('entries').upsert(rows).execute()
+
+    def update_entry(self, entry_id, data):
+        self.client.table('entries').update(data).eq('id', entry_id).execute()
+
+    def delete_entries(self, user_id, entry_ids):
+        self.client.table('entries').delete().in_('id', entry_ids).eq('user_id', user_id).execute()
+
+    def get_daily_summary(self, user_id, start=None, end=None):
+        # Served by the get_daily_summary function from the daily_totals rollup, one row per day.
+        params = {'p_user_id': user_id, 'p_start': start, 'p_end': end}
+        return self.client.rpc('get_daily_summary', params).execute().data
+
+    def rebuild_daily_totals(self, user_id=None):
+        self.client.rpc('rebuild_daily_totals', {'p_user_id': user_id}).execute()
+
+    def get_meal_counts(self, user_id, limit=2000):
+        # Grouped by the get_meal_counts function, one row per distinct description.
+        return self.client.rpc('get_meal_counts', {'p_user_id': user_id, 'p_limit': limit}).execute().data
+
+    def get_ids_by_client_key(self, table, user_id, client_keys):
+        rows = self.client.table(table).select('id, client_key').eq('user_id', user_id).in_('client_key', client_keys).execute().data
+        return {row['client_key']: row['id'] for row in rows}
+
+    # --- Daily Goals ---
+
+    def get_daily_goals(self, user_id, start=None, end=None):
+        query = self.client.table('daily_goals').select('*').eq('user_id', user_id)
+        if start:
+            query = query.gte('goal_date', start)
+        if end:
+            query = query.lte('goal_date', end)
+        return query.order('goal_date').execute().data
+
+    def upsert_daily_goals(self, rows):
+        self.client.table('daily_goals').upsert(rows, on_conflict='user_id,goal_date').execute()
+
+    def delete_daily_goals(self, user_id, start, end):
+        self.client.table('daily_goals').delete().eq('user_id', user_id).gte('goal_date', start).lte('goal_date', end).execute()
+
+    # --- User Preferences ---
+
+    def get_user_preferences(self, user_id):
+        return self.client.table('user_preferences').select('*').eq('id', user_id).execute().data
+
+    def upsert_user_preferences(self, row):
+        # Upsert will insert a new row, or update it if a row with the user_id already exists.
+        self.client.table('user_preferences').upsert(row).execute()
+
+    # --- Recipes ---
+
+    def insert_recipe(self, row):
+        self.client.table('recipes').upsert(row, on_conflict='client_key', ignore_duplicates=True).execute()
+
+    def get_recipes(self, user_id):
+        return self.client.table('recipes').select(_RECIPE_SUMMARY_SELECT).eq('user_id', user_id).order('name').execute().data
+
+    def get_public_recipes(self):
+        return self.client.table('recipes').select(_RECIPE_SUMMARY_SELECT).eq('is_public', True).order('name').execute().data
+
+    def get_public_recipes_page(self, search=None, after=None, limit=20):
+        query = self.client.table('recipes').select(_RECIPE_SUMMARY_SELECT).eq('is_public', True)
+        for token in tokenize(search):
+            query = query.filter('name', 'imatch', word_prefix_pattern(token))
+        if after:
+            after_name, after_id = after
+            query = query.or_(f"name.gt.{_quote(after_name)},and(name.eq.{_quote(after_name)},id.gt.{after_id})")
+        return query.order('name').order('id').limit(limit).execute().data
+
+    def get_recipes_page(self, user_id, after_id=None, limit=500):
+        query = self.client.table('recipes').select('*').eq('user_id', user_id)
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data
+
+    def get_recipe(self, recipe_id):
+        rows = self.client.table('recipes').select('*').eq('id', recipe_id).execute().data
+        return rows[0] if rows else None
+
+    def delete_recipe(self, recipe_id):
+        self.client.table('recipes').delete().eq('id', recipe_id).execute()
+
+    def get_ingredient_recipes(self, after_id=None, limit=500):
+        query = self.client.table('recipes').select('id, servings_per_recipe, ingredients, calories_per_serving, protein_per_serving, carbs_per_serving, fats_per_serving')
+        query = query.not_.is_('ingredients', 'null')
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data
+
+    def update_recipe_nutrition(self, rows):
+        # One UPDATE ... FROM jsonb_to_recordset in the update_recipe_nutrition function.
+        self.client.rpc('update_recipe_nutrition', {'p_rows': rows}).execute()
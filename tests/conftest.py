@@ -0,0 +1,35 @@
+import pytest
+from sqlite_storage import SQLiteStorage
+from rate_limiter import InMemoryRateLimiter
+import database as db
+
+
+@pytest.fixture
+def storage():
+    """A fresh in-memory SQLite backend."""
+    return SQLiteStorage(":memory:")
+
+
+@pytest.fixture
+def user(storage):
+    user = storage.sign_up("user@example.com", "password")
+    storage.approve_user(user.id)
+    return user
+
+
+@pytest.fixture
+def app_db(storage):
+    """`database` wired to the in-memory backend, with empty caches and no write-behind queue."""
+    previous_queue = db.write_queue
+    db.write_queue = None
+    db.use_storage(storage, InMemoryRateLimiter())
+    yield db
+    db.write_queue = previous_queue
+
+
+@pytest.fixture
+def signed_in(user, monkeypatch):
+    """Signs `user` in as a regular (non-master) user, so rate-limited writes can be called directly."""
+    monkeypatch.setattr(db.st, 'secrets', {})
+    monkeypatch.setitem(db.st.session_state, 'user', user)
+    return user
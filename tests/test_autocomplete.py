@@ -0,0 +1,48 @@
+from datetime import date
+import pytest
+import database as db
+
+MACROS = {'calories': 100, 'protein': 5, 'carbs': 10, 'fats': 2}
+
+
+def texts(results):
+    return [(item['kind'], item['text'], item['count']) for item in results]
+
+
+def test_suggestions_rank_own_meals_then_public_recipes(app_db, user, storage):
+    other = storage.sign_up("other@example.com", "password")
+    storage.insert_recipe({'user_id': other.id, 'name': "Overnight oats", 'servings_per_recipe': 1, 'is_public': True,
+                           'calories_per_serving': 300, 'protein_per_serving': 10, 'carbs_per_serving': 50, 'fats_per_serving': 5})
+    db.add_recipe.__wrapped__(user.id, "Oat bars", "", "", 1, MACROS, False)
+    for day in (1, 2):
+        db.add_entry.__wrapped__(date(2024, 1, day), "Oat bars (1 servings)", 100, 5, 10, 2, user.id)
+    db.add_entry.__wrapped__(date(2024, 1, 3), "Oatmeal", 150, 5, 25, 3, user.id)
+
+    assert texts(db.suggest_meals(user.id, "oat")) == [("recipe", "Oat bars", 2), ("meal", "Oatmeal", 1), ("recipe", "Overnight oats", 0)]
+    assert texts(db.suggest_meals(user.id, "oat", limit=1)) == [("recipe", "Oat bars", 2)]
+
+
+def test_loaded_index_is_updated_by_writes(app_db, user):
+    db.add_entry.__wrapped__(date(2024, 1, 1), "Green tea", 0, 0, 0, 0, user.id)
+    assert texts(db.suggest_meals(user.id, "gre")) == [("meal", "Green tea", 1)]
+    db.add_entry.__wrapped__(date(2024, 1, 2), "Green tea", 0, 0, 0, 0, user.id)
+    db.add_recipe.__wrapped__(user.id, "Greek salad", "", "", 1, MACROS, False)
+    assert texts(db.suggest_meals(user.id, "gre")) == [("meal", "Green tea", 2), ("recipe", "Greek salad", 0)]
+
+    recipe_id = db.get_recipes(user.id)[0]['id']
+    db.delete_recipe.__wrapped__(recipe_id, user.id)
+    assert texts(db.suggest_meals(user.id, "gre")) == [("meal", "Green tea", 2)]
+
+
+def test_failed_writes_are_not_suggested(app_db, user, storage, monkeypatch):
+    db.suggest_meals(user.id, "gre")  # load the index
+
+    def fail(*args):
+        raise ConnectionError("offline")
+    monkeypatch.setattr(storage, 'insert_entries', fail)
+    monkeypatch.setattr(storage, 'insert_recipe', fail)
+    with pytest.raises(ConnectionError):
+        db.add_entry.__wrapped__(date(2024, 1, 1), "Green tea", 0, 0, 0, 0, user.id)
+    with pytest.raises(ConnectionError):
+        db.add_recipe.__wrapped__(user.id, "Greek salad", "", "", 1, MACROS, False)
+    assert db.suggest_meals(user.id, "gre") == []
@@ -0,0 +1,55 @@
+import time
+import database as db
+from cache import UserCache, user_cached
+
+
+def test_lru_eviction_and_ttl():
+    cache = UserCache(maxsize=2, ttl=60)
+    cache.set(("a", 1), "x")
+    cache.set(("b", 1), "y")
+    cache.get(("a", 1))
+    cache.set(("c", 1), "z")
+    assert cache.get(("b", 1)) == (False, None)
+    assert cache.get(("a", 1)) == (True, "x")
+
+    expiring = UserCache(ttl=0.01)
+    expiring.set(("a", 1), "x")
+    time.sleep(0.02)
+    assert expiring.get(("a", 1)) == (False, None)
+    assert expiring.stats()['size'] == 0
+
+
+def test_invalidate_only_evicts_the_users_prefix():
+    cache = UserCache()
+    cache.set(("a", "entries", 1), 1)
+    cache.set(("a", "goals"), 2)
+    cache.set(("b", "entries", 1), 3)
+    cache.invalidate("a", "entries")
+    assert cache.peek(("a", "entries", 1)) is None
+    assert cache.peek(("a", "goals")) == 2
+    assert cache.peek(("b", "entries", 1)) == 3
+
+
+def test_cached_rows_are_returned_as_copies():
+    cache, calls = UserCache(), []
+
+    @user_cached(cache, lambda user_id: (user_id,))
+    def rows(user_id):
+        calls.append(user_id)
+        return [{'name': 'Oats', 'ingredients': [{'grams': 50}]}]
+
+    first = rows("a")
+    first[0]['name'] = 'changed'
+    first[0]['ingredients'][0]['grams'] = 0
+    first.append({})
+    assert rows("a") == [{'name': 'Oats', 'ingredients': [{'grams': 50}]}]
+    assert calls == ["a"]
+
+
+def test_recipe_readers_return_copies(app_db, user):
+    db.add_recipe.__wrapped__(user.id, "Oats", "", "", 1, {'calories': 100, 'protein': 5, 'carbs': 10, 'fats': 2}, True)
+    db.get_recipes(user.id)[0]['name'] = 'changed'
+    db.get_public_recipes()[0]['name'] = 'changed'
+    db.search_recipes(user.id, "oat")[0]['name'] = 'changed'
+    assert [row['name'] for row in db.get_recipes(user.id)] == ["Oats"]
+    assert [row['name'] for row in db.get_public_recipes()] == ["Oats"]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+import charts
+
+
+def summary(days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'entry_date': pd.date_range("2024-01-01", periods=days).date})
+    for macro, _ in charts.MACROS:
+        frame[f'actual_{macro}'] = rng.uniform(0, 3000, days)
+        # Goals change twice over the range.
+        frame[f'goal_{macro}'] = np.repeat([2000.0, 1800.0, 2200.0], -(-days // 3))[:days]
+    return frame
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (501, 500), (10, 3)])
+def test_lttb_keeps_the_ends_within_the_threshold(n, threshold):
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 7) * 100
+    keep = charts.lttb_indices(x, y, threshold)
+    assert len(keep) <= threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+@pytest.mark.parametrize("threshold", [10, 50, 2])
+def test_lttb_returns_short_inputs_unchanged(threshold):
+    x = np.arange(10, dtype=np.float64)
+    assert charts.lttb_indices(x, x * 2, threshold).tolist() == list(range(10))
+
+
+def test_step_change_indices_redraw_the_series_exactly():
+    y = np.array([5, 5, 5, 7, 7, 5, 5, 9], dtype=np.float64)
+    keep = charts.step_change_indices(y)
+    assert keep.tolist() == [0, 3, 5, 7]
+    # Holding each kept value until the next kept index ('hv') gives back every point.
+    redrawn = np.repeat(y[keep], np.diff(np.append(keep, len(y))))
+    assert (redrawn == y).all()
+    assert charts.step_change_indices(np.array([1.0, 2.0])).tolist() == [0, 1]
+
+
+def test_intake_figure_downsamples_actuals_and_keeps_goals_exact():
+    frame = summary(1200)
+    fig = charts.build_intake_figure(frame, max_points=100)
+    actual, goal = fig.data[0], fig.data[1]
+    assert len(actual.x) <= 100
+    assert actual.x[0] == pd.Timestamp("2024-01-01") and actual.x[-1] == pd.Timestamp(frame['entry_date'].iloc[-1])
+    assert goal.y.tolist() == [2000.0, 1800.0, 2200.0, 2200.0]
+    assert len(fig.data) == 2 * len(charts.MACROS)
+
+
+def test_cached_figure_is_rebuilt_for_a_new_data_version():
+    charts.figure_cache.clear()
+    frame = summary(30)
+    first = charts.get_intake_figure("user", 1, "2024-01-01", frame)
+    assert charts.get_intake_figure("user", 1, "2024-01-01", frame) is first
+    assert charts.get_intake_figure("user", 2, "2024-01-01", frame) is not first
@@ -0,0 +1,87 @@
+import io
+from datetime import date
+import data_transfer
+
+
+def _import(text, fmt, batches):
+    stream = io.TextIOWrapper(io.BytesIO(text if isinstance(text, bytes) else text.encode()), encoding="utf-8-sig", newline="")
+    return data_transfer.import_entries("u", stream, fmt, batch_size=2,
+                                        insert_batch=lambda user_id, entries: batches.append(list(entries)) or len(entries))
+
+
+def test_csv_import_batches_and_reports_bad_rows():
+    batches = []
+    text = ("entry_date,description,calories,protein,carbs,fats,goal_calories,goal_protein,goal_carbs,goal_fats\n"
+            "2026-10-01,Oats,300,10,50,5,1800,120,200,50\n"
+            "2026-10-01,Eggs,150,12,1,10,,,,\n"
+            "not a date,Bad,1,1,1,1,,,,\n"
+            "2026-10-02,Soup,-5,1,1,1,,,,\n"
+            "2026-10-02,Rice,200,4,45,1,,,,\n")
+    result = _import(text, 'csv', batches)
+    assert result['imported'] == 3 and result['unreadable'] is None
+    assert [row for row, _ in result['errors']] == [3, 4]
+    assert [len(batch) for batch in batches] == [2, 1]
+    # The first row's goals apply to every entry on that day.
+    assert batches[0][1]['goals'] == {'calories': 1800, 'protein': 120, 'carbs': 200, 'fats': 50}
+    assert batches[1][0]['entry_date'] == date(2026, 10, 2) and 'goals' not in batches[1][0]
+
+
+def test_invalid_json_is_reported_not_raised():
+    result = _import('[{"entry_date": "2026-10-01", ', 'json', [])
+    assert result['imported'] == 0 and result['unreadable']
+
+
+def test_json_must_be_a_list():
+    assert _import('{"entry_date": "2026-10-01"}', 'json', [])['unreadable'] == "a JSON file must hold a list of objects"
+
+
+def test_non_utf8_file_keeps_rows_read_before_it():
+    batches = []
+    # Decoding is buffered, so the bad byte sits well past the first chunk.
+    text = b"entry_date,description,calories,protein,carbs,fats\n" + b"2026-10-01,Oats,300,10,50,5\n" * 2000 + b"2026-10-02,Caf\xe9,1,1,1,1\n"
+    result = _import(text, 'csv', batches)
+    assert "utf-8" in result['unreadable'] and result['imported'] > 0
+
+
+def test_bad_json_line_stops_reading():
+    result = _import('{"entry_date": "2026-10-01", "description": "Oats", "calories": 1, "protein": 1, "carbs": 1, "fats": 1}\n{oops\n',
+                     'jsonl', [])
+    assert result['imported'] == 1 and result['errors'][-1][0] == 2
+
+
+def test_export_round_trips_through_import(app_db, user):
+    app_db.add_entries_batch.__wrapped__(user.id, [
+        {'entry_date': date(2026, 10, 1), 'description': 'Oats', 'calories': 300, 'protein': 10, 'carbs': 50, 'fats': 5,
+         'goals': {'calories': 1800, 'protein': 120, 'carbs': 200, 'fats': 50}}])
+    exported = "".join(data_transfer.export_entries(user.id, 'jsonl'))
+    batches = []
+    result = _import(exported, 'jsonl', batches)
+    assert result['imported'] == 1
+    assert batches[0][0]['description'] == 'Oats' and batches[0][0]['goals']['calories'] == 1800
+
+
+def test_storage_error_is_reported_apart_from_the_rate_limit():
+    text = "entry_date,description,calories,protein,carbs,fats\n" + "2026-10-01,Oats,300,10,50,5\n" * 5
+    saved = []
+
+    def insert_batch(user_id, entries):
+        if saved:
+            raise ConnectionError("connection reset")
+        saved.append(entries)
+        return len(entries)
+    stream = io.TextIOWrapper(io.BytesIO(text.encode()), encoding="utf-8", newline="")
+    result = data_transfer.import_entries("u", stream, 'csv', batch_size=2, insert_batch=insert_batch)
+    assert result['imported'] == 2 and result['failed'] == "connection reset" and not result['stopped']
+
+    stream = io.TextIOWrapper(io.BytesIO(text.encode()), encoding="utf-8", newline="")
+    result = data_transfer.import_entries("u", stream, 'csv', batch_size=2, insert_batch=lambda user_id, entries: None)
+    assert result['stopped'] and result['failed'] is None
+
+
+def test_failed_limit_check_is_a_storage_error(app_db, signed_in, monkeypatch):
+    def unreachable(user_id, cost=1):
+        raise ConnectionError("offline")
+    monkeypatch.setattr(app_db.rate_limiter, 'consume', unreachable)
+    stream = io.TextIOWrapper(io.BytesIO(b"entry_date,description,calories,protein,carbs,fats\n2026-10-01,Oats,300,10,50,5\n"), encoding="utf-8", newline="")
+    result = data_transfer.import_entries(signed_in.id, stream, 'csv')
+    assert "Could not check your API call limit: offline" in result['failed'] and not result['stopped']
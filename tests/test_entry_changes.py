@@ -0,0 +1,43 @@
+from datetime import date
+from rate_limiter import InMemoryRateLimiter
+
+DAY = date(2026, 10, 17)
+
+
+def meal(description, calories):
+    return {'description': description, 'calories': calories, 'protein': 10, 'carbs': 20, 'fats': 5}
+
+
+def day_entries(db, user):
+    return [(row['description'], row['calories']) for row in db.get_entries_by_date(DAY, user.id)]
+
+
+def test_one_save_applies_deletes_inserts_and_updates(app_db, storage, signed_in, monkeypatch):
+    app_db.use_storage(storage, InMemoryRateLimiter(limit=2))
+    app_db.apply_entry_changes(signed_in.id, DAY, [meal("Oats", 300), meal("Eggs", 200), meal("Tea", 5)], [], [])
+    oats, eggs, tea = app_db.get_entries_by_date(DAY, signed_in.id)
+    summary_before = app_db.get_daily_summary(signed_in.id, DAY, DAY)
+    version = app_db.data_version(signed_in.id)
+
+    calls = []
+    for method in ('insert_entries', 'upsert_entries', 'delete_entries', 'update_entry'):
+        original = getattr(storage, method)
+        monkeypatch.setattr(storage, method, lambda *args, method=method, original=original: calls.append(method) or original(*args))
+    saved = app_db.apply_entry_changes(signed_in.id, DAY, [meal("Rice", 400), meal("Beans", 250)],
+                                       [{'id': oats['id'], **meal("Porridge", 350)}], [eggs['id'], tea['id']])
+
+    assert saved == 5
+    assert sorted(calls) == ['delete_entries', 'insert_entries', 'upsert_entries']
+    assert app_db.rate_limiter.usage(signed_in.id) == 2
+    # The cached day and summary were evicted by the save.
+    assert sorted(day_entries(app_db, signed_in)) == [("Beans", 250), ("Porridge", 350), ("Rice", 400)]
+    assert summary_before[0]['actual_calories'] == 505
+    assert app_db.get_daily_summary(signed_in.id, DAY, DAY)[0]['actual_calories'] == 1000
+    assert app_db.data_version(signed_in.id) != version
+
+
+def test_refused_save_returns_none_and_changes_nothing(app_db, storage, signed_in):
+    app_db.use_storage(storage, InMemoryRateLimiter(limit=1))
+    assert app_db.apply_entry_changes(signed_in.id, DAY, [meal("Oats", 300)], [], []) == 1
+    assert app_db.apply_entry_changes(signed_in.id, DAY, [meal("Eggs", 200)], [], []) is None
+    assert day_entries(app_db, signed_in) == [("Oats", 300)]
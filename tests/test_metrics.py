@@ -0,0 +1,29 @@
+import metrics as metrics_module
+from metrics import Metrics, InstrumentedStorage
+
+
+class _Backend:
+    def rows(self, n):
+        return [{'id': i} for i in range(n)]
+
+
+def test_counts_rows_and_samples_payloads(monkeypatch):
+    monkeypatch.setattr(metrics_module, 'PAYLOAD_SAMPLE_EVERY', 4)
+    registry = Metrics()
+    storage = InstrumentedStorage(_Backend(), registry)
+    for _ in range(8):
+        assert len(storage.rows(3)) == 3
+    series = registry.db_calls['rows']
+    assert series.count == 8 and series.rows == 24
+    assert series.payload_samples == 2
+    assert registry.summary()[0]['payload_kb'] * 1024 == series.payload_bytes / 2 * 8
+
+
+def test_unserializable_results_are_still_returned():
+    registry = Metrics()
+    circular = []
+    circular.append(circular)
+    backend = _Backend()
+    backend.unserializable = lambda: circular
+    assert InstrumentedStorage(backend, registry).unserializable() is circular
+    assert registry.db_calls['unserializable'].payload_samples == 0
@@ -0,0 +1,121 @@
+import sqlite3
+from sqlite_storage import SQLiteStorage
+
+# The profiles, entries and recipes tables as created before daily_goals, client keys and rejections.
+OLD_SCHEMA = """
+CREATE TABLE profiles (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    is_approved INTEGER NOT NULL DEFAULT 0,
+    api_call_count INTEGER NOT NULL DEFAULT 0,
+    last_api_call_date TEXT
+);
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    calories INTEGER NOT NULL,
+    protein INTEGER NOT NULL,
+    carbs INTEGER NOT NULL,
+    fats INTEGER NOT NULL,
+    goal_calories INTEGER NOT NULL,
+    goal_protein INTEGER NOT NULL,
+    goal_carbs INTEGER NOT NULL,
+    goal_fats INTEGER NOT NULL
+);
+CREATE TABLE recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    instructions TEXT,
+    servings_per_recipe REAL NOT NULL,
+    calories_per_serving INTEGER NOT NULL,
+    protein_per_serving INTEGER NOT NULL,
+    carbs_per_serving INTEGER NOT NULL,
+    fats_per_serving INTEGER NOT NULL,
+    is_public INTEGER NOT NULL DEFAULT 0
+);
+"""
+# The daily_totals rollup as first added, with copies of the goals.
+OLD_ROLLUP_SCHEMA = """
+CREATE TABLE daily_totals (
+    user_id TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    calories INTEGER NOT NULL DEFAULT 0,
+    protein INTEGER NOT NULL DEFAULT 0,
+    carbs INTEGER NOT NULL DEFAULT 0,
+    fats INTEGER NOT NULL DEFAULT 0,
+    goal_calories INTEGER,
+    goal_protein INTEGER,
+    goal_carbs INTEGER,
+    goal_fats INTEGER,
+    PRIMARY KEY (user_id, entry_date)
+);
+CREATE TRIGGER entries_daily_totals_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO daily_totals (user_id, entry_date, entry_count, calories, protein, carbs, fats, goal_calories, goal_protein, goal_carbs, goal_fats)
+    VALUES (NEW.user_id, NEW.entry_date, 1, NEW.calories, NEW.protein, NEW.carbs, NEW.fats, NEW.goal_calories, NEW.goal_protein, NEW.goal_carbs, NEW.goal_fats)
+    ON CONFLICT (user_id, entry_date) DO UPDATE SET
+        entry_count = entry_count + 1,
+        calories = calories + excluded.calories, protein = protein + excluded.protein,
+        carbs = carbs + excluded.carbs, fats = fats + excluded.fats,
+        goal_calories = excluded.goal_calories, goal_protein = excluded.goal_protein,
+        goal_carbs = excluded.goal_carbs, goal_fats = excluded.goal_fats;
+END;
+"""
+
+
+def old_database(path, rollup=True):
+    """Creates a database in the layout before daily_goals, with or without the first daily_totals rollup."""
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA + (OLD_ROLLUP_SCHEMA if rollup else ""))
+    with conn:
+        conn.executemany(
+            "INSERT INTO entries (user_id, entry_date, description, calories, protein, carbs, fats, goal_calories, goal_protein, goal_carbs, goal_fats) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [("u", "2024-01-01", "Oats", 300, 10, 50, 5, 2000, 150, 200, 70),
+             ("u", "2024-01-01", "Eggs", 200, 12, 1, 10, 2000, 150, 200, 70),
+             ("u", "2024-01-02", "Rice", 400, 8, 80, 2, 1800, 140, 180, 60)])
+    conn.close()
+    return path
+
+
+def columns(storage, table):
+    return {row['name'] for row in storage.conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_goals_move_from_entries_to_daily_goals(tmp_path):
+    storage = SQLiteStorage(old_database(str(tmp_path / "old.db")))
+    assert not columns(storage, 'entries') & {'goal_calories', 'goal_protein', 'goal_carbs', 'goal_fats'}
+    assert [(row['goal_date'], row['calories'], row['fats']) for row in storage.get_daily_goals("u")] == [("2024-01-01", 2000, 70), ("2024-01-02", 1800, 60)]
+    assert [(row['entry_date'], row['actual_calories'], row['goal_calories']) for row in storage.get_daily_summary("u")] == [("2024-01-01", 500, 2000), ("2024-01-02", 400, 1800)]
+
+    # The recreated triggers keep the rollup current without the goal columns.
+    storage.insert_entries([{'user_id': "u", 'entry_date': "2024-01-02", 'description': "Tea", 'calories': 50, 'protein': 0, 'carbs': 10, 'fats': 0}])
+    assert storage.get_daily_summary("u", start="2024-01-02")[0]['actual_calories'] == 450
+
+    # Opening the migrated file again changes nothing.
+    reopened = SQLiteStorage(storage.path)
+    assert len(reopened.get_daily_goals("u")) == 2
+
+
+def test_goals_migrate_in_a_database_from_before_the_rollup(tmp_path):
+    storage = SQLiteStorage(old_database(str(tmp_path / "old.db"), rollup=False))
+    assert not columns(storage, 'entries') & {'goal_calories', 'goal_protein', 'goal_carbs', 'goal_fats'}
+    assert [row['goal_date'] for row in storage.get_daily_goals("u")] == ["2024-01-01", "2024-01-02"]
+
+    # The rollup starts empty until it is backfilled, as the readme describes.
+    assert storage.get_daily_summary("u") == []
+    storage.rebuild_daily_totals()
+    assert [(row['entry_date'], row['actual_calories'], row['goal_calories']) for row in storage.get_daily_summary("u")] == [("2024-01-01", 500, 2000), ("2024-01-02", 400, 1800)]
+
+
+def test_missing_columns_are_added_with_client_key_indexes(tmp_path):
+    storage = SQLiteStorage(old_database(str(tmp_path / "old.db")))
+    assert {'client_key'} <= columns(storage, 'entries')
+    assert {'client_key', 'ingredients'} <= columns(storage, 'recipes')
+    assert 'is_rejected' in columns(storage, 'profiles')
+    indexes = {row['name'] for row in storage.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_entries_client_key', 'idx_recipes_client_key'} <= indexes
+    assert [row['client_key'] for row in storage.get_entries_by_date("u", "2024-01-01")] == [None, None]
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import nutrition
+
+
+def test_recipe_nutrition_sums_ingredients_per_serving():
+    foods = nutrition.load_foods()
+    almonds = foods.values[foods.row("Almonds")]
+    result = nutrition.recipe_nutrition([{'food': 'almonds', 'grams': 200}], 2)
+    assert result == {macro: int(round(value)) for macro, value in zip(nutrition.MACROS, almonds)}
+
+
+def test_unknown_food_raises():
+    with pytest.raises(Exception, match="Unknown food"):
+        nutrition.recipe_nutrition([{'food': 'Moon rock', 'grams': 10}], 1)
+
+
+def test_compute_nutrition_matches_per_recipe_loop():
+    foods = nutrition.load_foods()
+    recipes = [{'ingredients': [{'food': 'Egg', 'grams': 100}, {'food': 'Butter', 'grams': 10}], 'servings_per_recipe': 2},
+               {'ingredients': [{'food': 'Oats (rolled)', 'grams': 80}], 'servings_per_recipe': 1}]
+    expected = [sum(foods.values[foods.row(i['food'])].astype(np.float64) * i['grams'] / 100 for i in r['ingredients']) / r['servings_per_recipe']
+                for r in recipes]
+    np.testing.assert_allclose(nutrition.compute_nutrition(recipes, foods), expected, rtol=1e-6)
+
+
+def test_stale_recipes_only_returns_changed_foods():
+    foods = nutrition.load_foods()
+    recipes = [{'id': 1, 'ingredients': [{'food': 'Egg', 'grams': 100}], 'servings_per_recipe': 1},
+               {'id': 2, 'ingredients': [{'food': 'Apple', 'grams': 100}], 'servings_per_recipe': 1}]
+    for recipe, values in zip(recipes, nutrition.compute_nutrition(recipes, foods)):
+        recipe.update({f'{macro}_per_serving': int(round(v)) for macro, v in zip(nutrition.MACROS, values)})
+    changed = foods.with_values({'Egg': {'calories': 200, 'protein': 12.6, 'carbs': 0.7, 'fats': 9.5}})
+    assert [row['id'] for row in nutrition.stale_recipes(recipes, changed, ['Egg'])] == [1]
+    assert nutrition.stale_recipes(recipes, changed, ['Apple']) == []
+
+
+def test_add_recipe_from_ingredients(app_db, user):
+    # Regression: the `nutrition` argument used to shadow the nutrition module.
+    app_db.add_recipe.__wrapped__(user.id, "Almond snack", "", "", 1, {'calories': 0, 'protein': 0, 'carbs': 0, 'fats': 0},
+                                  False, [{'food': 'almonds', 'grams': 100}])
+    recipe, = app_db.get_recipes(user.id)
+    assert recipe['calories_per_serving'] == 579
+    assert app_db.get_recipe_details(recipe['id'])['ingredients'] == [{'food': 'Almonds', 'grams': 100.0}]
@@ -0,0 +1,37 @@
+import threading
+import time
+import pytest
+import database as db
+
+
+def test_results_map_back_to_their_names():
+    page_data = db.load_page_data({'double': (lambda n: n * 2, 21), 'greeting': (str.upper, "hi"), 'empty': (list,)})
+    assert page_data == {'double': 42, 'greeting': "HI", 'empty': []}
+
+
+def test_one_failed_read_does_not_cancel_the_others():
+    finished = threading.Event()
+
+    def slow_read():
+        time.sleep(0.2)
+        finished.set()
+        return "rows"
+
+    def broken_read():
+        raise ConnectionError("connection reset")
+
+    with pytest.raises(Exception, match=r"broken: connection reset") as error:
+        db.load_page_data({'broken': (broken_read,), 'slow': (slow_read,)})
+    # The slow read was waited for, so its result reached its cache before the error surfaced.
+    assert finished.is_set()
+    assert "slow" not in str(error.value)
+    assert isinstance(error.value.__cause__, ConnectionError)
+
+
+def test_reads_past_the_timeout_are_reported_without_waiting_for_them():
+    release = threading.Event()
+    started = time.monotonic()
+    with pytest.raises(Exception, match=r"stuck: took longer than 0.2 seconds"):
+        db.load_page_data({'fast': (int, "1"), 'stuck': (release.wait, 5)}, timeout=0.2)
+    assert time.monotonic() - started < 2
+    release.set()
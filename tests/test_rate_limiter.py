@@ -0,0 +1,57 @@
+import pytest
+import rate_limiter
+from rate_limiter import InMemoryRateLimiter, StorageRateLimiter, DeferredRateLimiter
+
+
+def test_in_memory_limit():
+    limiter = InMemoryRateLimiter(limit=3)
+    assert [limiter.consume("u") for _ in range(4)] == [True, True, True, False]
+    assert limiter.usage("u") == 3
+    assert limiter.consume("other")
+
+
+def test_in_memory_counters_reset_on_the_utc_day(monkeypatch):
+    limiter = InMemoryRateLimiter(limit=1)
+    monkeypatch.setattr(rate_limiter, 'utc_today', lambda: "2026-10-17")
+    assert limiter.consume("u")
+    assert not limiter.consume("u")
+    monkeypatch.setattr(rate_limiter, 'utc_today', lambda: "2026-10-18")
+    assert limiter.usage("u") == 0
+    assert limiter.consume("u")
+
+
+def test_storage_limit_and_usage(storage, user):
+    limiter = StorageRateLimiter(storage, limit=3)
+    assert limiter.consume(user.id, 2)
+    assert limiter.consume(user.id)
+    assert not limiter.consume(user.id)
+    assert limiter.usage(user.id) == 3
+
+
+def test_storage_cost_over_limit_on_first_call_of_day(storage, user):
+    storage.consume_api_calls(user.id, 1, 3, "2000-01-01")
+    # A new day resets the counter, but the cost must still fit the limit.
+    assert not storage.consume_api_calls(user.id, 4, 3, "2000-01-02")
+    assert storage.consume_api_calls(user.id, 3, 3, "2000-01-02")
+    assert storage.get_profile(user.id)['api_call_count'] == 3
+
+
+def test_storage_missing_profile_is_not_limit_reached(storage):
+    with pytest.raises(Exception, match="No profile"):
+        storage.consume_api_calls("no-such-user", 1, 3, "2000-01-01")
+
+
+def test_storage_rejects_non_positive_cost(storage, user):
+    with pytest.raises(Exception):
+        storage.consume_api_calls(user.id, -5, 3, "2000-01-01")
+
+
+def test_deferred_limiter_starts_from_stored_usage(storage, user):
+    backend = StorageRateLimiter(storage, limit=3)
+    backend.consume(user.id, 2)
+    limiter = DeferredRateLimiter(backend)
+    assert limiter.consume(user.id)
+    assert not limiter.consume(user.id)
+    assert limiter.usage(user.id) == 3
+    # Nothing reaches the database until the caller settles the calls.
+    assert backend.usage(user.id) == 2
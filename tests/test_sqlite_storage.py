@@ -0,0 +1,187 @@
+import pytest
+
+
+def entry(user, day, description="Oats", calories=300, **extra):
+    return {'user_id': user.id, 'entry_date': day, 'description': description,
+            'calories': calories, 'protein': 10, 'carbs': 50, 'fats': 5, **extra}
+
+
+def recipe(user, name="Oats", **extra):
+    return {'user_id': user.id, 'name': name, 'servings_per_recipe': 2, 'calories_per_serving': 150,
+            'protein_per_serving': 5, 'carbs_per_serving': 25, 'fats_per_serving': 3, 'is_public': False, **extra}
+
+
+# --- Authentication and profiles ---
+
+def test_sign_up_and_sign_in(storage):
+    user = storage.sign_up("a@example.com", "secret")
+    assert storage.sign_in("a@example.com", "secret").id == user.id
+    with pytest.raises(Exception, match="Invalid login"):
+        storage.sign_in("a@example.com", "wrong")
+    with pytest.raises(Exception, match="already registered"):
+        storage.sign_up("a@example.com", "other")
+    assert storage.get_pending_users() == [{'id': user.id, 'email': "a@example.com"}]
+    storage.approve_user(user.id)
+    assert storage.get_profile(user.id)['is_approved'] is True
+    assert storage.get_pending_users() == []
+
+
+def test_users_page_filters_pages_and_counts_entries(storage):
+    users = [storage.sign_up(f"user{n}@example.com", "password") for n in range(5)]
+    storage.sign_up("under_score@example.com", "password")
+    storage.set_approval([users[0].id, users[1].id], True)
+    storage.set_approval([users[2].id], False)
+    storage.set_approval([], True)
+    storage.insert_entries([entry(users[0], "2024-01-01"), entry(users[0], "2024-01-03")])
+
+    first = storage.get_users_page(limit=4)
+    rest = storage.get_users_page(after=(first[-1]['email'], first[-1]['id']))
+    assert [row['email'] for row in first + rest] == ["under_score@example.com"] + [f"user{n}@example.com" for n in range(5)]
+    assert (first[1]['entry_count'], first[1]['last_entry_date']) == (2, "2024-01-03")
+    assert (first[2]['entry_count'], first[2]['last_entry_date']) == (0, None)
+
+    assert [row['email'] for row in storage.get_users_page(status='approved')] == ["user0@example.com", "user1@example.com"]
+    assert [row['email'] for row in storage.get_users_page(status='rejected')] == ["user2@example.com"]
+    assert len(storage.get_users_page(status='pending')) == 3
+    assert [row['email'] for row in storage.get_users_page(search="R_")] == ["under_score@example.com"]
+    assert storage.get_users_page(search="%") == []
+
+
+# --- Entries ---
+
+def test_entries_round_trip(storage, user):
+    storage.insert_entries([entry(user, "2024-01-01"), entry(user, "2024-01-01", "Eggs", 200)])
+    rows = storage.get_entries_by_date(user.id, "2024-01-01")
+    assert [(row['description'], row['calories']) for row in rows] == [("Oats", 300), ("Eggs", 200)]
+
+    storage.update_entry(rows[0]['id'], {'calories': 350})
+    storage.upsert_entries([{**rows[1], 'description': "Scrambled eggs"}])
+    storage.delete_entries("someone-else", [rows[0]['id']])
+    assert [(row['description'], row['calories']) for row in storage.get_entries_by_date(user.id, "2024-01-01")] == [("Oats", 350), ("Scrambled eggs", 200)]
+
+    storage.delete_entries(user.id, [rows[0]['id']])
+    assert [row['id'] for row in storage.get_entries_by_date(user.id, "2024-01-01")] == [rows[1]['id']]
+
+
+def test_entries_page_walks_a_range_newest_first(storage, user):
+    storage.insert_entries([entry(user, f"2024-01-0{day}", f"Meal {day}.{n}") for day in range(1, 6) for n in range(2)])
+    pages, after = [], None
+    while True:
+        page = storage.get_entries_page(user.id, start="2024-01-02", end="2024-01-04", after=after, limit=4)
+        if not page:
+            break
+        pages.append([row['description'] for row in page])
+        after = (page[-1]['entry_date'], page[-1]['id'])
+    assert pages == [["Meal 4.1", "Meal 4.0", "Meal 3.1", "Meal 3.0"], ["Meal 2.1", "Meal 2.0"]]
+    assert len(storage.get_entries_page(user.id)) == 10
+
+
+def test_client_keys_make_inserts_idempotent(storage, user):
+    storage.insert_entries([entry(user, "2024-01-01", client_key="k1"), entry(user, "2024-01-01", "Eggs", client_key="k2")])
+    storage.insert_entries([entry(user, "2024-01-01", "Retried", client_key="k1")])
+    storage.insert_recipe(recipe(user, client_key="r1"))
+    storage.insert_recipe(recipe(user, "Retried", client_key="r1"))
+    assert [row['description'] for row in storage.get_entries_by_date(user.id, "2024-01-01")] == ["Oats", "Eggs"]
+    assert [row['name'] for row in storage.get_recipes(user.id)] == ["Oats"]
+
+    ids = storage.get_ids_by_client_key('entries', user.id, ["k1", "k2", "missing"])
+    assert sorted(ids) == ["k1", "k2"]
+    assert storage.get_ids_by_client_key('entries', "someone-else", ["k1"]) == {}
+    assert list(storage.get_ids_by_client_key('recipes', user.id, ["r1"])) == ["r1"]
+    assert storage.get_ids_by_client_key('entries', user.id, []) == {}
+
+
+def test_meal_counts_rank_descriptions_with_latest_macros(storage, user):
+    storage.insert_entries([entry(user, "2024-01-01", "Eggs", 200), entry(user, "2024-01-01", "Oats"),
+                            entry(user, "2024-01-02", "Eggs", 220), entry(user, "2024-01-03", "Tea", 5)])
+    counts = storage.get_meal_counts(user.id)
+    assert [(row['description'], row['count'], row['calories']) for row in counts] == [("Eggs", 2, 220), ("Tea", 1, 5), ("Oats", 1, 300)]
+    assert len(storage.get_meal_counts(user.id, limit=1)) == 1
+
+
+def totals(storage, user):
+    return [(row['entry_date'], row['actual_calories']) for row in storage.get_daily_summary(user.id)]
+
+
+def test_daily_totals_follow_entry_writes(storage, user):
+    storage.insert_entries([entry(user, "2024-01-01"), entry(user, "2024-01-01", "Eggs", 200), entry(user, "2024-01-02")])
+    assert totals(storage, user) == [("2024-01-01", 500), ("2024-01-02", 300)]
+
+    oats, eggs = storage.get_entries_by_date(user.id, "2024-01-01")
+    storage.update_entry(eggs['id'], {'calories': 250, 'entry_date': "2024-01-03"})
+    assert totals(storage, user) == [("2024-01-01", 300), ("2024-01-02", 300), ("2024-01-03", 250)]
+
+    storage.delete_entries(user.id, [oats['id']])
+    assert totals(storage, user) == [("2024-01-02", 300), ("2024-01-03", 250)]
+    assert totals(storage, user)[1:] == [(row['entry_date'], row['actual_calories']) for row in storage.get_daily_summary(user.id, start="2024-01-03", end="2024-01-03")]
+
+
+def test_rebuild_daily_totals(storage, user):
+    other = storage.sign_up("other@example.com", "password")
+    storage.insert_entries([entry(user, "2024-01-01"), entry(other, "2024-01-01", calories=100)])
+    storage.conn.execute("UPDATE daily_totals SET calories = 0")
+
+    storage.rebuild_daily_totals(user.id)
+    assert totals(storage, user) == [("2024-01-01", 300)]
+    assert totals(storage, other) == [("2024-01-01", 0)]
+    storage.rebuild_daily_totals()
+    assert totals(storage, other) == [("2024-01-01", 100)]
+
+
+# --- Daily Goals ---
+
+def goals(user, day, calories):
+    return {'user_id': user.id, 'goal_date': day, 'calories': calories, 'protein': 150, 'carbs': 200, 'fats': 70}
+
+
+def test_daily_goals_override_default_goals(storage, user):
+    storage.upsert_user_preferences({'id': user.id, 'default_calories': 2000, 'default_protein': 150, 'default_carbs': 200, 'default_fats': 70})
+    storage.insert_entries([entry(user, f"2024-01-0{day}") for day in range(1, 4)])
+    storage.upsert_daily_goals([goals(user, "2024-01-02", 1800), goals(user, "2024-01-03", 1700)])
+    storage.upsert_daily_goals([goals(user, "2024-01-03", 1600)])
+    assert [row['calories'] for row in storage.get_daily_goals(user.id)] == [1800, 1600]
+    assert [row['goal_calories'] for row in storage.get_daily_summary(user.id)] == [2000, 1800, 1600]
+
+    storage.delete_daily_goals(user.id, "2024-01-01", "2024-01-02")
+    assert [row['goal_date'] for row in storage.get_daily_goals(user.id, start="2024-01-01", end="2024-01-03")] == ["2024-01-03"]
+    assert [row['goal_calories'] for row in storage.get_daily_summary(user.id)] == [2000, 2000, 1600]
+
+
+# --- User Preferences ---
+
+def test_user_preferences_upsert(storage, user):
+    assert storage.get_user_preferences(user.id) == []
+    goals = {'id': user.id, 'default_calories': 2000, 'default_protein': 150, 'default_carbs': 200, 'default_fats': 70}
+    storage.upsert_user_preferences(goals)
+    storage.upsert_user_preferences({**goals, 'default_calories': 1800})
+    assert storage.get_user_preferences(user.id) == [{**goals, 'default_calories': 1800}]
+
+
+# --- Recipes ---
+
+def test_recipes_round_trip(storage, user):
+    ingredients = [{'food': "oats", 'grams': 80}]
+    storage.insert_recipe(recipe(user, "Porridge", description="Warm", ingredients=ingredients))
+    storage.insert_recipe(recipe(user, "Granola", is_public=True))
+    assert [row['name'] for row in storage.get_recipes(user.id)] == ["Granola", "Porridge"]
+    assert [row['name'] for row in storage.get_public_recipes()] == ["Granola"]
+
+    porridge = storage.get_recipes(user.id)[1]
+    stored = storage.get_recipe(porridge['id'])
+    assert stored['description'] == "Warm" and stored['ingredients'] == ingredients and stored['is_public'] is False
+
+    storage.delete_recipe(porridge['id'])
+    assert storage.get_recipe(porridge['id']) is None
+
+
+def test_ingredient_recipes_and_nutrition_updates(storage, user):
+    storage.insert_recipe(recipe(user, "Plain"))
+    for n in range(3):
+        storage.insert_recipe(recipe(user, f"Mix {n}", ingredients=[{'food': "oats", 'grams': 10 * (n + 1)}]))
+    first = storage.get_ingredient_recipes(limit=2)
+    rest = storage.get_ingredient_recipes(after_id=first[-1]['id'])
+    assert [row['ingredients'][0]['grams'] for row in first + rest] == [10, 20, 30]
+
+    storage.update_recipe_nutrition([{'id': row['id'], 'calories_per_serving': 99, 'fats_per_serving': 1} for row in first])
+    assert {row['name']: row['calories_per_serving'] for row in storage.get_recipes(user.id)} == {"Plain": 150, "Mix 0": 99, "Mix 1": 99, "Mix 2": 150}
+    assert storage.get_recipe(first[0]['id'])['fats_per_serving'] == 1
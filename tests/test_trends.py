@@ -0,0 +1,100 @@
+import random
+from datetime import date, timedelta
+from trends import TrendEngine, MACROS, GOAL_TOLERANCE
+
+TODAY = date(2026, 10, 17)
+
+
+def _row(day, calories, goal=2000):
+    return {'entry_date': day.isoformat(), **{f'actual_{m}': calories for m in MACROS}, **{f'goal_{m}': goal for m in MACROS}}
+
+
+def _expected(days, today):
+    """Brute-force trends for the calories macro, from {iso day: row}."""
+    def hit(day):
+        row = days.get(day.isoformat())
+        return row is not None and abs(row['actual_calories'] - row['goal_calories']) <= GOAL_TOLERANCE * row['goal_calories']
+    stats = {}
+    for w in (7, 30):
+        window = [days[d.isoformat()] for d in (today - timedelta(days=k) for k in range(w)) if d.isoformat() in days]
+        stats[f'avg_{w}'] = sum(r['actual_calories'] for r in window) / len(window) if window else None
+        stats[f'adherence_{w}'] = 100 * sum(hit(date.fromisoformat(r['entry_date'])) for r in window) / len(window) if window else None
+    day, streak = (today if today.isoformat() in days else today - timedelta(days=1)), 0
+    while hit(day):
+        streak, day = streak + 1, day - timedelta(days=1)
+    stats['current_streak'] = streak
+    best = run = 0
+    if days:
+        day, last = min(map(date.fromisoformat, days)), max(map(date.fromisoformat, days))
+        while day <= last:
+            run = run + 1 if hit(day) else 0
+            best, day = max(best, run), day + timedelta(days=1)
+    stats['best_streak'] = best
+    return stats
+
+
+def _assert_matches(engine, days, today):
+    got = engine.snapshot(today)['macros']['calories']
+    for key, value in _expected(days, today).items():
+        assert (got[key] is None and value is None) or abs(got[key] - value) < 1e-9, key
+
+
+def test_empty_engine():
+    snapshot = TrendEngine().snapshot(TODAY)
+    assert snapshot['weekly'] == []
+    assert snapshot['macros']['calories']['avg_7'] is None
+    assert snapshot['macros']['calories']['best_streak'] == 0
+
+
+def test_incremental_updates_match_full_recompute():
+    rng = random.Random(7)
+    days = {}
+    for k in range(400):
+        if rng.random() < 0.8:
+            day = TODAY - timedelta(days=k)
+            days[day.isoformat()] = _row(day, rng.choice([2000, 1950, 2500]))
+    engine = TrendEngine([days[k] for k in sorted(days)])
+    _assert_matches(engine, days, TODAY)
+    for step in range(150):
+        day = TODAY - timedelta(days=rng.randint(-20, 450))
+        if rng.random() < 0.3:
+            days.pop(day.isoformat(), None)
+        else:
+            days[day.isoformat()] = _row(day, rng.choice([2000, 2100, 1500]))
+        engine.update([days[day.isoformat()]] if day.isoformat() in days else [], day, day)
+        if step % 10 == 0:
+            _assert_matches(engine, days, TODAY)
+            _assert_matches(engine, days, TODAY + timedelta(days=25))
+    # A wide range takes the rebuild path.
+    start, end = TODAY - timedelta(days=120), TODAY - timedelta(days=40)
+    for k in range(81):
+        days.pop((start + timedelta(days=k)).isoformat(), None)
+    engine.update([], start, end)
+    _assert_matches(engine, days, TODAY)
+
+
+def test_weekly_summaries_start_on_monday():
+    rows = [_row(TODAY - timedelta(days=k), 2000) for k in range(20)]
+    weeks = TrendEngine(rows).snapshot(TODAY)['weekly']
+    assert all(week['week_start'].weekday() == 0 for week in weeks)
+    assert sum(week['days_logged'] for week in weeks) == 20
+    assert weeks[-1]['adherence_calories'] == 100
+
+
+def test_get_trends_refreshes_only_written_days(app_db, user, storage):
+    storage.insert_entries([{'entry_date': str(TODAY - timedelta(days=k)), 'description': 'm', 'calories': 2000, 'protein': 150,
+                             'carbs': 250, 'fats': 60, 'user_id': user.id} for k in range(1, 40)])
+    assert app_db.get_trends(user.id, TODAY)['macros']['calories']['current_streak'] == 39
+    app_db.add_entry.__wrapped__(TODAY, 'meal', 2000, 150, 250, 60, user.id)
+    assert app_db._trend_changes[user.id] == (TODAY, TODAY)
+    assert app_db.get_trends(user.id, TODAY)['macros']['calories']['current_streak'] == 40
+
+
+def test_get_trends_ignores_stale_cached_summary(app_db, user, storage):
+    app_db.get_trends(user.id, TODAY)
+    app_db.get_daily_summary(user.id)  # cached while the day is still empty
+    storage.insert_entries([{'entry_date': str(TODAY), 'description': 'm', 'calories': 2000, 'protein': 150,
+                             'carbs': 250, 'fats': 60, 'user_id': user.id}])
+    # Marked without evicting the cached summary, as a concurrent rerun could leave it.
+    app_db._data_changed(user.id, TODAY)
+    assert app_db.get_trends(user.id, TODAY)['macros']['calories']['avg_7'] == 2000
@@ -0,0 +1,107 @@
+from datetime import date
+import pytest
+import write_queue
+from write_queue import WriteQueue, WriteBehindWorker
+from rate_limiter import StorageRateLimiter
+
+DAY = date(2026, 10, 17)
+
+
+def test_claim_holds_a_users_writes_behind_a_failed_one(monkeypatch):
+    monkeypatch.setattr(write_queue, 'MAX_ATTEMPTS', 1)
+    queue = WriteQueue(":memory:")
+    first = queue.enqueue("a", 'insert_entry', {'row': {}})
+    queue.enqueue("a", 'update_entry', {'row': {}})
+    other = queue.enqueue("b", 'insert_entry', {'row': {}})
+    claimed = queue.claim()
+    queue.release(claimed, "boom")
+    assert [write['seq'] for write in queue.failed("a")] == [first]
+    assert [write['seq'] for write in queue.claim()] == [other]
+    queue.discard_failed("a")
+    assert [write['op'] for write in queue.claim()] == ['update_entry']
+
+
+def test_worker_applies_runs_in_order():
+    queue, applied = WriteQueue(":memory:"), []
+    for op in ('insert_entry', 'insert_entry', 'delete_entry', 'insert_entry'):
+        queue.enqueue("a", op, {'row': {}})
+    WriteBehindWorker(queue, lambda op, writes: applied.append((op, len(writes)))).flush()
+    assert applied == [('insert_entry', 2), ('delete_entry', 1), ('insert_entry', 1)]
+    assert queue.stats()['pending'] == 0
+
+
+@pytest.fixture
+def queued_db(app_db):
+    queue = WriteQueue(":memory:")
+    worker = WriteBehindWorker(queue, app_db._apply_queued_writes)
+    worker.start()
+    app_db.write_queue = queue
+    yield app_db
+    worker.stop()
+
+
+def test_queued_insert_shows_before_flush_and_lands(queued_db, user, storage):
+    queued_db.add_entry.__wrapped__(DAY, "Oats", 300, 10, 50, 5, user.id)
+    assert [row['description'] for row in queued_db.get_entries_by_date(DAY, user.id)] == ["Oats"]
+    assert queued_db.write_queue.wait_until_flushed(user.id, 5)
+    assert [row['description'] for row in storage.get_entries_by_date(user.id, DAY.isoformat())] == ["Oats"]
+
+
+def test_delete_of_a_queued_insert_is_not_undone(queued_db, user, storage):
+    queued_db.add_entry.__wrapped__(DAY, "Oats", 300, 10, 50, 5, user.id)
+    temp_id = queued_db.get_entries_by_date(DAY, user.id)[0]['id']
+    queued_db.delete_entry.__wrapped__(temp_id, user.id)
+    assert queued_db.write_queue.wait_until_flushed(user.id, 5)
+    assert storage.get_entries_by_date(user.id, DAY.isoformat()) == []
+    assert queued_db.get_entries_by_date(DAY, user.id) == []
+
+
+def test_update_of_a_queued_insert_is_applied_after_it(queued_db, user, storage):
+    queued_db.add_entry.__wrapped__(DAY, "Oats", 300, 10, 50, 5, user.id)
+    temp_id = queued_db.get_entries_by_date(DAY, user.id)[0]['id']
+    queued_db.update_entry.__wrapped__(temp_id, "Oats and milk", 400, 15, 60, 8, user.id)
+    assert queued_db.write_queue.wait_until_flushed(user.id, 5)
+    rows = storage.get_entries_by_date(user.id, DAY.isoformat())
+    assert [(row['description'], row['calories']) for row in rows] == [("Oats and milk", 400)]
+
+
+def test_undated_edits_are_queued_behind_a_parked_write(app_db, user, storage, monkeypatch):
+    monkeypatch.setattr(write_queue, 'MAX_ATTEMPTS', 1)
+    storage.insert_entries([{'user_id': user.id, 'entry_date': DAY.isoformat(), 'description': "Oats", 'calories': 300, 'protein': 10, 'carbs': 50, 'fats': 5}])
+    entry_id = storage.get_entries_by_date(user.id, DAY.isoformat())[0]['id']
+    app_db.write_queue = queue = WriteQueue(":memory:")  # no worker, so nothing is flushed until asked
+    queue.enqueue(user.id, 'insert_entry', {'row': {}}, DAY.isoformat())
+    queue.release(queue.claim(), "boom")
+
+    app_db.update_entry.__wrapped__(entry_id, "Porridge", 350, 12, 55, 6, user.id)
+    assert [row['description'] for row in app_db.get_entries_by_date(DAY, user.id)] == ["Porridge"]
+    assert queue.claim() == []
+
+    queue.discard_failed(user.id)
+    WriteBehindWorker(queue, app_db._apply_queued_writes).flush()
+    assert [(row['description'], row['entry_date']) for row in storage.get_entries_by_date(user.id, DAY.isoformat())] == [("Porridge", DAY.isoformat())]
+
+
+def test_queued_writes_are_counted_locally_and_charged_on_flush(app_db, signed_in, storage, monkeypatch):
+    app_db.use_storage(storage, StorageRateLimiter(storage, limit=3))
+    app_db.write_queue = queue = WriteQueue(":memory:")
+
+    network = {'up': False}
+
+    def unless_offline(call):
+        def wrapper(*args):
+            if not network['up']:
+                raise ConnectionError("offline")
+            return call(*args)
+        return wrapper
+    monkeypatch.setattr(storage, 'get_profile', unless_offline(storage.get_profile))
+    monkeypatch.setattr(storage, 'consume_api_calls', unless_offline(storage.consume_api_calls))
+    for n in range(4):
+        app_db.add_entry(DAY, f"Meal {n}", 100, 1, 1, 1, signed_in.id)
+    # The fourth call is over the limit, counted without reaching the database.
+    assert [row['description'] for row in app_db.get_entries_by_date(DAY, signed_in.id)] == ["Meal 0", "Meal 1", "Meal 2"]
+
+    network['up'] = True
+    WriteBehindWorker(queue, app_db._apply_queued_writes).flush()
+    assert len(storage.get_entries_by_date(signed_in.id, DAY.isoformat())) == 3
+    assert storage.get_profile(signed_in.id)['api_call_count'] == 3
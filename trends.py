@@ -0,0 +1,214 @@
+import threading
+from datetime import date, timedelta
+import numpy as np
+
+MACROS = ['calories', 'protein', 'carbs', 'fats']
+# Rolling windows (in days) reported for every macro.
+WINDOWS = (7, 30)
+# A logged day meets a macro's goal when intake is within this fraction of the goal.
+GOAL_TOLERANCE = 0.10
+# Spare days allocated past the last logged day, so new days rarely reallocate the arrays.
+GROWTH_DAYS = 64
+# Above this many changed days, the prefix sums are rebuilt in one pass instead of patched per day.
+PATCH_LIMIT = 32
+
+
+class TrendEngine:
+    """
+    Rolling averages, adherence, goal streaks and weekly summaries over a user's daily totals
+    (rows of `get_daily_summary`). Days are held in dense arrays from the first logged day,
+    next to prefix sums of intake, logged days and goal hits, so any window costs two lookups.
+    `update` patches the prefix sums and streaks from the changed days onwards instead of
+    recomputing the whole history.
+    """
+
+    def __init__(self, rows: list = ()):
+        self._lock = threading.Lock()
+        self._snapshots = {}    # today -> snapshot, cleared on every update
+        self.start = None       # date of day index 0
+        self.size = 0           # days from `start` to the last day ever set
+        self._allocate(0)
+        self._load(rows)
+
+    def update(self, rows: list, start: date, end: date):
+        """Replaces the days from `start` to `end` (inclusive) with `rows`; days without a row are unlogged."""
+        with self._lock:
+            self._snapshots.clear()
+            by_day = {row['entry_date']: row for row in rows}
+            days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+            if self.start is None or start < self.start:
+                self._resize(start, self.size + ((self.start - start).days if self.start else 0))
+            if self._index(end) >= len(self._logged):
+                self._resize(self.start, self._index(end) + 1)
+            # Spare days are zeros and the prefix sums already cover them.
+            self.size = max(self.size, self._index(end) + 1)
+            if len(days) > PATCH_LIMIT:
+                for day in days:
+                    self._assign(self._index(day), by_day.get(day.isoformat()))
+                self._rebuild()
+                return
+            for day in days:
+                self._set_day(self._index(day), by_day.get(day.isoformat()))
+
+    def snapshot(self, today: date) -> dict:
+        """
+        Returns the trends as of `today`: 'macros' maps each macro to its rolling averages
+        ('avg_7', 'avg_30'), adherence percentages ('adherence_7', 'adherence_30') and streaks
+        ('current_streak', 'best_streak'); 'weekly' lists Monday-to-Sunday summaries, oldest
+        first; 'rolling' holds the dates and 7-day averages of every day. Averages and
+        adherence only count logged days and are None when a window has none. A day that
+        isn't logged yet doesn't end the current streak until it is over.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(today)
+            if snapshot is None:
+                snapshot = self._snapshots[today] = self._build_snapshot(today)
+            return snapshot
+
+    # --- Storage ---
+
+    def _index(self, day: date) -> int:
+        return (day - self.start).days
+
+    def _allocate(self, capacity: int):
+        self._actual = np.zeros((capacity, len(MACROS)))
+        self._goal = np.zeros((capacity, len(MACROS)))
+        self._logged = np.zeros(capacity, dtype=bool)
+        self._hit = np.zeros((capacity, len(MACROS)), dtype=bool)
+
+    def _resize(self, start: date, size: int):
+        """Moves the arrays to begin at `start` with room for `size` days, then rebuilds the prefix sums."""
+        shift = (self.start - start).days if self.start else 0
+        old = (self._actual, self._goal, self._logged, self._hit)
+        self._allocate(size + GROWTH_DAYS)
+        for new, previous in zip((self._actual, self._goal, self._logged, self._hit), old):
+            new[shift:shift + self.size] = previous[:self.size]
+        self.start, self.size = start, size
+        self._rebuild()
+
+    def _load(self, rows: list):
+        if not rows:
+            return
+        days = [date.fromisoformat(row['entry_date']) for row in rows]
+        self._resize(min(days), (max(days) - min(days)).days + 1)
+        for day, row in zip(days, rows):
+            self._assign(self._index(day), row)
+        self._rebuild()
+
+    def _assign(self, i: int, row):
+        """Stores one day's totals and goals (or clears it if `row` is None) without touching the prefix sums."""
+        if row is None:
+            self._actual[i] = self._goal[i] = 0
+            self._logged[i] = False
+            self._hit[i] = False
+        else:
+            self._actual[i] = [row[f'actual_{macro}'] or 0 for macro in MACROS]
+            self._goal[i] = [row[f'goal_{macro}'] or 0 for macro in MACROS]
+            self._logged[i] = True
+            self._hit[i] = np.abs(self._actual[i] - self._goal[i]) <= GOAL_TOLERANCE * self._goal[i]
+
+    def _rebuild(self):
+        """Recomputes the prefix sums and best streaks from the day arrays."""
+        capacity = len(self._logged)
+        self._actual_sum = np.zeros((capacity + 1, len(MACROS)))
+        self._logged_sum = np.zeros(capacity + 1, dtype=np.int64)
+        self._hit_sum = np.zeros((capacity + 1, len(MACROS)), dtype=np.int64)
+        np.cumsum(self._actual, axis=0, out=self._actual_sum[1:])
+        np.cumsum(self._logged, out=self._logged_sum[1:])
+        np.cumsum(self._hit, axis=0, out=self._hit_sum[1:])
+        self._best = np.array([_longest_run(self._hit[:self.size, m]) for m in range(len(MACROS))])
+        self._best_stale = np.zeros(len(MACROS), dtype=bool)
+
+    def _set_day(self, i: int, row):
+        """Stores one day and shifts every later prefix sum by the change."""
+        actual, logged, hit = self._actual[i].copy(), self._logged[i], self._hit[i].copy()
+        self._assign(i, row)
+        self._actual_sum[i + 1:] += self._actual[i] - actual
+        self._logged_sum[i + 1:] += int(self._logged[i]) - int(logged)
+        self._hit_sum[i + 1:] += self._hit[i].astype(np.int64) - hit
+        # A broken run may have been the longest one, so it is re-measured on the next snapshot;
+        # a new hit can only join runs, so the run through it is the only candidate.
+        self._best_stale |= hit & ~self._hit[i]
+        for m in np.flatnonzero(self._hit[i] & ~hit & ~self._best_stale):
+            first, last = self._run(i, m)
+            self._best[m] = max(self._best[m], last - first + 1)
+
+    def _run(self, i: int, m: int):
+        """Returns the first and last day index of the goal-hit run of macro `m` through day `i`."""
+        misses = ~self._hit[:self.size, m]
+        before = np.flatnonzero(misses[:i])
+        after = np.flatnonzero(misses[i:])
+        first = int(before[-1]) + 1 if len(before) else 0
+        last = i + int(after[0]) - 1 if len(after) else self.size - 1
+        return first, last
+
+    # --- Snapshots ---
+
+    def _window(self, end: int, days: int):
+        """Returns intake sums, logged days and goal hits over the `days` days ending at index `end`."""
+        lo, hi = min(max(end - days + 1, 0), self.size), min(max(end + 1, 0), self.size)
+        return (self._actual_sum[hi] - self._actual_sum[lo], int(self._logged_sum[hi] - self._logged_sum[lo]),
+                self._hit_sum[hi] - self._hit_sum[lo])
+
+    def _build_snapshot(self, today: date) -> dict:
+        macros = {macro: {} for macro in MACROS}
+        if self.start is None:
+            for stats in macros.values():
+                stats.update({f'avg_{w}': None for w in WINDOWS}, **{f'adherence_{w}': None for w in WINDOWS},
+                             current_streak=0, best_streak=0)
+            return {'macros': macros, 'weekly': [], 'rolling': {'dates': np.array([], dtype='datetime64[D]'), **{macro: np.array([]) for macro in MACROS}}}
+
+        t = self._index(today)
+        for w in WINDOWS:
+            sums, logged, hits = self._window(t, w)
+            for m, macro in enumerate(MACROS):
+                macros[macro][f'avg_{w}'] = float(sums[m] / logged) if logged else None
+                macros[macro][f'adherence_{w}'] = float(100 * hits[m] / logged) if logged else None
+
+        # Today counts once it is logged; until then the streak runs up to yesterday.
+        end = t if 0 <= t < self.size and self._logged[t] else t - 1
+        for m in np.flatnonzero(self._best_stale):
+            self._best[m] = _longest_run(self._hit[:self.size, m])
+        self._best_stale[:] = False
+        for m, macro in enumerate(MACROS):
+            streak = 0
+            if 0 <= end < self.size and self._hit[end, m]:
+                first, _ = self._run(end, m)
+                streak = end - first + 1
+            macros[macro]['current_streak'] = int(streak)
+            macros[macro]['best_streak'] = int(self._best[m])
+        return {'macros': macros, 'weekly': self._weekly(), 'rolling': self._rolling(WINDOWS[0])}
+
+    def _weekly(self) -> list:
+        # Week boundaries fall on Mondays; the first and last weeks may be partial.
+        first_monday = (7 - self.start.weekday()) % 7
+        bounds = np.unique(np.concatenate(([0], np.arange(first_monday, self.size, 7), [self.size])))
+        sums = self._actual_sum[bounds[1:]] - self._actual_sum[bounds[:-1]]
+        logged = self._logged_sum[bounds[1:]] - self._logged_sum[bounds[:-1]]
+        hits = self._hit_sum[bounds[1:]] - self._hit_sum[bounds[:-1]]
+        weeks = []
+        for k in np.flatnonzero(logged):
+            day = self.start + timedelta(days=int(bounds[k]))
+            week = {'week_start': day - timedelta(days=day.weekday()), 'days_logged': int(logged[k])}
+            for m, macro in enumerate(MACROS):
+                week[f'avg_{macro}'] = float(sums[k, m] / logged[k])
+                week[f'adherence_{macro}'] = float(100 * hits[k, m] / logged[k])
+            weeks.append(week)
+        return weeks
+
+    def _rolling(self, days: int) -> dict:
+        """Returns the average intake over the logged days of each `days`-day window, for every day (NaN if none)."""
+        ends = np.arange(1, self.size + 1)
+        starts = np.maximum(ends - days, 0)
+        logged = self._logged_sum[ends] - self._logged_sum[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = (self._actual_sum[ends] - self._actual_sum[starts]) / logged[:, None]
+        rolling = {'dates': np.datetime64(self.start.isoformat(), 'D') + np.arange(self.size)}
+        rolling.update({macro: averages[:, m] for m, macro in enumerate(MACROS)})
+        return rolling
+
+
+def _longest_run(hit: np.ndarray) -> int:
+    """Returns the length of the longest run of True values."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], hit.astype(np.int8), [0]))))
+    return int((edges[1::2] - edges[::2]).max()) if len(edges) else 0
@@ -0,0 +1,292 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger("tracker.write_queue")
+
+# Queued writes handed to the worker per flush.
+FLUSH_BATCH_SIZE = 200
+# Seconds the worker sleeps between flushes when it isn't woken by a new write.
+FLUSH_INTERVAL = 2.0
+# A write that fails this many times is parked as failed instead of blocking the queue;
+# the same user's later writes then wait until it is retried or discarded.
+MAX_ATTEMPTS = 8
+# First retry delay in seconds; doubled after each failure, up to RETRY_BACKOFF_MAX.
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 60
+# Client keys of recently flushed inserts, so edits made just before a page refresh still resolve.
+RECENT_KEYS = 10000
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    entry_date TEXT,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_writes_user ON pending_writes (user_id, entry_date);
+"""
+
+
+def new_client_key() -> str:
+    """Returns an idempotency key for a new row, so a retried insert is applied only once."""
+    return str(uuid.uuid4())
+
+
+class WriteQueue:
+    """
+    Durable write-behind journal in a local SQLite file.
+    Writes are appended with `enqueue` and show up in `pending` right away; a
+    WriteBehindWorker later claims them in order, applies them and removes them.
+    A user's writes are never applied past one of theirs that failed, since later
+    edits may depend on it. Unflushed writes survive restarts. Each write is a dict
+    with seq, user_id, op, entry_date, payload, attempts, last_error and failed.
+    """
+
+    def __init__(self, path: str = "write_queue.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._in_flight = set()             # seqs claimed by the worker and not yet finished
+        self._recent_keys = OrderedDict()   # seq -> client_key of flushed inserts
+        self._wakeup = threading.Event()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(JOURNAL_SCHEMA)
+
+    # --- Producers ---
+
+    def enqueue(self, user_id: str, op: str, payload: dict, entry_date: str = None) -> int:
+        """Appends a write and wakes the worker; returns its sequence number."""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO pending_writes (user_id, op, entry_date, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, op, entry_date, json.dumps(payload), time.time()))
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def amend(self, seq: int, payload: dict) -> bool:
+        """Replaces the payload of a write the worker hasn't claimed yet; False if it is too late."""
+        with self._lock, self.conn:
+            if seq in self._in_flight:
+                return False
+            cursor = self.conn.execute("UPDATE pending_writes SET payload = ? WHERE seq = ? AND failed = 0", (json.dumps(payload), seq))
+        return cursor.rowcount == 1
+
+    def cancel(self, seq: int) -> bool:
+        """Drops a write the worker hasn't claimed yet; False if it is too late."""
+        with self._lock, self.conn:
+            if seq in self._in_flight:
+                return False
+            cursor = self.conn.execute("DELETE FROM pending_writes WHERE seq = ?", (seq,))
+        return cursor.rowcount == 1
+
+    def get(self, seq: int):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM pending_writes WHERE seq = ?", (seq,)).fetchone()
+        return _to_write(row) if row else None
+
+    def client_key(self, seq: int):
+        """Returns the client_key of the insert queued as `seq`, even shortly after it was flushed."""
+        write = self.get(seq)
+        if write:
+            return write['payload']['row'].get('client_key')
+        with self._lock:
+            return self._recent_keys.get(seq)
+
+    def pending(self, user_id: str, entry_date: str = None, ops: tuple = None):
+        """
+        Returns a user's unfailed writes in order, optionally for some ops only. With `entry_date`,
+        only that date's writes and those without a date (which may touch any day) are returned.
+        """
+        sql, params = "SELECT * FROM pending_writes WHERE user_id = ? AND failed = 0", [user_id]
+        if entry_date is not None:
+            sql += " AND (entry_date = ? OR entry_date IS NULL)"
+            params.append(entry_date)
+        if ops:
+            sql += f" AND op IN ({', '.join('?' * len(ops))})"
+            params.extend(ops)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY seq", params).fetchall()
+        return [_to_write(row) for row in rows]
+
+    def pending_dates(self, user_id: str, ops: tuple):
+        """Returns the dates that have unfailed writes of `ops` for the user."""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT DISTINCT entry_date FROM pending_writes WHERE user_id = ? AND failed = 0 AND op IN ({', '.join('?' * len(ops))})",
+                (user_id, *ops)).fetchall()
+        return {row['entry_date'] for row in rows if row['entry_date']}
+
+    def wait_until_flushed(self, user_id: str, timeout: float) -> bool:
+        """
+        Blocks until the worker has applied all of a user's pending writes. Returns False on
+        timeout, or right away if one of them failed (the rest are held behind it).
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending(user_id):
+            if self.failed(user_id) or time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.05)
+        return True
+
+    def failed(self, user_id: str):
+        """Returns the writes of a user that were given up on after MAX_ATTEMPTS."""
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM pending_writes WHERE user_id = ? AND failed = 1 ORDER BY seq", (user_id,)).fetchall()
+        return [_to_write(row) for row in rows]
+
+    def retry_failed(self, user_id: str):
+        """Puts a user's failed writes back in the queue."""
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE pending_writes SET failed = 0, attempts = 0 WHERE user_id = ? AND failed = 1", (user_id,))
+        self._wakeup.set()
+
+    def discard_failed(self, user_id: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM pending_writes WHERE user_id = ? AND failed = 1", (user_id,))
+        # The user's held writes can go now.
+        self._wakeup.set()
+
+    def stats(self):
+        """Returns the number of pending, in-flight and failed writes."""
+        with self._lock:
+            pending, failed = self.conn.execute("SELECT COUNT(*) - COALESCE(SUM(failed), 0), COALESCE(SUM(failed), 0) FROM pending_writes").fetchone()
+            return {'pending': pending, 'in_flight': len(self._in_flight), 'failed': failed}
+
+    # --- Worker ---
+
+    def claim(self, limit: int = FLUSH_BATCH_SIZE):
+        """
+        Marks up to `limit` of the oldest unfailed writes as in flight and returns them,
+        skipping users who have a failed write.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                """SELECT * FROM pending_writes
+                    WHERE failed = 0 AND user_id NOT IN (SELECT user_id FROM pending_writes WHERE failed = 1)
+                    ORDER BY seq LIMIT ?""",
+                (limit + len(self._in_flight),)).fetchall()
+            writes = [_to_write(row) for row in rows if row['seq'] not in self._in_flight][:limit]
+            self._in_flight.update(write['seq'] for write in writes)
+        return writes
+
+    def complete(self, writes: list):
+        """Removes applied writes from the journal."""
+        seqs = [write['seq'] for write in writes]
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM pending_writes WHERE seq = ?", [(seq,) for seq in seqs])
+            self._in_flight.difference_update(seqs)
+            for write in writes:
+                client_key = write['payload'].get('row', {}).get('client_key')
+                if client_key:
+                    self._recent_keys[write['seq']] = client_key
+            while len(self._recent_keys) > RECENT_KEYS:
+                self._recent_keys.popitem(last=False)
+
+    def release(self, writes: list, error: str = None):
+        """
+        Returns claimed writes to the queue. With `error`, the first write is charged an
+        attempt and parked as failed once it reaches MAX_ATTEMPTS. Returns that write's attempts.
+        """
+        attempts = 0
+        with self._lock, self.conn:
+            if writes and error is not None:
+                first = writes[0]
+                attempts = first['attempts'] + 1
+                self.conn.execute(
+                    "UPDATE pending_writes SET attempts = ?, last_error = ?, failed = ? WHERE seq = ?",
+                    (attempts, error, int(attempts >= MAX_ATTEMPTS), first['seq']))
+            self._in_flight.difference_update(write['seq'] for write in writes)
+        return attempts
+
+    def wait(self, timeout: float):
+        """Blocks until a write is enqueued or `timeout` seconds pass."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+
+class WriteBehindWorker(threading.Thread):
+    """
+    Background thread that flushes a WriteQueue. Claimed writes are split into runs of
+    the same op, and each run is passed to `apply_run(op, writes)`, which should apply it
+    in as few requests as possible. A failing run is retried with exponential backoff.
+    """
+
+    def __init__(self, queue: WriteQueue, apply_run, batch_size: int = FLUSH_BATCH_SIZE):
+        super().__init__(name="write-behind", daemon=True)
+        self.queue = queue
+        self.apply_run = apply_run
+        self.batch_size = batch_size
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            delay = self.flush()
+            self.queue.wait(delay if delay is not None else FLUSH_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        self.queue._wakeup.set()
+
+    def flush(self):
+        """Applies queued writes until the queue is empty; returns a retry delay if a run failed."""
+        while True:
+            writes = self.queue.claim(self.batch_size)
+            if not writes:
+                return None
+            for start, run in _runs(writes):
+                applied, error = self._apply(run)
+                if error is not None:
+                    failed = writes[start + applied]
+                    attempts = self.queue.release(writes[start + applied:], f"{type(error).__name__}: {error}")
+                    logger.warning(json.dumps({'event': 'flush_failed', 'op': failed['op'], 'seq': failed['seq'], 'attempts': attempts, 'error': str(error)}))
+                    return min(RETRY_BACKOFF * 2 ** (attempts - 1), RETRY_BACKOFF_MAX)
+
+    def _apply(self, run):
+        """
+        Applies a run in one call; if that fails, one write at a time, so only the write
+        that keeps failing is retried. Returns (writes applied, error or None).
+        """
+        try:
+            self.apply_run(run[0]['op'], run)
+            self.queue.complete(run)
+            return len(run), None
+        except Exception as e:
+            if len(run) == 1:
+                return 0, e
+        for applied, write in enumerate(run):
+            try:
+                self.apply_run(write['op'], [write])
+            except Exception as e:
+                return applied, e
+            self.queue.complete([write])
+        return len(run), None
+
+
+def _runs(writes):
+    """Splits writes into consecutive runs of the same op, yielding (start index, run)."""
+    start = 0
+    for i in range(1, len(writes) + 1):
+        if i == len(writes) or writes[i]['op'] != writes[start]['op']:
+            yield start, writes[start:i]
+            start = i
+
+
+def _to_write(row):
+    write = dict(row)
+    write['payload'] = json.loads(write['payload'])
+    write['failed'] = bool(write['failed'])
+    return write